@@ -29,7 +29,8 @@ agents = dict(
             mean=[0.485, 0.456, 0.406, 0.01, 0.01, 0.01],
             std=[0.229, 0.224, 0.225, 0.03, 0.03, 0.03],
             num_rotations=16,
-            size_divisor=32
+            size_divisor=32,
+            symmetric_grasp=True
 
         ),
         criterion=dict(
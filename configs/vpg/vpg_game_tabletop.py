@@ -0,0 +1,82 @@
+
+import numpy as np
+
+
+root_workdir = 'logs'
+
+workspace = np.asarray(
+    [[-0.724, -0.276],
+     [-0.224, 0.224],
+     [-0.0001, 0.4]])
+
+# 1. logging
+logger = dict(
+    handlers=(
+        dict(type='StreamHandler', level='INFO'),
+        dict(type='FileHandler', level='DEBUG'),
+    ),
+)
+
+# 2. equipment
+equipment = dict(
+    end_effectors=[
+        dict(type='InspireGripperTableTop',
+             name='gripper1',
+             tcp=np.array([0, 0, 0.01])),
+    ],
+    objects=[
+        dict(type='PrimitiveTableTop',
+             name='obj1',
+             num_obj=10,
+             obj_mesh_dir='forbrl/envs/VolksEnv/environment/equipment/'
+                          'objects/primitives/blocks',
+             workspace=workspace,
+             drop_height=0.15,
+             drop_offset=0.1,
+             color_space=np.array(
+                 [[78.0, 121.0, 167.0],
+                  [89.0, 161.0, 79.0],
+                  [156, 117, 95],
+                  [242, 142, 43],
+                  [237.0, 201.0, 72.0],
+                  [186, 176, 172],
+                  [255.0, 87.0, 89.0],
+                  [176, 122, 161],
+                  [118, 183, 178],
+                  [255, 157, 167]]) / 255.0),
+    ],
+    robotic_arms=[
+        dict(type='URArmTableTop',
+             name='arm1')
+    ],
+    sim_environments=[
+        dict(type='TableTop',
+             name='sim1',
+             workspace=workspace,
+             finger_radius=0.01,
+             max_grasp_width=0.1)
+    ],
+    vision_sensors=[
+        dict(type='RealsenseCamTableTop',
+             name='cam1',
+             color_res=(224, 224),
+             position=(-0.5, 0., 10.),
+             pixel_size=0.002),
+    ],
+)
+
+# 3. cerebrum
+# 4. runner
+runner = dict(
+    type='VPG',
+    sim='sim1', arm='arm1', camera='cam1',
+    gripper='gripper1', obj='obj1', work_dir=root_workdir,
+    workspace=workspace, resolution=0.002,
+    num_rotations=16,
+    grasp_reward=1., push_reward=0.5,
+    grasp_loc_margin=0.15, push_margin=0.1,
+    push_length=0.1,
+    pixel_thresh=300, depth_thresh=[0.01, 0.3],
+    no_change_thresh=10, empty_threshold=300,
+    restart_delay=0
+)
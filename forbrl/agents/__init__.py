@@ -1,4 +1,5 @@
-from .vpg_agent import VPGAgent
-from .algorithms import DQN, VPGNet, ResNet, FCN
-from .memories import Replay, VPGReplay
-from .policies import VPGPolicy
+from . import algorithms, memories, policies
+from ..utils import AGENTS
+
+# imported by the first config that uses them, as they import torch
+AGENTS.register_lazy('{}.vpg_agent.VPGAgent'.format(__name__))
@@ -1,2 +1,4 @@
-from .dqn import DQN
-from .models import VPGNet, ResNet, FCN
+from . import models
+from ...utils import ALGORITHMS
+
+ALGORITHMS.register_lazy('{}.dqn.DQN'.format(__name__))
@@ -1,3 +1,4 @@
-from .vpg_net import VPGNet
-from .backbones import ResNet
-from .heads import FCN
+from . import backbones, heads
+from ....utils import MODELS
+
+MODELS.register_lazy('{}.vpg_net.VPGNet'.format(__name__))
@@ -1 +1,3 @@
-from .resnet import ResNet
+from .....utils import BACKBONES
+
+BACKBONES.register_lazy('{}.resnet.ResNet'.format(__name__))
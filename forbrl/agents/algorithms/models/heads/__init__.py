@@ -1 +1,3 @@
-from .fcn import FCN
+from .....utils import HEADS
+
+HEADS.register_lazy('{}.fcn.FCN'.format(__name__))
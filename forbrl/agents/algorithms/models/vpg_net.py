@@ -10,14 +10,25 @@ from ....utils import build_backbone, build_head, MODELS
 
 @MODELS.register_module
 class VPGNet(nn.Module):
+    """Push and grasp Q maps of a heightmap at num_rotations rotations.
+
+    With symmetric_grasp, the grasp branch runs on the first half of the
+    rotations only and its maps are reused for the second half, as a
+    parallel-jaw grasp at r + 180 degrees is the same grasp (DQN trains
+    both on the same target). The outputs keep num_rotations maps.
+    """
+
     def __init__(self,
                  backbone,
                  head,
                  mean,
                  std,
                  num_rotations=16,
-                 size_divisor=32):
+                 size_divisor=32,
+                 symmetric_grasp=False):
         super(VPGNet, self).__init__()
+        assert not symmetric_grasp or num_rotations % 2 == 0, \
+            'symmetric_grasp needs an even num_rotations'
 
         self.push_color_backbone = build_backbone(backbone)
         self.grasp_color_backbone = build_backbone(backbone)
@@ -36,6 +47,7 @@ class VPGNet(nn.Module):
         # self.depth_std = depth_std
         self.num_rotations = num_rotations
         self.size_divisor = size_divisor
+        self.symmetric_grasp = symmetric_grasp
 
         self.init_affine_mat()
         self.init_weight()
@@ -126,8 +138,13 @@ class VPGNet(nn.Module):
 
         if spec_rot == -1:
             rot = range(self.num_rotations)
+            if self.symmetric_grasp:
+                grasp_rot = range(self.num_rotations // 2)
+            else:
+                grasp_rot = rot
         else:
             rot = [spec_rot]
+            grasp_rot = rot
 
         push_prob = []
         grasp_prob = []
@@ -144,16 +161,20 @@ class VPGNet(nn.Module):
                 rot_x, self.push_color_backbone, self.push_depth_backbone,
                 self.push_head, self.push_upsample,
                 affine_mat_after)
-            grasp_feat = self.forward_single(
-                rot_x, self.grasp_color_backbone, self.grasp_depth_backbone,
-                self.grasp_head, self.grasp_upsample,
-                affine_mat_after)
-
             push_prob.append(push_feat)
-            grasp_prob.append(grasp_feat)
+
+            if rotate_idx in grasp_rot:
+                grasp_feat = self.forward_single(
+                    rot_x, self.grasp_color_backbone,
+                    self.grasp_depth_backbone, self.grasp_head,
+                    self.grasp_upsample, affine_mat_after)
+                grasp_prob.append(grasp_feat)
 
         push_prob = torch.cat(push_prob, dim=1)
         grasp_prob = torch.cat(grasp_prob, dim=1)
+        if len(grasp_rot) < len(rot):
+            # the maps are in the heightmap frame, r + 180 maps onto r
+            grasp_prob = torch.cat([grasp_prob, grasp_prob], dim=1)
 
         push_prob = self.postprocess(push_prob, cpu)
         grasp_prob = self.postprocess(grasp_prob, cpu)
@@ -1,2 +1,4 @@
-from .replay import Replay
-from .vpg_replay import VPGReplay
+from ...utils import MEMORIES
+
+MEMORIES.register_lazy('{}.replay.Replay'.format(__name__))
+MEMORIES.register_lazy('{}.vpg_replay.VPGReplay'.format(__name__))
@@ -1 +1,3 @@
-from .vpg_policy import VPGPolicy
+from ...utils import POLICIES
+
+POLICIES.register_lazy('{}.vpg_policy.VPGPolicy'.format(__name__))
@@ -5,7 +5,8 @@ import torch
 import numpy as np
 
 from ..utils import (build_memory, build_algorithm, build_policy,
-                     AGENTS, get_pred_vis, save_vis, get_class_name)
+                     AGENTS, get_class_name)
+from ..utils.vis import get_pred_vis, save_vis
 
 
 @AGENTS.register_module
@@ -22,7 +22,7 @@ equipment = dict(
         dict(type='RealsenseCam', name='camera1',
              color_res=(1920, 1080), color_fr=30,
              depth_res=(1280, 720), depth_fr=30,
-             serial_number='938422076086'),
+             serial_number='938422076086', threaded=True),
     ]
 )
 
@@ -41,7 +41,7 @@ cerebrum = dict(
                  [-2.02844, -1.72941, 2.02518, -2.02008, -2.14826, -0.56727]
              ],
              max_path=100,
-             path_step=6),
+             path_step=6, optimize=True, joint_speeds=3, joint_accs=0.6),
     ],
     posterior_parietal_cortex=[
         dict(type='AxyBSolver', name='axyb_solver1', self_check=True),
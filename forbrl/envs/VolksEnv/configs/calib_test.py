@@ -22,7 +22,7 @@ equipment = dict(
         dict(type='RealsenseCam', name='camera1',
              color_res=(1280, 720), color_fr=30,
              depth_res=(1280, 720), depth_fr=15,
-             serial_number='938422076086'),
+             serial_number='938422076086', threaded=True),
     ],
     end_effectors=[
         dict(type='InspireGripper', name='gripper_1'),
@@ -17,7 +17,7 @@ equipment = dict(
         dict(type='RealsenseCam', name='camera1',
              color_res=(1280, 720), color_fr=30,
              depth_res=(1280, 720), depth_fr=15,
-             serial_number='938422076086'),
+             serial_number='938422076086', threaded=True),
     ],
 )
 
@@ -36,7 +36,7 @@ cerebrum = dict(
                  [-2.02844, -1.72941, 2.02518, -2.02008, -2.14826, -0.56727]
              ],
              max_path=100,
-             path_step=5),
+             path_step=5, optimize=True, joint_speeds=2, joint_accs=2),
     ],
 )
 
@@ -1,5 +1,6 @@
 import logging
 import os
+import time
 
 from addict import Dict
 
@@ -10,7 +11,13 @@ from ..loggers import build_logger
 from ..runners import build_runner
 
 
-def assemble(cfg_fp):
+def assemble(cfg_fp, worker_idx=None):
+    """
+    Build the runner of a config file, or its components if it has none.
+    worker_idx is the index of the game in a pool of games, it offsets the
+    seed and the simulator ports so that the games differ and don't share a
+    simulator.
+    """
 
     logging_step = 1
     env = Dict()
@@ -28,18 +35,31 @@ def assemble(cfg_fp):
 
     # set seed if provided
     seed = cfg.pop('seed', None)
+    if worker_idx is not None:
+        if seed is not None:
+            seed += worker_idx
+        for sim in cfg['equipment'].get('sim_environments', []):
+            if 'port' in sim:
+                sim['port'] += worker_idx
     if seed is not None:
         utils.set_random_seed(seed)
 
+    # number of threads building the equipment, one per component if None
+    num_workers = cfg.pop('num_workers', None)
+
     # 1. logging
     _ = build_logger(cfg['logger'], dict(workdir=cfg['workdir'],
                                          logger_name='environment'))
     assemble_logger = logging.getLogger(__name__)
 
     # 2. equipment
-    env['equipment'] = build_equipment(cfg['equipment'])
+    tic = time.time()
+    env['equipment'], timings = build_equipment(cfg['equipment'],
+                                                num_workers)
     flatten_env(env, 'equipment')
-    assemble_logger.info(f"Assemble, Step {logging_step}, built equipment")
+    assemble_logger.info(f"Assemble, Step {logging_step}, built equipment "
+                         f"in {time.time() - tic:.3f} s, "
+                         f"{sum(timings.values()):.3f} s one by one")
 
     # 3. cerebrum
     if cfg.get('cerebrum', None) is not None:
@@ -1,5 +1,5 @@
 import logging
-from itertools import chain, combinations, islice
+from itertools import combinations, islice
 
 import numpy as np
 
@@ -11,44 +11,53 @@ class PathSampler:
     """
     A sampler to sample points in space (might be higher dimensional space
     such as joint space for a 6 DoF robotic arm).
+    Paths are returned as arrays of shape (num_points, dim). With optimize,
+    their points are reordered to shorten the motion through them: a nearest
+    neighbour tour from the first point, improved by 2-opt, kept only if it
+    is faster than the sampled order. The distance between two poses is the
+    time the slowest joint needs to cover its displacement, as joint moves
+    are synchronized on it, with trapezoidal speed profiles limited by
+    joint_speeds (rad/s) and joint_accs (rad/s^2). Both are scalars or one
+    per joint, without joint_accs the joints move at constant speed.
     """
     logger = logging.getLogger(__name__)
 
     # TODO: remove pattern -> ( if step is None: step = self.step)
-    def __init__(self, points, max_path=100, path_step=4):
+    def __init__(self, points, max_path=100, path_step=4, optimize=False,
+                 joint_speeds=1., joint_accs=None, max_iter=100):
         if isinstance(points, list):
             self.points = np.array(points)
         else:
             self.points = points
         self.max_path = max_path
         self.path_step = path_step
+        self.optimize = optimize
+        self.joint_speeds = joint_speeds
+        self.joint_accs = joint_accs
+        self.max_iter = max_iter
         self.logger.debug(f"Initialized {self.__class__.__name__}:\n"
                           f" {self.__repr__()}")
 
     def __repr__(self):
         msg = (f"A {self.__class__.__name__} instance with points:\n"
-               f"{self.points}\npath step : {self.path_step}\n")
+               f"{self.points}\npath step : {self.path_step}\n"
+               f"optimize : {self.optimize}\n")
         return msg
 
     def points_in_between(self, point_a, point_b, step=None):
         if step is None:
             step = self.path_step
         assert point_a.shape == point_b.shape, "points should be in same space"
-        points = np.linspace(point_a, point_b, step)
-        gen = (_ for _ in points)
-        return gen
+        return np.linspace(point_a, point_b, step)
 
-    def path_by_combo(self, limit=None):
+    def path_by_combo(self, limit=None, optimize=None):
         if limit is None:
             limit = self.max_path
-        combo = combinations(self.points, 2)
-        paths = islice(combo, limit)
-        res = chain()
-        for path in paths:
-            res = chain(res, self.points_in_between(*path))
-        return res
-
-    def path_by_grid(self, step=None):
+        pairs = np.array(list(islice(combinations(self.points, 2), limit)))
+        path = self.interpolate(pairs[:, 0], pairs[:, 1])
+        return self._optimized(path, optimize)
+
+    def path_by_grid(self, step=None, optimize=None):
         if step is None:
             step = self.path_step
         assert len(self.points) in [4, 8], "currently only support 2D/3D grid"
@@ -57,7 +66,7 @@ class PathSampler:
         if len(self.points) == 8:
             res2 = self.path_in_plane(self.points[4:], step=step)
             res = self.sample_in_turn(res, res2)
-        return res
+        return self._optimized(res, optimize)
 
     def path_in_plane(self, points, step=None):
         if step is None:
@@ -67,10 +76,93 @@ class PathSampler:
         return self.sample_in_turn(line1, line2)
 
     def sample_in_turn(self, path1, path2):
-        res = chain()
-        for idx, (p1, p2) in enumerate(zip(path1, path2)):
-            if idx % 2:  # alter this order to prevent useless movements
-                res = chain(res, self.points_in_between(p1, p2))
-            else:
-                res = chain(res, self.points_in_between(p2, p1))
-        return res
+        starts, ends = np.array(path2), np.array(path1)
+        # alter this order to prevent useless movements
+        starts[1::2], ends[1::2] = path1[1::2], path2[1::2]
+        return self.interpolate(starts, ends)
+
+    def interpolate(self, starts, ends, step=None):
+        """Concatenate path_step points from each start to its end."""
+        if step is None:
+            step = self.path_step
+        lines = np.linspace(starts, ends, step, axis=1)
+        return lines.reshape(-1, starts.shape[-1])
+
+    def _optimized(self, path, optimize):
+        if optimize is None:
+            optimize = self.optimize
+        if not optimize:
+            return path
+        optimized = path[self.optimize_order(path)]
+        before = self.motion_time(path)
+        after = self.motion_time(optimized)
+        self.logger.info(f"Estimated motion through {len(path)} points: "
+                         f"{before:.1f} s sampled, {after:.1f} s reordered")
+        return optimized if after < before else path
+
+    def distances(self, points_a, points_b):
+        """Pairwise motion times between two sets of points."""
+        return self.move_times(np.abs(points_a[:, None] - points_b[None]))
+
+    def move_times(self, delta, vel=None, acc=None):
+        """
+        Time of joint moves of displacements delta (..., dim), the slowest
+        joint leading, with the joint limits of the sampler by default.
+        """
+        vel = self.joint_speeds if vel is None else vel
+        acc = self.joint_accs if acc is None else acc
+        vel = np.broadcast_to(np.asarray(vel, np.float64), delta.shape[-1:])
+        if acc is None:
+            return (delta / vel).max(axis=-1)
+        acc = np.broadcast_to(np.asarray(acc, np.float64), delta.shape[-1:])
+        # joints that do not reach vel accelerate half way and decelerate
+        reach = delta >= vel ** 2 / acc
+        times = np.where(reach, delta / vel + vel / acc,
+                         2 * np.sqrt(delta / acc))
+        return times.max(axis=-1)
+
+    def motion_time(self, path, vel=None, acc=None):
+        """
+        Estimated time of joint moves through the points of path, stopping
+        at each, see move_times.
+        """
+        return self.move_times(np.abs(np.diff(path, axis=0)), vel, acc).sum()
+
+    def optimize_order(self, path, start=0):
+        """
+        Return the indices that order the points of path as an open tour
+        from path[start], by nearest neighbour then 2-opt.
+        """
+        dist = self.distances(path, path)
+        num = len(path)
+        order = [start]
+        visited = np.zeros(num, bool)
+        visited[start] = True
+        for _ in range(num - 1):
+            row = np.where(visited, np.inf, dist[order[-1]])
+            nearest = int(row.argmin())
+            order.append(nearest)
+            visited[nearest] = True
+        return self.two_opt(np.array(order), dist)
+
+    def two_opt(self, order, dist):
+        """
+        Reverse the segments of an open tour that shorten it, until none
+        does or for max_iter passes. The first point stays in place.
+        """
+        num = len(order)
+        for _ in range(self.max_iter):
+            improved = False
+            for i in range(num - 2):
+                a, b = order[i], order[i + 1]
+                c, e = order[i + 2:], order[i + 3:]
+                gain = dist[a, b] - dist[a, c]
+                # the last point has no successor to reconnect
+                gain[:-1] += dist[c[:-1], e] - dist[b, e]
+                j = int(gain.argmax())
+                if gain[j] > 1e-9:
+                    order[i + 1:i + j + 3] = order[i + 1:i + j + 3][::-1]
+                    improved = True
+            if not improved:
+                break
+        return order
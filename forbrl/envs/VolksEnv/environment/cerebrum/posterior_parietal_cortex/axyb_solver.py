@@ -1,4 +1,5 @@
 import logging
+import multiprocessing
 
 import numpy as np
 
@@ -8,6 +9,96 @@ EPS = 0.00001
 FLOAT_EPS_4 = np.finfo(float).eps * 4.0
 
 
+def split_poses(mat_a, mat_b):
+    """Rotations (nx3x3) and translations (nx3) of A and B (4x4xn)"""
+    mat_a = np.moveaxis(mat_a, 2, 0)
+    mat_b = np.moveaxis(mat_b, 2, 0)
+    return mat_a[:, :3, :3], mat_a[:, :3, 3], mat_b[:, :3, :3], mat_b[:, :3, 3]
+
+
+def to_rotations(mats):
+    """Scale the mx3x3 matrices to det 1 and re-orthogonalize them"""
+    det = np.linalg.det(mats)
+    mats = mats * (np.sign(det) / np.abs(det) ** (1 / 3))[:, None, None]
+    u, s, vt = np.linalg.svd(mats)
+    return np.matmul(u, vt)
+
+
+def translation_system(rot_a, weights):
+    """Normal matrix (6x6) of the translation equations [-Ra I][tx ty]"""
+    eye = np.eye(3)
+    return np.block([[weights.sum() * eye, -np.einsum('n,nji->ij', weights,
+                                                        rot_a)],
+                     [-np.einsum('n,nij->ij', weights, rot_a),
+                      weights.sum() * eye]])
+
+
+def solve_batch(rot_a, t_a, rot_b, t_b, weights):
+    """
+    Solve AX=YB by the kronecker product for m weightings of the samples.
+
+    Args:
+        rot_a, t_a, rot_b, t_b: rotations (nx3x3) and translations (nx3) of
+            A and B.
+        weights: (mxn) weights of the samples, 0 leaves a sample out.
+
+    Returns:
+        X and Y (mx4x4)
+    """
+    m = weights.shape[0]
+    # sum of w * kron(rot_b, rot_a)
+    T = np.einsum('mn,nij,nkl->mikjl', weights, rot_b,
+                  rot_a).reshape(m, 9, 9)
+    U, S, Vt = np.linalg.svd(T)
+    # F: fortran/matlab reshape order
+    X = to_rotations(Vt[:, 0, :].reshape(m, 3, 3).transpose(0, 2, 1))
+    Y = to_rotations(U[:, :, 0].reshape(m, 3, 3).transpose(0, 2, 1))
+
+    # least squares of [-Ra I][tx ty] = ta - Y tb with normal equations
+    rhs = t_a[None] - np.einsum('mij,nj->mni', Y, t_b)
+    w_rhs = weights[:, :, None] * rhs
+    g = np.concatenate((-np.einsum('nji,mnj->mi', rot_a, w_rhs),
+                        w_rhs.sum(axis=1)), axis=1)
+    normal = np.stack([translation_system(rot_a, w) for w in weights])
+    t_est = np.einsum('mij,mj->mi', np.linalg.pinv(normal), g)
+
+    x_est = np.tile(np.eye(4), (m, 1, 1))
+    y_est = np.tile(np.eye(4), (m, 1, 1))
+    x_est[:, 0:3, 0:3] = X
+    x_est[:, 0:3, 3] = t_est[:, 0:3]
+    y_est[:, 0:3, 0:3] = Y
+    y_est[:, 0:3, 3] = t_est[:, 3:6]
+    return x_est, y_est
+
+
+def residuals_batch(rot_a, t_a, rot_b, t_b, x_est, y_est):
+    """
+    Per-sample residuals of m solutions (mx4x4 X and Y): translation (m)
+    and rotation (deg) between AX and YB, as mxnx2.
+    """
+    rot_ax = np.einsum('nij,mjk->mnik', rot_a, x_est[:, :3, :3])
+    rot_yb = np.einsum('mij,njk->mnik', y_est[:, :3, :3], rot_b)
+    t_ax = np.einsum('nij,mj->mni', rot_a, x_est[:, :3, 3]) + t_a[None]
+    t_yb = np.einsum('mij,nj->mni', y_est[:, :3, :3], t_b) + \
+        y_est[:, None, :3, 3]
+    cos = (np.einsum('mnij,mnij->mn', rot_ax, rot_yb) - 1) / 2
+    return np.stack((np.linalg.norm(t_ax - t_yb, axis=-1),
+                     np.degrees(np.arccos(np.clip(cos, -1, 1)))), axis=-1)
+
+
+def ransac_costs(data, subsets, thresholds):
+    """
+    Truncated quadratic costs of the solutions from the sample subsets
+    (mxk indices), a module function to run in worker processes.
+    """
+    n = data[0].shape[0]
+    weights = np.zeros((len(subsets), n))
+    np.put_along_axis(weights, subsets, 1, axis=1)
+    x_est, y_est = solve_batch(*data, weights)
+    errors = residuals_batch(*data, x_est, y_est) / np.asarray(thresholds)
+    return np.minimum((errors ** 2).sum(axis=-1), 1).sum(axis=1)
+
+
 @POSTERIOR_PARIETAL_CORTEX.register_module
 class AxyBSolver:
     """
@@ -18,19 +109,48 @@ class AxyBSolver:
         Y: (4x4) - unknown
         B: (4x4xn)
     n: number of measurements
+
+    Args:
+        robust (str): None to use all samples, 'ransac' to solve from the
+            best of `trials` random subsets of `subset_size` samples and
+            refit on its inliers, 'irls' to reweight the samples by their
+            residuals for at most `iterations`.
+        thresholds (tuple): translation (m) and rotation (deg) residuals
+            of an inlier.
+        processes (int): worker processes running the ransac trials,
+            started with `start_method`, None to run them in place. Worth
+            it for thousands of trials only, 256 take tens of ms in place.
+        seed (int): seed of the ransac subsets.
     """
     logger = logging.getLogger(__name__)
 
-    def __init__(self, eps=EPS, float_eps=FLOAT_EPS_4, self_check=True):
+    def __init__(self, eps=EPS, float_eps=FLOAT_EPS_4, self_check=True,
+                 robust=None, trials=256, subset_size=5,
+                 thresholds=(0.005, 1.), iterations=20, processes=None,
+                 start_method=None, seed=None):
+        assert robust in (None, 'ransac', 'irls'), \
+            f"Unknown robust mode {robust}"
         self.eps = eps  # would be used for later-on methods
         self.float_eps = float_eps  # would be used for later-on methods
         self.self_check = self_check
+        self.robust = robust
+        self.trials = trials
+        self.subset_size = subset_size
+        self.thresholds = thresholds
+        self.iterations = iterations
+        self.processes = processes
+        self.start_method = start_method
+        self.seed = seed
+        # of the last estimation
+        self.residuals = None
+        self.inliers = None
         self.logger.debug(f"Initialized {self.__class__.__name__}:\n"
                           f" {self.__repr__()}")
 
     def __repr__(self):
         msg = (f"A AX=YB solver with:\n    eps: {self.eps}, "
-               f"float_eps: {self.float_eps}, self_check: {self.self_check}\n")
+               f"float_eps: {self.float_eps}, self_check: {self.self_check}, "
+               f"robust: {self.robust}\n")
         return msg
 
     def by_kronecker_product(self, mat_a, mat_b):
@@ -44,68 +164,91 @@ class AxyBSolver:
             y_est: estimated Y
             y_est_check: Y from A@x_est=YB
             error_stats: error metric between y_est and y_est_check
+
+        With `robust`, X and Y are estimated from the inliers only. The
+        per-sample residuals of the estimation, translation (m) and rotation
+        (deg) of AX against YB, are kept in `residuals` (nx2) and the
+        samples used in `inliers`.
         """
+        data = split_poses(mat_a, mat_b)
         n = mat_a.shape[2]
-        T = np.zeros([9, 9])
-        x_est = np.eye(4)
-        y_est = np.eye(4)
-
-        # Permutate A and B to get gross motions
-        idx = np.random.permutation(n)
-        mat_a = mat_a[:, :, idx]
-        mat_b = mat_b[:, :, idx]
-
-        for i in range(n - 1):
-            rot_a = mat_a[0:3, 0:3, i]
-            rot_b = mat_b[0:3, 0:3, i]
-            T += np.kron(rot_b, rot_a)
-
-        U, S, Vt = np.linalg.svd(T)
-        xp = Vt.T[:, 0]
-        yp = U[:, 0]
-        # F: fortran/matlab reshape order
-        X = np.reshape(xp, (3, 3), order="F")
-        Xn = (np.sign(np.linalg.det(X)) / np.abs(np.linalg.det(X)) ** (
-                1 / 3)) * X
-        # re-orthogonalize to guarantee that they are indeed rotations.
-        U_n, S_n, Vt_n = np.linalg.svd(Xn)
-        X = np.matmul(U_n, Vt_n)
-
-        Y = np.reshape(yp, (3, 3),
-                       order="F")  # F: fortran/matlab reshape order
-        Yn = (np.sign(np.linalg.det(Y)) / np.abs(np.linalg.det(Y)) ** (
-                1 / 3)) * Y
-        U_yn, S_yn, Vt_yn = np.linalg.svd(Yn)
-        Y = np.matmul(U_yn, Vt_yn)
-
-        a_est = np.zeros([3 * n, 6])
-        b_est = np.zeros([3 * n, 1])
-        for i in range(n - 1):
-            a_est[3 * i:3 * i + 3, :] = np.concatenate((-mat_a[0:3, 0:3, i],
-                                                        np.eye(3)), axis=1)
-            b_est[3 * i:3 * i + 3, :] = np.transpose(mat_a[0:3, 3, i] -
-                                                     np.matmul(
-                                                         np.kron(
-                                                             mat_b[0:3, 3, i].T,
-                                                             np.eye(3)),
-                                                         np.reshape(
-                                                             Y, (9, 1),
-                                                             order="F")).T)
-
-        t_est_np = np.linalg.lstsq(a_est, b_est, rcond=None)
-        if t_est_np[2] < a_est.shape[1]:  # a_est.shape[1]=6
+        if self.robust == 'ransac':
+            weights = self._ransac(data, n)
+        elif self.robust == 'irls':
+            weights = self._irls(data, n)
+        else:
+            weights = np.ones(n)
+
+        x_est, y_est = solve_batch(*data, weights[None])
+        x_est, y_est = x_est[0], y_est[0]
+        if np.linalg.matrix_rank(translation_system(data[0], weights)) < 6:
             print('Rank deficient')
-        t_est = t_est_np[0]
-        x_est[0:3, 0:3] = X
-        x_est[0:3, 3] = t_est[0:3].T
-        y_est[0:3, 0:3] = Y
-        y_est[0:3, 3] = t_est[3:6].T
+
+        self.residuals = residuals_batch(*data, x_est[None], y_est[None])[0]
+        if self.robust == 'ransac':
+            self.inliers = weights > 0
+        elif self.robust == 'irls':
+            self.inliers = self._normalized(self.residuals) < 1
+        else:
+            self.inliers = np.ones(n, dtype=bool)
+        if not self.inliers.all():
+            self.logger.info(f"{n - self.inliers.sum()} of {n} samples "
+                             f"rejected as outliers: "
+                             f"{np.flatnonzero(~self.inliers)}")
         if not self.self_check:
             return x_est, y_est
         # verify Y_est using rigid_registration
-        y_est_check, error_stats = self.rigid_registration(mat_a, x_est, mat_b)
+        y_est_check, error_stats = self.rigid_registration(
+            mat_a[:, :, self.inliers], x_est, mat_b[:, :, self.inliers])
         return x_est, y_est, y_est_check, error_stats
 
+    def _normalized(self, residuals):
+        """Residuals (mx)nx2 scaled by the thresholds, combined"""
+        return np.linalg.norm(residuals / np.asarray(self.thresholds),
+                              axis=-1)
+
+    def _ransac(self, data, n):
+        """
+        Return the weights, 1 for inliers and 0 for outliers, of the best
+        solution over random subsets, scored by a truncated quadratic cost.
+        """
+        size = min(self.subset_size, n)
+        rng = np.random.RandomState(self.seed)
+        subsets = np.argsort(rng.rand(self.trials, n), axis=1)[:, :size]
+        if self.processes and self.processes > 1:
+            chunks = np.array_split(subsets, self.processes)
+            ctx = multiprocessing.get_context(self.start_method)
+            with ctx.Pool(self.processes) as pool:
+                costs = np.concatenate(pool.starmap(
+                    ransac_costs,
+                    [(data, chunk, self.thresholds) for chunk in chunks]))
+        else:
+            costs = ransac_costs(data, subsets, self.thresholds)
+        best = subsets[np.argmin(costs)]
+        weights = np.zeros(n)
+        weights[best] = 1
+        x_est, y_est = solve_batch(*data, weights[None])
+        inliers = self._normalized(
+            residuals_batch(*data, x_est, y_est)[0]) < 1
+        if inliers.sum() < size:
+            self.logger.warning(f"Only {inliers.sum()} inliers, keeping the "
+                                f"best subset")
+            return weights
+        return inliers.astype(float)
+
+    def _irls(self, data, n):
+        """Return Cauchy weights after iterative reweighting"""
+        weights = np.ones(n)
+        for _ in range(self.iterations):
+            x_est, y_est = solve_batch(*data, weights[None])
+            errors = self._normalized(
+                residuals_batch(*data, x_est, y_est)[0])
+            new_weights = 1 / (1 + errors ** 2)
+            if np.abs(new_weights - weights).max() < 1e-3:
+                return new_weights
+            weights = new_weights
+        return weights
+
     @staticmethod
     def rigid_registration(mat_a, mat_x, mat_b):
         """
@@ -120,29 +263,19 @@ class AxyBSolver:
             Y_est: Y in YB=AX with known A, B, X
             error_stats: error metric (mean, std)
         """
-        n = mat_a.shape[2]
-        AX = np.zeros(mat_a.shape)
-        AXp = np.zeros(mat_a.shape)
-        Bp = np.zeros(mat_b.shape)
         Y_est = np.eye(4)
 
         error_stats = np.zeros((2, 1))
 
-        for i in range(n):
-            AX[:, :, i] = np.matmul(mat_a[:, :, i], mat_x)
+        AX = np.einsum('ijn,jk->ikn', mat_a, mat_x)
 
         # Centroid of transformations t and that
-        t = 1 / n * np.sum(AX[0:3, 3, :], 1)
-        that = 1 / n * np.sum(mat_b[0:3, 3, :], 1)
-        AXp[0:3, 3, :] = AX[0:3, 3, :] - np.tile(t[:, np.newaxis], (1, n))
-        Bp[0:3, 3, :] = mat_b[0:3, 3, :] - np.tile(that[:, np.newaxis], (1, n))
-
-        [i, j, k] = AX.shape  # 4x4xn
-        # Convert AX and B to 2D arrays
-        AXp_2D = AXp.reshape((i, j * k))  # now it is 4x(4xn)
-        Bp_2D = Bp.reshape((i, j * k))  # 4x(4xn)
+        t = np.mean(AX[0:3, 3, :], 1)
+        that = np.mean(mat_b[0:3, 3, :], 1)
+        AXp = AX[0:3, 3, :] - t[:, np.newaxis]  # 3xn
+        Bp = mat_b[0:3, 3, :] - that[:, np.newaxis]  # 3xn
         # calculates the best rotation
-        U, S, Vt = np.linalg.svd(np.matmul(Bp_2D[0:3, :], AXp_2D[0:3, :].T))
+        U, S, Vt = np.linalg.svd(np.matmul(Bp, AXp.T))
         rot_eat = np.matmul(Vt.T, U.T)
         # special reflection case
         if np.linalg.det(rot_eat) < 0:
@@ -154,7 +287,7 @@ class AxyBSolver:
         Y_est[0:3, 3] = t_est
         # Calculate registration error
         pYB = (np.matmul(rot_eat, mat_b[0:3, 3, :]) +
-               np.tile(t_est[:, np.newaxis], (1, n)))  # 3xn
+               t_est[:, np.newaxis])  # 3xn
         pAX = AX[0:3, 3, :]
 
         reg_error = np.linalg.norm(pAX - pYB, axis=0)  # 1xn
@@ -1,2 +1,4 @@
-from .calhcam import CalHCam
 from .registry import VISUAL_CORTEX
+
+# imported by the first config that uses it, as it needs pyrealsense2
+VISUAL_CORTEX.register_lazy(f"{__name__}.calhcam.CalHCam")
@@ -15,17 +15,24 @@ class CalHCam:
     """
     Class of a transform calculator between a fiducial marker and a camera or
     vice versa.
+    With track, the board is searched at full resolution only in the region
+    where the last pose projects it, enlarged by roi_margin times its size.
+    Without a last pose, or when the board is not found in that region, it
+    is searched in the frame downscaled by `downscale`, then at full
+    resolution around the coarse detection, and in the full frame as a last
+    resort. `stats` counts the frames found by each search.
     """
 
     logger = logging.getLogger(__name__)
 
     def __init__(self, calib_board, camera=None, cam_instrinsics=None,
-                 cam_distortion=None, thres=90, pnp_method='default'):
+                 cam_distortion=None, thres=90, pnp_method='default',
+                 track=False, downscale=0.5, roi_margin=0.25):
+        self.camera = camera
         if camera is None:
             self.cam_intrinsic = cam_instrinsics
             self.cam_distortion = cam_distortion
         else:
-            self.camera = camera
             self._cam_intrinsic = None
             self._cam_distortion = None
         self.calib_board = calib_board
@@ -33,12 +40,18 @@ class CalHCam:
         self.tvec = None
         self.thres = thres
         self.pnp_method = pnp_method
+        self.track = track
+        self.downscale = downscale
+        self.roi_margin = roi_margin
+        self.tracked = False
+        self.stats = dict(roi=0, coarse=0, full=0, lost=0)
         self.logger.debug(f"Initialized {self.__class__.__name__}:\n"
                           f" {self.__repr__()}")
 
     def __repr__(self):
         msg = (f"A translation estimator between {self.camera} and "
-               f"{self.calib_board} with:\n    pnp_method: {self.pnp_method}\n")
+               f"{self.calib_board} with:\n    pnp_method: {self.pnp_method}\n"
+               f"    track: {self.track}\n")
         return msg
 
     def update_cam_parameters(self):
@@ -159,11 +172,78 @@ class CalHCam:
         res = (mat @ homo).squeeze()
         return res[:3]
 
+    def predict_roi(self, shape):
+        """
+        Region (x0, y0, x1, y1) of an image of shape where the last pose
+        projects the board, None if it leaves the image.
+        """
+        projected, _ = cv2.projectPoints(self.calib_board.corner_points,
+                                         self.rvec,
+                                         self.tvec,
+                                         self.cam_intrinsic,
+                                         self.cam_distortion)
+        projected = projected.reshape(-1, 2)
+        low, high = projected.min(axis=0), projected.max(axis=0)
+        return self._clip_roi(low, high, shape)
+
+    def _clip_roi(self, low, high, shape):
+        margin = (high - low) * self.roi_margin
+        h, w = shape[:2]
+        x0, y0 = np.maximum(np.floor(low - margin), 0).astype(int)
+        x1, y1 = np.minimum(np.ceil(high + margin), (w, h)).astype(int)
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return None
+        return x0, y0, x1, y1
+
+    def _find_in_roi(self, img_gray, roi):
+        x0, y0, x1, y1 = roi
+        found, corners = cv2.findCirclesGrid(img_gray[y0:y1, x0:x1],
+                                             self.calib_board.shape)
+        if found:
+            corners += np.float32([x0, y0])
+        return found, corners
+
+    def find_corners(self, img_gray):
+        """Find the circle centers of the board in a gray image."""
+        shape = self.calib_board.shape
+        if not self.track:
+            return cv2.findCirclesGrid(img_gray, shape)
+
+        if self.tracked:
+            roi = self.predict_roi(img_gray.shape)
+            if roi is not None:
+                found, corners = self._find_in_roi(img_gray, roi)
+                if found:
+                    self.stats['roi'] += 1
+                    return found, corners
+
+        small = cv2.resize(img_gray, None, fx=self.downscale,
+                           fy=self.downscale, interpolation=cv2.INTER_AREA)
+        found, corners = cv2.findCirclesGrid(small, shape)
+        if found:
+            corners /= self.downscale
+            points = corners.reshape(-1, 2)
+            # the circles around the centers are within one grid step
+            step = np.linalg.norm(points[1] - points[0])
+            roi = self._clip_roi(points.min(axis=0) - step,
+                                 points.max(axis=0) + step, img_gray.shape)
+            if roi is not None:
+                found_roi, corners_roi = self._find_in_roi(img_gray, roi)
+                if found_roi:
+                    corners = corners_roi
+            self.stats['coarse'] += 1
+            return found, corners
+
+        found, corners = cv2.findCirclesGrid(img_gray, shape)
+        self.stats['full' if found else 'lost'] += 1
+        return found, corners
+
     def __call__(self, image, as_matrix=True):
         if self.cam_intrinsic is None:
             self.update_cam_parameters()
         img_gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-        found, corners = cv2.findCirclesGrid(img_gray, self.calib_board.shape)
+        found, corners = self.find_corners(img_gray)
+        self.tracked = False
         refine_criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER,
                            30,
                            0.001)
@@ -191,6 +271,7 @@ class CalHCam:
                 res = pnp_solver(lpoints, corners_refined, **cam)
 
             self.rvec, self.tvec = res[1], res[2]
+            self.tracked = True
 
             if as_matrix:
                 return self.rt_matrix
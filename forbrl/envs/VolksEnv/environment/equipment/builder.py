@@ -1,3 +1,6 @@
+import logging
+from functools import partial
+
 from addict import Dict
 
 from .end_effectors import END_EFFECTORS
@@ -6,7 +9,7 @@ from .robotic_arms import ROBOTIC_ARMS
 from .vision_sensors import VISION_SENSORS
 from .sim_environments import SIM_ENVIRONMENTS
 from .objects import OBJECTS
-from ..utils import basic_builder
+from ..utils import build_from_cfg, run_concurrently
 
 REGISTRY = {'fiducial_markers': FIDUCIAL_MARKERS,
             'robotic_arms': ROBOTIC_ARMS,
@@ -15,16 +18,51 @@ REGISTRY = {'fiducial_markers': FIDUCIAL_MARKERS,
             'sim_environments': SIM_ENVIRONMENTS,
             'objects': OBJECTS}
 
+# the simulations are started first, the other equipment connects to them
+# with their client_id
+STAGES = (('sim_environments',),
+          ('fiducial_markers', 'robotic_arms', 'vision_sensors',
+           'end_effectors', 'objects'))
+
+logger = logging.getLogger(__name__)
 
-def build_equipment(cfg):
+
+def build_equipment(cfg, num_workers=None):
+    """
+    Build the equipment of cfg, stage by stage following STAGES, the
+    components of a stage concurrently on num_workers threads, one per
+    component by default. Constructors of hardware mostly wait for devices,
+    e.g. URArm for the secondary monitor and RealsenseCam for its reset.
+    Return the equipment and the time each component took to build, by
+    name.
+    """
     equipment = Dict()
     for key in cfg:
         if key not in REGISTRY:
             raise KeyError(f"Unrecognized key {key}, should be in "
                            f"{list(REGISTRY.keys())}")
-        if key in equipment:
-            raise KeyError(f"{key} already exist in equipment, with details "
-                           f"{equipment[key]}")
-        equipment[key] = basic_builder(cfg[key], REGISTRY[key])
+        equipment[key] = Dict()
+
+    timings = dict()
+    for stage in STAGES:
+        tasks, categories = dict(), dict()
+        for key in stage:
+            for component_cfg in cfg.get(key, []):
+                name = component_cfg.pop('name', None)
+                if not name:
+                    raise KeyError(f"'name' not specified in the config for "
+                                   f"{component_cfg}")
+                if name in categories:
+                    raise KeyError(f"The name {name} was already used in "
+                                   f"{categories[name]}")
+                categories[name] = key
+                tasks[name] = partial(build_from_cfg, component_cfg,
+                                      REGISTRY[key])
+        components, stage_timings = run_concurrently(tasks, num_workers)
+        for name, component in components.items():
+            equipment[categories[name]][name] = component
+            logger.info(f"Built {categories[name]} {name} in "
+                        f"{stage_timings[name]:.3f} s")
+        timings.update(stage_timings)
 
-    return equipment
+    return equipment, timings
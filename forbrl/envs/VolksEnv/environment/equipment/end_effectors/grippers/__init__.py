@@ -1,2 +1,8 @@
-from .inspire import InspireGripper
-from .inspire_sim import InspireGripperSim
+from ..registry import END_EFFECTORS
+
+# imported by the first config that uses them, as they need pyserial and
+# the V-REP remote API
+END_EFFECTORS.register_lazy(f"{__name__}.inspire.InspireGripper")
+END_EFFECTORS.register_lazy(f"{__name__}.inspire_sim.InspireGripperSim")
+END_EFFECTORS.register_lazy(
+    f"{__name__}.inspire_tabletop.InspireGripperTableTop")
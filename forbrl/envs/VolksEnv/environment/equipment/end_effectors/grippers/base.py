@@ -1,11 +1,22 @@
 import logging
 from abc import abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
 
 
 class GripperBase:
-    """A base class for a gripper"""
+    """
+    A base class for a gripper.
+    The *_async methods run the actions in a worker thread of the gripper
+    and return a `concurrent.futures.Future` of their result, so that the
+    gripper moves while the caller does something else. Actions submitted
+    this way run one at a time, in order. Grippers whose actions are
+    instantaneous or not thread safe set `asynchronous` to False, the
+    actions then run in the calling thread and return done futures.
+    """
     logger = logging.getLogger(__name__)
     tcp = [0, 0, 0, 0, 0, 0]
+    asynchronous = True
+    _executor = None
 
     def __init__(self, ):
         self.logger.debug(f"Initialized {self.__class__.__name__}:\n"
@@ -26,3 +37,30 @@ class GripperBase:
     @abstractmethod
     def move_to(self, target):
         pass
+
+    def submit(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) as a gripper action, return a Future"""
+        if not self.asynchronous:
+            future = Future()
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as ex:
+                future.set_exception(ex)
+            return future
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix=self.__class__.__name__)
+        return self._executor.submit(func, *args, **kwargs)
+
+    def open_async(self, *args, **kwargs):
+        return self.submit(self.open, *args, **kwargs)
+
+    def close_async(self, *args, **kwargs):
+        return self.submit(self.close, *args, **kwargs)
+
+    def grip_async(self, *args, **kwargs):
+        return self.submit(self.grip, *args, **kwargs)
+
+    def move_to_async(self, target):
+        return self.submit(self.move_to, target)
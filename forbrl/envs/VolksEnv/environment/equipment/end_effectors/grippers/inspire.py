@@ -1,10 +1,17 @@
 import logging
+import struct
 import time
 from functools import wraps
 
-import serial
+try:
+    import serial
+except ImportError:
+    # not needed by the simulated grippers
+    serial = None
 
 from .base import GripperBase
+from .inspire_protocol import (InspireProtocol, MOVING_STATES,
+                               STOPPED_STATES, decode_state, decode_words)
 from ..registry import END_EFFECTORS
 
 
@@ -31,13 +38,18 @@ TCP = (0, 0, 0.23, 0, 0, 0)
 
 @END_EFFECTORS.register_module
 class InspireGripper(GripperBase):
-    """A python interface for an Inspire gripper. """
+    """
+    A python interface for an Inspire gripper.
+    Commands are framed by InspireProtocol, which completes them as soon as
+    the gripper replies, reply_timeout bounds the wait for a reply.
+    """
     logger = logging.getLogger(__name__)
     gripper_id = 1
     port_number = 115200
 
     def __init__(self, tcp=TCP, speed=1000, force=1000, openmax=1000, openmin=0,
-                 wait_movement=True, usb_dir='/dev/ttyUSB0', port_number=None):
+                 wait_movement=True, usb_dir='/dev/ttyUSB0', port_number=None,
+                 reply_timeout=0.1):
         self.tcp = list(tcp)
         self.speed = speed
         self.force = force
@@ -47,209 +59,62 @@ class InspireGripper(GripperBase):
         self.usb_dir = usb_dir
         if port_number is not None:
             self.port_number = port_number
+        self.reply_timeout = reply_timeout
+
+        self.connect_serial()
+        super().__init__()
 
+    def __repr__(self):
+        msg = (f"Inspire gripper on: '{self.usb_dir}' with port: "
+               f"{self.port_number}")
+        return msg
+
+    def connect_serial(self):
+        """Open the port, set the open limits and find the gripper id."""
+        if serial is None:
+            raise ImportError(f"{self.__class__.__name__} needs pyserial")
         self.ser = serial.Serial(self.usb_dir, self.port_number)
         self.ser.timeout = 0.01
         self.ser.isOpen()
+        self.protocol = InspireProtocol(self.ser, self.reply_timeout)
 
-        self.setopenlimit(openmax, openmin)
+        self.setopenlimit(self.openmax, self.openmin)
 
         for i in range(1, 255):
             if self.getid(i) == 7:
                 self.gripper_id = i
                 break
-        super().__init__()
-
-    def __repr__(self):
-        msg = (f"Inspire gripper on: '{self.usb_dir}' with port: "
-               f"{self.port_number}")
-        return msg
 
-    @staticmethod
-    def data2bytes(data):
-        """ 把数据分成高字节和低字节"""
-        rdata = [0xff] * 2
-        if data == -1:
-            rdata[0] = 0xff
-            rdata[1] = 0xff
-            return rdata
-        rdata[0] = data & 0xff
-        rdata[1] = (data >> 8) & 0xff
-        return rdata
-
-    @staticmethod
-    def num2str(num):
-        """把十六进制或十进制的数转成bytes"""
-        code = hex(num)
-        code = code[2:4]
-        if len(code) == 1:
-            code = '0' + code
-        code = bytes.fromhex(code)
-        return code
-
-    @staticmethod
-    def checknum(data, leng):
-        """求校验和"""
-        result = 0
-        for i in range(2, leng):
-            result += data[i]
-        result = result & 0xff
-        return result
+    def request(self, name, *values, timeout=None, reply=True):
+        """Send command name of InspireProtocol to the gripper."""
+        return self.protocol.request(name, self.gripper_id, *values,
+                                     timeout=timeout, reply=reply)
 
     def getid(self, i):
-        """扫描id号"""
-        datanum = 0x05
-        b = [0] * (datanum + 5)
-        # 包头
-        b[0] = 0xEB
-        b[1] = 0x90
-
-        # id号
-        b[2] = i
-
-        # 数据个数
-        b[3] = datanum
-
-        # 操作码
-        b[4] = 0x12
-
-        # 数据
-        b[5] = self.data2bytes(1000)[0]
-        b[6] = self.data2bytes(1000)[1]
-
-        b[7] = self.data2bytes(0)[0]
-        b[8] = self.data2bytes(0)[1]
-
-        # 校验和
-        b[9] = self.checknum(b, datanum + 4)
-
-        # 向串口发送数据
-        putdata = b''
-
-        for i in range(1, datanum + 6):
-            putdata = putdata + self.num2str(b[i - 1])
-        self.ser.write(putdata)
-        # print('发送的数据：',putdata)
-        time.sleep(0.01)
-        getdata = self.ser.read(7)
-        return len(getdata)
+        """扫描id号, return the reply length, 7 if gripper i answers"""
+        reply = self.protocol.request('set_open_limit', i, 1000, 0,
+                                      timeout=0.01)
+        return 0 if reply is None else len(reply.raw)
 
     def setopenlimit(self, openmax=None, openmin=None):
+        """设置开口限位（最大开口度和最小开口度）"""
         if openmax is None:
             openmax = self.openmax
         if openmin is None:
             openmin = self.openmin
-        """设置开口限位（最大开口度和最小开口度）"""
         assert 0 <= openmin < openmax <= 1000, 'gripper setting out of range'
-
-        datanum = 0x05
-        b = [0] * (datanum + 5)
-        # 包头
-        b[0] = 0xEB
-        b[1] = 0x90
-
-        # id号
-        b[2] = self.gripper_id
-
-        # 数据个数
-        b[3] = datanum
-
-        # 操作码
-        b[4] = 0x12
-
-        # 数据
-        b[5] = self.data2bytes(openmax)[0]
-        b[6] = self.data2bytes(openmax)[1]
-
-        b[7] = self.data2bytes(openmin)[0]
-        b[8] = self.data2bytes(openmin)[1]
-
-        # 校验和
-        b[9] = self.checknum(b, datanum + 4)
-
-        # 向串口发送数据
-        putdata = b''
-
-        for i in range(1, datanum + 6):
-            putdata = putdata + self.num2str(b[i - 1])
-        self.ser.write(putdata)
-        # print('发送的数据：',putdata)
-        time.sleep(0.01)
-        getdata = self.ser.read(7)
-        self.send_receive_display(datanum, putdata, getdata)
+        self.request('set_open_limit', openmax, openmin)
 
     def setid(self, idnew):
         """设置ID"""
         assert 0 < idnew < 255, 'id out of range'
-
-        datanum = 0x02
-        b = [0] * (datanum + 5)
-        # 包头
-        b[0] = 0xEB
-        b[1] = 0x90
-        # id号
-        b[2] = self.gripper_id
-
-        # 数据个数
-        b[3] = datanum
-
-        # 操作码
-        b[4] = 0x04
-
-        # 数据
-        b[5] = idnew
-
+        self.request('set_id', idnew)
         self.gripper_id = idnew
 
-        # 校验和
-        b[6] = self.checknum(b, datanum + 4)
-
-        # 向串口发送数据
-        putdata = b''
-
-        for i in range(1, datanum + 6):
-            putdata = putdata + self.num2str(b[i - 1])
-        self.ser.write(putdata)
-        # print('发送的数据：',putdata)
-        time.sleep(0.01)
-        getdata = self.ser.read(7)
-        self.send_receive_display(datanum, putdata, getdata)
-
     def move_to(self, tgt):
         """运动到目标"""
         assert 0 <= tgt <= 1000, 'target out of range'
-
-        datanum = 0x03
-        b = [0] * (datanum + 5)
-        # 包头
-        b[0] = 0xEB
-        b[1] = 0x90
-        # id号
-        b[2] = self.gripper_id
-
-        # 数据个数
-        b[3] = datanum
-
-        # 操作码
-        b[4] = 0x54
-
-        # 数据
-        b[5] = self.data2bytes(tgt)[0]
-        b[6] = self.data2bytes(tgt)[1]
-
-        # 校验和
-        b[7] = self.checknum(b, datanum + 4)
-
-        # 向串口发送数据
-        putdata = b''
-
-        for i in range(1, datanum + 6):
-            putdata = putdata + self.num2str(b[i - 1])
-        self.ser.write(putdata)
-        # print('发送的数据：',putdata)
-        time.sleep(0.01)
-        getdata = self.ser.read(7)
-        self.send_receive_display(datanum, putdata, getdata)
+        self.request('move_to', tgt)
         if self.wait_movement:
             self.wait_till_stop()
 
@@ -257,40 +122,8 @@ class InspireGripper(GripperBase):
         """运动张开"""
         if speed is None:
             speed = self.speed
-
         assert 1 < speed <= 1000, 'setting out-of-range'
-
-        datanum = 0x03
-        b = [0] * (datanum + 5)
-        # 包头
-        b[0] = 0xEB
-        b[1] = 0x90
-        # id号
-        b[2] = self.gripper_id
-
-        # 数据个数
-        b[3] = datanum
-
-        # 操作码
-        b[4] = 0x11
-
-        # 数据
-        b[5] = self.data2bytes(speed)[0]
-        b[6] = self.data2bytes(speed)[1]
-
-        # 校验和
-        b[7] = self.checknum(b, datanum + 4)
-
-        # 向串口发送数据
-        putdata = b''
-
-        for i in range(1, datanum + 6):
-            putdata = putdata + self.num2str(b[i - 1])
-        self.ser.write(putdata)
-        # print('发送的数据：',putdata)
-        time.sleep(0.01)
-        getdata = self.ser.read(7)
-        self.send_receive_display(datanum, putdata, getdata)
+        self.request('open', speed)
         if self.wait_movement:
             self.wait_till_stop()
 
@@ -301,38 +134,7 @@ class InspireGripper(GripperBase):
         if power is None:
             power = self.force
         assert 0 < speed <= 1000 and 50 <= power <= 1000, 'setting out-of-range'
-        datanum = 0x05
-        b = [0] * (datanum + 5)
-        # 包头
-        b[0] = 0xEB
-        b[1] = 0x90
-        # id号
-        b[2] = self.gripper_id
-
-        # 数据个数
-        b[3] = datanum
-
-        # 操作码
-        b[4] = 0x10
-
-        # 数据
-        b[5] = self.data2bytes(speed)[0]
-        b[6] = self.data2bytes(speed)[1]
-        b[7] = self.data2bytes(power)[0]
-        b[8] = self.data2bytes(power)[1]
-        # 校验和
-        b[9] = self.checknum(b, datanum + 4)
-
-        # 向串口发送数据
-        putdata = b''
-
-        for i in range(1, datanum + 6):
-            putdata = putdata + self.num2str(b[i - 1])
-        self.ser.write(putdata)
-        # print('发送的数据：',putdata)
-        time.sleep(0.01)
-        getdata = self.ser.read(7)
-        self.send_receive_display(datanum, putdata, getdata)
+        self.request('close', speed, power)
         if self.wait_movement:
             self.wait_till_stop()
 
@@ -343,156 +145,31 @@ class InspireGripper(GripperBase):
         if power is None:
             power = self.force
         assert 0 < speed <= 1000 and 50 <= power <= 1000, 'setting out-of-range'
-
-        datanum = 0x05
-        b = [0] * (datanum + 5)
-        # 包头
-        b[0] = 0xEB
-        b[1] = 0x90
-        # id号
-        b[2] = self.gripper_id
-
-        # 数据个数
-        b[3] = datanum
-
-        # 操作码
-        b[4] = 0x18
-
-        # 数据
-        b[5] = self.data2bytes(speed)[0]
-        b[6] = self.data2bytes(speed)[1]
-        b[7] = self.data2bytes(power)[0]
-        b[8] = self.data2bytes(power)[1]
-        # 校验和
-        b[9] = self.checknum(b, datanum + 4)
-
-        # 向串口发送数据
-        putdata = b''
-
-        for i in range(1, datanum + 6):
-            putdata = putdata + self.num2str(b[i - 1])
-        self.ser.write(putdata)
-        # print('发送的数据：',putdata)
-        time.sleep(0.05)
-        getdata = self.ser.read(7)
-        self.send_receive_display(datanum, putdata, getdata)
+        self.request('grip', speed, power)
         if self.wait_movement:
             self.wait_till_stop()
 
     def getopenlimit(self, ):
-        """读取开口限位"""
-
-        datanum = 0x01
-        b = [0] * (datanum + 5)
-        # 包头
-        b[0] = 0xEB
-        b[1] = 0x90
-
-        # gripper_id号
-        b[2] = self.gripper_id
-
-        # 数据个数
-        b[3] = datanum
-
-        # 操作码
-        b[4] = 0x13
-
-        # 校验和
-        b[5] = self.checknum(b, datanum + 4)
-
-        # 向串口发送数据
-        putdata = b''
-        for i in range(1, datanum + 6):
-            putdata = putdata + self.num2str(b[i - 1])
-        self.ser.write(putdata)
-        time.sleep(0.05)
-        getdata = self.ser.read(10)
-        self.send_receive_display(datanum, putdata, getdata)
-
-        openlimit = [0] * 2
-        for i in range(1, 3):
-            if getdata[i * 2 + 3] == 0xff and getdata[i * 2 + 4] == 0xff:
-                openlimit[i - 1] = -1
-            else:
-                openlimit[i - 1] = getdata[i * 2 + 3] + (
-                        getdata[i * 2 + 4] << 8)
-        return openlimit
+        """读取开口限位, None if the gripper does not answer"""
+        reply = self.request('get_open_limit')
+        if reply is None:
+            return None
+        return decode_words(reply)[:2]
 
     def getcopen(self, ):
         """读取当前开口"""
-        for i in range(5):
-            self.ser.read(13)
-
-        datanum = 0x01
-        b = [0] * (datanum + 5)
-        # 包头
-        b[0] = 0xEB
-        b[1] = 0x90
-
-        # gripper_id号
-        b[2] = self.gripper_id
-
-        # 数据个数
-        b[3] = datanum
-
-        # 操作码
-        b[4] = 0xD9
-
-        # 校验和
-        b[5] = self.checknum(b, datanum + 4)
-
-        # 向串口发送数据
-        putdata = b''
-        for i in range(1, datanum + 6):
-            putdata = putdata + self.num2str(b[i - 1])
-        self.ser.write(putdata)
-        time.sleep(0.05)
-        getdata = self.ser.read(8)
-        self.send_receive_display(datanum, putdata, getdata)
-
-        copen = [0] * 1
-
-        try:
-            for i in range(1, 2):
-                if getdata[i * 2 + 3] == 0xff and getdata[i * 2 + 4] == 0xff:
-                    copen[i - 1] = -1
-                else:
-                    copen[i - 1] = getdata[i * 2 + 3] + (
-                            getdata[i * 2 + 4] << 8)
-            return copen
-        except:
+        reply = self.request('get_open')
+        if reply is None:
             return -1, None
+        return decode_words(reply)[:1]
 
     def getstate(self, ):
-        """读取当前状态"""
-
-        datanum = 0x01
-        b = [0] * (datanum + 5)
-        # 包头
-        b[0] = 0xEB
-        b[1] = 0x90
-
-        # gripper_id号
-        b[2] = self.gripper_id
-
-        # 数据个数
-        b[3] = datanum
-
-        # 操作码
-        b[4] = 0x41
-
-        # 校验和
-        b[5] = self.checknum(b, datanum + 4)
-
-        # 向串口发送数据
-        putdata = b''
-        for i in range(1, datanum + 6):
-            putdata = putdata + self.num2str(b[i - 1])
-        self.ser.write(putdata)
-        time.sleep(0.05)
-        getdata = self.ser.read(13)
-        self.show_state(getdata)
-        return getdata
+        """读取当前状态, return the raw reply, empty without reply"""
+        reply = self.request('get_state')
+        if reply is None:
+            return b''
+        self.show_state(reply.raw)
+        return reply.raw
 
     @ignore_exception(logger,
                       error=IndexError,
@@ -537,146 +214,67 @@ class InspireGripper(GripperBase):
                 f"{((getdata[11] << 8) & 0xff00) + getdata[10]}")
         self.logger.debug(msg)
 
-    @ignore_exception(logger,
-                      error=IndexError,
-                      message=("Incomplete data received, couldn't unpack "
-                               "received info."))
-    def send_receive_display(self, datanum, putdata, getdata=None):
-        msg = f"Sent data:"
-        for i in range(1, datanum + 6):
-            msg += f"\n{' ' * 4}{hex(putdata[i - 1])} "
-        if getdata is not None:
-            msg += f"\nReceived data:"
-            for i in range(1, 8):
-                msg += f"\n{' ' * 4}{hex(getdata[i - 1])} "
-        self.logger.debug(msg)
-
     def setestop(self, ):
         """急停"""
-
-        datanum = 0x01
-        b = [0] * (datanum + 5)
-        # 包头
-        b[0] = 0xEB
-        b[1] = 0x90
-        # id号
-        b[2] = self.gripper_id
-
-        # 数据个数
-        b[3] = datanum
-
-        # 操作码
-        b[4] = 0x16
-
-        # 校验和
-        b[5] = self.checknum(b, datanum + 4)
-
-        # 向串口发送数据
-        putdata = b''
-
-        for i in range(1, datanum + 6):
-            putdata = putdata + self.num2str(b[i - 1])
-        self.ser.write(putdata)
-        time.sleep(0.01)
-        getdata = self.ser.read(7)
-
-        self.send_receive_display(datanum, putdata, getdata)
+        self.request('estop')
 
     def setparam(self, ):
         """参数固化"""
-
-        datanum = 0x01
-        b = [0] * (datanum + 5)
-        # 包头
-        b[0] = 0xEB
-        b[1] = 0x90
-        # id号
-        b[2] = self.gripper_id
-
-        # 数据个数
-        b[3] = datanum
-
-        # 操作码
-        b[4] = 0x01
-
-        # 校验和
-        b[5] = self.checknum(b, datanum + 4)
-
-        # 向串口发送数据
-        putdata = b''
-
-        for i in range(1, datanum + 6):
-            putdata = putdata + self.num2str(b[i - 1])
-        self.ser.write(putdata)
-        time.sleep(0.01)
-        getdata = self.ser.read(7)
-        self.send_receive_display(datanum, putdata, getdata)
+        self.request('save_param')
 
     def setfrsvd(self, ):
         """清除故障"""
-
-        datanum = 0x01
-        b = [0] * (datanum + 5)
-        # 包头
-        b[0] = 0xEB
-        b[1] = 0x90
-        # id号
-        b[2] = self.gripper_id
-
-        # 数据个数
-        b[3] = datanum
-
-        # 操作码
-        b[4] = 0x17
-
-        # 校验和
-        b[5] = self.checknum(b, datanum + 4)
-
-        # 向串口发送数据
-        putdata = b''
-
-        for i in range(1, datanum + 6):
-            putdata = putdata + self.num2str(b[i - 1])
-        self.ser.write(putdata)
-        self.send_receive_display(datanum, putdata)
+        self.request('clear_fault', reply=False)
 
     def shutdown(self):
+        self.protocol.stop()
         self.ser.close()
         self.logger.debug(f"{self.__repr__()} shut down")
         return True
 
     @ignore_exception(logger,
-                      error=IndexError,
+                      error=(IndexError, struct.error),
                       message=("Incomplete data received, couldn't unpack "
                                "received info."))
-    def wait_till_stop(self, gap=0.2, window=7, max_duration=2, reload=5):
+    def wait_till_stop(self, window=3, max_duration=2, reload=5,
+                       start_timeout=0.1):
+        """
+        Poll the state back to back until the jaws stop, return False after
+        max_duration.
+        Once a moving state was seen, the first stopped state (in place,
+        stopped or blocked by force) ends the wait. As the motion may not be
+        reported yet right after the command, without it the jaws are
+        stopped once window replies in a row are not moving and
+        start_timeout passed. After reload requests without reply, the port
+        is opened again.
+        """
         start = time.time()
-        states = [-1] * window
-        pointer = 0
-        while True:
-            time.sleep(gap)
-            state = self.getstate()
-            for i in range(reload):
-                if len(state) > 5:
-                    break
-                time.sleep(gap * 2)
-                state = self.getstate()
+        moved = False
+        stopped = 0
+        failures = 0
+        while time.time() - start < max_duration:
+            reply = self.request('get_state')
+            if reply is None:
+                failures += 1
+                if failures >= reload:
+                    self.logger.warning(f"{self.__repr__()} does not "
+                                        f"answer, reconnecting")
+                    self.protocol.stop()
+                    self.ser.close()
+                    self.connect_serial()
+                    failures = 0
+                continue
+            failures = 0
+            self.show_state(reply.raw)
+            state = decode_state(reply).state
+            if state in MOVING_STATES:
+                moved = True
+                stopped = 0
+            elif moved and state in STOPPED_STATES:
+                return True
             else:
-                self.ser = serial.Serial(self.usb_dir, self.port_number)
-                self.ser.timeout = 0.01
-                self.ser.isOpen()
-
-                self.setopenlimit(self.openmax, self.openmin)
-
-                for i in range(1, 255):
-                    if self.getid(i) == 7:
-                        self.gripper_id = i
-                        break
-
-            states[pointer] = state[5]
-
-            if max(set(states), key=states.count) not in [4, 5, -1]:
-                break
-            if time.time() - start > max_duration:
-                break
-            pointer = (pointer + 1) % window
+                stopped += 1
+                if stopped >= window and \
+                        time.time() - start > start_timeout:
+                    return True
+        return False
@@ -0,0 +1,194 @@
+"""
+Framed serial protocol of the Inspire grippers.
+A command is `0xEB 0x90, id, length, opcode, data, checksum` and the
+gripper replies with the same layout behind its reply header. length
+counts the opcode and the data, the checksum is the low byte of the sum
+of the bytes between the header and the checksum. Data words are 16 bits,
+little endian, -1 being sent as 0xFFFF.
+"""
+import logging
+import struct
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+HEADER = b'\xeb\x90'
+# replies start with 0xEE 0x16, some firmwares echo the command header
+# reversed instead
+REPLY_HEADERS = (b'\xee\x16', b'\x90\xeb')
+
+Command = namedtuple('Command', ['opcode', 'fmt'])
+
+COMMANDS = dict(
+    save_param=Command(0x01, ''),
+    set_id=Command(0x04, 'B'),
+    close=Command(0x10, 'HH'),
+    open=Command(0x11, 'H'),
+    set_open_limit=Command(0x12, 'HH'),
+    get_open_limit=Command(0x13, ''),
+    estop=Command(0x16, ''),
+    clear_fault=Command(0x17, ''),
+    grip=Command(0x18, 'HH'),
+    get_state=Command(0x41, ''),
+    move_to=Command(0x54, 'H'),
+    get_open=Command(0xD9, ''),
+)
+# data layout of each command and the constant part of its checksum
+STRUCTS = {name: struct.Struct('<' + command.fmt)
+           for name, command in COMMANDS.items()}
+CHECKSUMS = {name: STRUCTS[name].size + 1 + command.opcode
+             for name, command in COMMANDS.items()}
+
+Reply = namedtuple('Reply', ['gripper_id', 'opcode', 'data', 'raw'])
+GripperState = namedtuple('GripperState', ['state', 'fault', 'temperature',
+                                           'opening', 'force'])
+STATE_STRUCT = struct.Struct('<BBBHH')
+
+# states reported by get_state
+MAX_IN_PLACE = 1
+MIN_IN_PLACE = 2
+STOP_IN_PLACE = 3
+CLOSING = 4
+OPENING = 5
+FORCE_STOP = 6
+MOVING_STATES = (CLOSING, OPENING)
+STOPPED_STATES = (MAX_IN_PLACE, MIN_IN_PLACE, STOP_IN_PLACE, FORCE_STOP)
+
+
+@lru_cache(maxsize=1024)
+def encode(name, gripper_id, *values):
+    """Return the packet of command name, cached as commands repeat."""
+    data = STRUCTS[name].pack(*(value & 0xffff for value in values))
+    checksum = (CHECKSUMS[name] + gripper_id + sum(data)) & 0xff
+    return b''.join((HEADER, bytes((gripper_id, len(data) + 1,
+                                    COMMANDS[name].opcode)),
+                     data, bytes((checksum,))))
+
+
+def decode_state(reply):
+    """Return the GripperState of a get_state reply."""
+    return GripperState(*STATE_STRUCT.unpack_from(reply.data))
+
+
+def decode_words(reply):
+    """Return the 16 bits words of a reply, 0xFFFF read as -1."""
+    words = struct.unpack_from('<%dH' % (len(reply.data) // 2), reply.data)
+    return [-1 if word == 0xffff else word for word in words]
+
+
+class FrameParser(object):
+    """
+    Split a byte stream into frames, dropping corrupted bytes.
+
+    Args:
+        headers (tuple): the headers frames start with, replies by
+            default, (HEADER,) to parse commands.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, headers=REPLY_HEADERS):
+        self.headers = headers
+        self._buf = bytearray()
+
+    def feed(self, data):
+        """Add received bytes, return the complete frames as Reply."""
+        buf = self._buf
+        buf += data
+        replies = []
+        start = 0
+        while True:
+            start = self._find_header(buf, start)
+            if start < 0 or len(buf) - start < 5:
+                break
+            length = buf[start + 3]
+            end = start + 5 + length
+            if len(buf) < end:
+                break
+            if length == 0 or \
+                    sum(buf[start + 2:end - 1]) & 0xff != buf[end - 1]:
+                self.logger.debug("Dropped corrupted frame %s",
+                                  bytes(buf[start:end]).hex(' '))
+                start += 1
+                continue
+            replies.append(Reply(buf[start + 2], buf[start + 4],
+                                 bytes(buf[start + 5:end - 1]),
+                                 bytes(buf[start:end])))
+            start = end
+        # keep a possible partial header
+        del buf[:len(buf) - 1 if start < 0 else start]
+        return replies
+
+    def _find_header(self, buf, start):
+        found = [i for i in (buf.find(header, start)
+                             for header in self.headers) if i >= 0]
+        return min(found) if found else -1
+
+
+class InspireProtocol(threading.Thread):
+    """
+    Send commands on a serial port and complete them as soon as their
+    reply is parsed by a reader thread.
+
+    Args:
+        ser (serial.Serial): open port, its timeout bounds the reads of the
+            reader thread.
+        timeout (float): default wait for a reply.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, ser, timeout=0.1):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.ser = ser
+        self.timeout = timeout
+        self._parser = FrameParser()
+        self._lock = threading.Lock()
+        self._replied = threading.Event()
+        self._pending = None
+        self._reply = None
+        self._running = True
+        self.start()
+
+    def request(self, name, gripper_id, *values, timeout=None, reply=True):
+        """
+        Send a command and return its Reply, None if the gripper does not
+        answer in time. The bus is half duplex, requests are serialized.
+        """
+        packet = encode(name, gripper_id, *values)
+        with self._lock:
+            self._reply = None
+            self._replied.clear()
+            self._pending = COMMANDS[name].opcode if reply else None
+            self.ser.write(packet)
+            self.logger.debug("Sent %s: %s", name, packet.hex(' '))
+            if not reply:
+                return None
+            if not self._replied.wait(
+                    self.timeout if timeout is None else timeout):
+                self._pending = None
+                self.logger.debug("No reply to %s", name)
+                return None
+            return self._reply
+
+    def run(self):
+        while self._running:
+            try:
+                data = self.ser.read(max(self.ser.in_waiting, 1))
+            # serial.SerialException is an OSError
+            except (OSError, TypeError) as ex:
+                if self._running:
+                    self.logger.warning("Serial read failed: %s", ex)
+                break
+            if not data:
+                continue
+            for reply in self._parser.feed(data):
+                self.logger.debug("Received %s", reply.raw.hex(' '))
+                if reply.opcode == self._pending:
+                    self._pending = None
+                    self._reply = reply
+                    self._replied.set()
+
+    def stop(self):
+        self._running = False
+        if self is not threading.current_thread():
+            self.join(1.)
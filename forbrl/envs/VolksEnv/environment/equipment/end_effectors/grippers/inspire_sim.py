@@ -9,7 +9,11 @@ from ...sim_environments.vrep import vrep_api, OPERATION_MODES
 
 @END_EFFECTORS.register_module
 class InspireGripperSim(InspireGripper):
-    """A python interface for an Inspire gripper in a simulated space. """
+    """
+    A python interface for an Inspire gripper in a simulated space.
+    Actions return once the jaws reach their limit or stall, polling the
+    joint every poll_period, and after time_delay at the latest.
+    """
     logger = logging.getLogger(__name__)
 
     def __init__(self,
@@ -21,6 +25,8 @@ class InspireGripperSim(InspireGripper):
                  openmin=-0.047,
                  time_delay=0.5,
                  mode='blocking',
+                 poll_period=0.05,
+                 stall_time=0.15,
                  ):
 
         self.handle_name = handle_name
@@ -30,6 +36,8 @@ class InspireGripperSim(InspireGripper):
         self.openmax = openmax
         self.openmin = openmin
         self.time_delay = time_delay
+        self.poll_period = poll_period
+        self.stall_time = stall_time
         self.mode = OPERATION_MODES[mode]
         # super().__init__()
 
@@ -64,7 +72,6 @@ class InspireGripperSim(InspireGripper):
 
         return closed
 
-
     def move(self, speed, power):
 
         vrep_api.simxSetJointForce(
@@ -74,4 +81,21 @@ class InspireGripperSim(InspireGripper):
             self.client_id, self.gripper_handle,
             speed, self.mode)
 
-        time.sleep(self.time_delay)
+        self._wait_joint(speed)
+
+    def _wait_joint(self, speed, epsilon=1e-4):
+        """Wait for the jaws moving at speed to reach a limit or stall"""
+        limit = self.openmax if speed > 0 else self.openmin
+        start = time.time()
+        last_pos, last_change = None, start
+        while time.time() - start < self.time_delay:
+            sim_ret, j_pos = vrep_api.simxGetJointPosition(
+                self.client_id, self.gripper_handle, self.mode)
+            now = time.time()
+            if (j_pos - limit) * speed >= 0:
+                break
+            if last_pos is None or abs(j_pos - last_pos) > epsilon:
+                last_pos, last_change = j_pos, now
+            elif now - last_change >= self.stall_time:
+                break
+            time.sleep(self.poll_period)
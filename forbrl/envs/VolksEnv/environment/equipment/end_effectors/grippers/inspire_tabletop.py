@@ -0,0 +1,36 @@
+
+import logging
+
+from .inspire import InspireGripper
+from ..registry import END_EFFECTORS
+from ...sim_environments.tabletop import get_scene
+
+
+@END_EFFECTORS.register_module
+class InspireGripperTableTop(InspireGripper):
+    """
+    A python interface for an Inspire gripper in a `TableTop` simulation.
+    Jaws open and close instantly, and the scene is not thread safe, so
+    the *_async actions run in the calling thread.
+    """
+    logger = logging.getLogger(__name__)
+    asynchronous = False
+
+    def __init__(self, tcp=None):
+        self.tcp = tcp
+        self.client_id = None
+        self.scene = None
+        # super().__init__()
+
+    def connect(self, client_id):
+        self.client_id = client_id
+        self.scene = get_scene(client_id)
+
+    def stop(self):
+        self.client_id = None
+
+    def open(self, speed=None, power=None):
+        self.scene.open_gripper()
+
+    def close(self, speed=None, power=None):
+        return self.scene.close_gripper()
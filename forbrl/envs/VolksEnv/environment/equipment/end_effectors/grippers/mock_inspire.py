@@ -0,0 +1,187 @@
+"""
+A local stand-in for an Inspire gripper on a pseudo terminal, to run
+InspireGripper without hardware.
+It answers the framed protocol of inspire_protocol on the slave side of a
+pty, whose path (`port`) is given to InspireGripper as usb_dir. The jaws
+open between the open limits at a rate proportional to the commanded
+speed, and closing stops on `obstacle` when it is set. Replies come after
+reply_delay plus their transmission time at the baud rate. Faults can be
+injected: dropped or corrupted replies, a fault code in the state and
+periods without any answer (see mute).
+"""
+import logging
+import os
+import random
+import struct
+import threading
+import time
+import tty
+
+from .inspire_protocol import (CLOSING, COMMANDS, FORCE_STOP, HEADER,
+                               MAX_IN_PLACE, MIN_IN_PLACE, OPENING,
+                               REPLY_HEADERS, STOP_IN_PLACE, STRUCTS,
+                               FrameParser)
+
+OPCODES = {command.opcode: name for name, command in COMMANDS.items()}
+
+
+def reply_packet(gripper_id, opcode, data=b'\x01'):
+    """A reply frame, data defaults to the success status."""
+    body = bytes((gripper_id, len(data) + 1, opcode)) + data
+    return REPLY_HEADERS[0] + body + bytes((sum(body) & 0xff,))
+
+
+class MockInspireGripper(object):
+    """
+    Emulate an Inspire gripper on a pty.
+
+    Args:
+        gripper_id (int): id the gripper answers to.
+        stroke_time (float): seconds to travel the 0-1000 range at speed
+            1000.
+        reply_delay (float): seconds before a reply is sent.
+        baudrate (int): used to delay the replies by their transmission
+            time.
+        drop_rate (float): probability not to answer a command.
+        corrupt_rate (float): probability to send a reply with a wrong
+            checksum.
+        seed (int): seed of the fault draws.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, gripper_id=1, stroke_time=0.5, reply_delay=0.002,
+                 baudrate=115200, drop_rate=0., corrupt_rate=0., seed=0):
+        self.gripper_id = gripper_id
+        self.stroke_time = stroke_time
+        self.reply_delay = reply_delay
+        self.baudrate = baudrate
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self._random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.openmax = 1000
+        self.openmin = 0
+        self.opening = 1000
+        self.state = MAX_IN_PLACE
+        self.fault = 0
+        self.temperature = 30
+        self.force = 0
+        # opening where closing jaws meet an object, None for no object
+        self.obstacle = None
+        self._motion = None
+        self._muted_until = 0.
+        # ground truth for benchmarks
+        self.commands = 0
+        self.motion_end = None
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._alive = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._alive = False
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def mute(self, duration):
+        """Ignore all commands for duration seconds, e.g. a cable issue."""
+        self._muted_until = time.time() + duration
+
+    def _serve(self):
+        parser = FrameParser(headers=(HEADER,))
+        while self._alive:
+            try:
+                data = os.read(self._master, 1024)
+            except OSError:
+                break
+            for frame in parser.feed(data):
+                self._handle(frame)
+
+    def _handle(self, frame):
+        name = OPCODES.get(frame.opcode)
+        if name is None or time.time() < self._muted_until or \
+                frame.gripper_id != self.gripper_id:
+            return
+        self.commands += 1
+        with self.lock:
+            data = self._execute(name, STRUCTS[name].unpack(frame.data))
+        if self._random.random() < self.drop_rate:
+            return
+        packet = reply_packet(self.gripper_id, frame.opcode, data)
+        if self._random.random() < self.corrupt_rate:
+            packet = packet[:-1] + bytes(((packet[-1] + 1) & 0xff,))
+        time.sleep(self.reply_delay + len(packet) * 10. / self.baudrate)
+        try:
+            os.write(self._master, packet)
+        except OSError:
+            pass
+
+    def _execute(self, name, values):
+        """Apply a command, return the data of its reply."""
+        self._update()
+        if name == 'open':
+            self._move(self.openmax, values[0], OPENING, MAX_IN_PLACE)
+        elif name in ('close', 'grip'):
+            self.force = values[1]
+            goal, end_state = self.openmin, MIN_IN_PLACE
+            if self.obstacle is not None and self.obstacle > goal:
+                goal, end_state = self.obstacle, FORCE_STOP
+            self._move(goal, values[0], CLOSING, end_state)
+        elif name == 'move_to':
+            goal = min(max(values[0], self.openmin), self.openmax)
+            state = OPENING if goal > self.opening else CLOSING
+            self._move(goal, 1000, state, STOP_IN_PLACE)
+        elif name == 'set_open_limit':
+            self.openmax, self.openmin = values
+        elif name == 'get_open_limit':
+            return struct.pack('<HH', self.openmax, self.openmin)
+        elif name == 'get_state':
+            return struct.pack('<BBBHH', self.state, self.fault,
+                               self.temperature, int(self.opening),
+                               self.force)
+        elif name == 'get_open':
+            return struct.pack('<H', int(self.opening))
+        elif name == 'estop':
+            self._motion = None
+            self.state = STOP_IN_PLACE
+        elif name == 'clear_fault':
+            self.fault = 0
+        elif name == 'set_id':
+            self.gripper_id = values[0]
+        return b'\x01'
+
+    def _move(self, goal, speed, state, end_state):
+        # speeds range from 1 to 1000, 0 would never finish the move
+        rate = 1000. / self.stroke_time * max(speed, 1) / 1000.
+        self._motion = (time.time(), self.opening, goal, rate, end_state)
+        self.state = state
+        self.motion_end = None
+        self._update()
+
+    def _update(self):
+        """Advance the jaws to the current time."""
+        if self._motion is None:
+            return
+        now = time.time()
+        start_time, start, goal, rate, end_state = self._motion
+        travel = rate * (now - start_time)
+        if travel >= abs(goal - start):
+            self.opening = goal
+            self.state = end_state
+            self._motion = None
+            self.motion_end = start_time + abs(goal - start) / rate
+        else:
+            self.opening = start + travel * (1 if goal > start else -1)
@@ -1 +1,6 @@
-from .primitive import Primitive
+from ..registry import OBJECTS
+
+# imported by the first config that uses them, as Primitive loads the V-REP
+# remote API
+OBJECTS.register_lazy(f"{__name__}.primitive.Primitive")
+OBJECTS.register_lazy(f"{__name__}.primitive_tabletop.PrimitiveTableTop")
@@ -0,0 +1,80 @@
+
+import os
+
+import numpy as np
+
+from .primitive import Primitive
+from ..registry import OBJECTS
+from ...sim_environments.tabletop import get_scene
+
+
+def load_half_extents(mesh_file):
+    """Half extents of the bounding box of the vertices in an obj file."""
+    with open(mesh_file) as f:
+        vertices = [line.split()[1:4] for line in f if line.startswith('v ')]
+    vertices = np.array(vertices, dtype=np.float64)
+    return (vertices.max(axis=0) - vertices.min(axis=0)) / 2
+
+
+@OBJECTS.register_module
+class PrimitiveTableTop(Primitive):
+    """
+    Blocks in a `TableTop` simulation, each mesh is approximated by the
+    bounding box of its vertices and dropped on a random face.
+    """
+
+    def __init__(self,
+                 num_obj=10,
+                 obj_mesh_dir=None,
+                 workspace=None,
+                 drop_height=0.15,
+                 drop_offset=0.1,
+                 color_space=np.array([[255., 0., 0.]])):
+        super().__init__(num_obj=num_obj,
+                         obj_mesh_dir=obj_mesh_dir,
+                         workspace=workspace,
+                         drop_height=drop_height,
+                         drop_offset=drop_offset,
+                         color_space=color_space)
+        self.client_id = None
+        self.scene = None
+        self.object_handles = []
+        self.mesh_half_extents = [
+            load_half_extents(os.path.join(self.obj_mesh_dir, mesh))
+            for mesh in self.mesh_list]
+
+    def connect(self, client_id):
+        self.client_id = client_id
+        self.scene = get_scene(client_id)
+
+    def stop(self):
+        self.client_id = None
+
+    def get_pos(self, obj_handle):
+        return self.scene.get_position(obj_handle)
+
+    def get_poss(self):
+        return self.scene.pos[self.object_handles].copy()
+
+    def set_pos(self, obj_handle, pos):
+        self.scene.set_position(obj_handle, pos)
+
+    def remove_obj(self, obj_handle):
+        self.scene.remove_block(obj_handle)
+        self.object_handles.remove(obj_handle)
+
+    def add_objs(self):
+        self.object_handles = []
+        for i, obj_mesh_idx in enumerate(self.obj_mesh_idxs):
+            drop_xy = ((np.diff(self.workspace[:2], axis=1).reshape(-1) -
+                        2 * self.drop_offset) * np.random.random_sample(2) +
+                       self.workspace[:2, 0] + self.drop_offset)
+            obj_pos = np.append(drop_xy, self.drop_height)
+            obj_yaw = 2 * np.pi * np.random.random_sample()
+            # land on a random face
+            half_extents = self.mesh_half_extents[obj_mesh_idx][
+                np.random.permutation(3)]
+
+            handle = self.scene.add_block(half_extents, obj_pos, obj_yaw,
+                                          self.obj_mesh_color[i])
+            self.object_handles.append(handle)
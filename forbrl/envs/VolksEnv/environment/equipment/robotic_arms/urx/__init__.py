@@ -1,2 +1,10 @@
-from .urarm import URArm
-from .urarm_sim import URArmSim
+from .rtde import RTDEClient
+from .mock_rtde import MockRTDEServer
+from .servo_stream import ServoStream
+from ..registry import ROBOTIC_ARMS
+
+# imported by the first config that uses them, as they need math3d and the
+# V-REP remote API
+ROBOTIC_ARMS.register_lazy(f"{__name__}.urarm.URArm")
+ROBOTIC_ARMS.register_lazy(f"{__name__}.urarm_sim.URArmSim")
+ROBOTIC_ARMS.register_lazy(f"{__name__}.urarm_tabletop.URArmTableTop")
@@ -0,0 +1,432 @@
+"""
+A local stand-in for a UR controller, to run URRobot and its monitors
+without a robot.
+It emits client data packets (controller version 3.5) on the secondary
+port 30002 at 10Hz and real-time packets of 692 bytes on port 30003 at
+125Hz. It can also serve RTDE on port 30004 through MockRTDEServer.
+URScript programs sent to the secondary port are interpreted for their
+moves (movel, movej, movep, servoc, movec, stopl, stopj and sleep), other
+statements are ignored, except for the servo loop of ServoStream, which
+makes the arm follow the pose in the RTDE input registers.
+The arm follows a simple kinematic model: the TCP pose is the home pose
+plus the joint offsets from the home joints, so both joint and linear
+moves are consistent with getj and getl. Moves follow a trapezoidal speed
+profile, blend radii are ignored.
+"""
+import logging
+import re
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from .mock_rtde import MockRTDEServer
+from .urrtmon import URRTMonitor
+
+HOME_Q = (0., -1.57, 1.57, -1.57, -1.57, 0.)
+HOME_POSE = (-0.5, 0., 0.3, 0., 3.14, 0.)
+
+
+def _sub_packet(ptype, fmt, values, size):
+    data = struct.pack('!iB' + fmt, size, ptype, *values)
+    return data + bytes(size - len(data))
+
+
+def secondary_packet(timestamp, q, qd, pose, program_running=False,
+                     robot_mode=7):
+    """A client data packet of a controller in version 3.5."""
+    sub_packets = [
+        _sub_packet(0, 'Q???????BBddd', [int(timestamp * 1e3), True, True,
+                                         True, False, False,
+                                         program_running, False, robot_mode,
+                                         0, 1., 1., 1.], 47),
+        _sub_packet(1, 'dddffffB' * 6, sum(
+            ([qi, qi, qdi, 0., 48., 30., 35., 253]
+             for qi, qdi in zip(q, qd)), []), 251),
+        _sub_packet(4, 'd' * 12, list(pose) + [0.] * 6, 101),
+        _sub_packet(3, 'iibbddbbddffffBBb', [0, 0, 0, 0, 0., 0., 0, 0, 0.,
+                                             0., 35., 48., 1., 0.1, 0, 1,
+                                             0], 74),
+        _sub_packet(2, 'bbddfBffB', [0, 0, 0., 0., 24., 0, 0.1, 30., 253],
+                    37),
+        _sub_packet(7, 'd' * 7, [0.] * 7, 61),
+        _sub_packet(8, '??', [False, False], 7),
+        _sub_packet(9, '', [], 53),
+    ]
+    body = b''.join(sub_packets)
+    return struct.pack('!iB', len(body) + 5, 16) + body
+
+
+def realtime_packet(timestamp, q, qd, q_target, pose, force=(0.,) * 6):
+    """A real-time packet of 692 bytes."""
+    zeros = [0.] * 6
+    values = ([timestamp] + list(q_target) + zeros * 4 + list(q) + list(qd)
+              + zeros + [0.] * 18 + list(force) + list(pose) + zeros + [0])
+    payload = URRTMonitor.rtstruct692.pack(*values)
+    return struct.pack('>i', len(payload) + 4) + payload
+
+
+_FLOAT = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+_VECTOR = re.compile(r'p?\[([^\[\]]*)\]')
+_KWARG = re.compile(r'\b([avrt])\s*=\s*(' + _FLOAT + ')')
+_CALL = re.compile(r'^\s*(\w+)\s*\((.*)\)\s*$')
+
+
+def parse_program(prog):
+    """
+    Return the moves of a URScript program as a list of (command, targets,
+    kwargs), targets being the vectors in the call.
+    """
+    moves = []
+    for line in prog.splitlines():
+        match = _CALL.match(line)
+        if match is None:
+            continue
+        command, args = match.groups()
+        targets = [np.array([float(v) for v in vector.split(',')])
+                   for vector in _VECTOR.findall(args)]
+        kwargs = {k: float(v) for k, v in _KWARG.findall(args)}
+        if command == 'sleep':
+            kwargs['t'] = float(args)
+        # the target of movej is a pose given to get_inverse_kin
+        kwargs['ik'] = 'get_inverse_kin' in args
+        moves.append((command, targets, kwargs))
+    return moves
+
+
+_SERVO_LOOP = re.compile(r'while\s+read_input_integer_register\((\d+)\)')
+_FLOAT_REGISTER = re.compile(r'read_input_float_register\((\d+)\)')
+_ECHO = re.compile(r'write_output_integer_register\((\d+),\s*'
+                   r'read_input_integer_register\((\d+)\)\)')
+_LOOKAHEAD = re.compile(r'lookahead_time\s*=\s*(' + _FLOAT + ')')
+
+
+def parse_servo_loop(prog):
+    """
+    Return the registers and lookahead time of a servo loop program (see
+    ServoStream), None if prog is not one.
+    """
+    loop = _SERVO_LOOP.search(prog)
+    echo = _ECHO.search(prog)
+    pose = _FLOAT_REGISTER.findall(prog)
+    if loop is None or echo is None or len(pose) != 6 or \
+            'servoj' not in prog:
+        return None
+    lookahead = _LOOKAHEAD.search(prog)
+    return dict(active=int(loop.group(1)), pose=[int(i) for i in pose],
+                echo=int(echo.group(1)), seq=int(echo.group(2)),
+                lookahead=float(lookahead.group(1)) if lookahead else 0.1)
+
+
+class _Motion(object):
+    """A straight move in joint or pose space with a trapezoidal profile."""
+
+    def __init__(self, start, goal, vel, acc, space):
+        self.start = start
+        self.goal = goal
+        self.vel = vel
+        self.acc = acc
+        self.space = space
+        delta = goal - start
+        # linear moves are timed on the translation, rotations follow
+        metric = delta if space == 'joint' else delta[:3]
+        self.length = np.linalg.norm(metric)
+        if self.length == 0 and space != 'joint':
+            self.length = np.linalg.norm(delta[3:])
+        self.direction = delta / self.length if self.length else delta
+        self.done = 0.
+        self.speed = 0.
+
+    def step(self, dt):
+        """Advance by dt, return the position and whether it is finished."""
+        remaining = self.length - self.done
+        self.speed = min(self.speed + self.acc * dt, self.vel,
+                         (2 * self.acc * remaining) ** 0.5)
+        self.done = min(self.done + max(self.speed * dt, 1e-6), self.length)
+        finished = self.done >= self.length
+        if finished:
+            return self.goal.copy(), True
+        return self.start + self.direction * self.done, False
+
+
+class MockURController(object):
+    """
+    Serve a simulated UR arm on address.
+
+    Args:
+        address (str): address to bind, the ports are fixed as URRobot
+            expects them.
+        step_time (float): control period, real-time packets are sent at
+            every step.
+        secondary_period (float): period of the secondary packets.
+        start_delay (float): seconds before a received program runs.
+        rtde (bool): also serve RTDE on port 30004.
+        ports (tuple): secondary, real-time and RTDE ports.
+        home_q (tuple): initial joint positions.
+        home_pose (tuple): TCP pose at home_q.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, address='127.0.0.1', step_time=0.008,
+                 secondary_period=0.1, start_delay=0.02, rtde=True,
+                 ports=(30002, 30003, 30004), home_q=HOME_Q,
+                 home_pose=HOME_POSE):
+        self.step_time = step_time
+        self.secondary_period = secondary_period
+        self.start_delay = start_delay
+        self.home_q = np.array(home_q, dtype=float)
+        self.home_pose = np.array(home_pose, dtype=float)
+
+        self.lock = threading.RLock()
+        self.q = self.home_q.copy()
+        self.qd = np.zeros(6)
+        self.q_target = self.q.copy()
+        self.time = 0.
+        self.program = None
+        self.servo = None
+        self.program_start = None
+        self.program_running = False
+        self.motion = None
+        self.sleep_until = None
+        # when the last program was received and when its moves ended,
+        # ground truth for benchmarks
+        self.program_received = None
+        self.motion_end = None
+        self.programs = 0
+
+        self._alive = True
+        self._secondary = []
+        self._realtime = []
+        self._socks = []
+        for port, handler in zip(ports[:2], (self._serve_secondary,
+                                             self._serve_realtime)):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((address, port))
+            sock.listen()
+            self._socks.append(sock)
+            threading.Thread(target=self._accept, args=(sock, handler),
+                             daemon=True).start()
+        self.rtde = None
+        if rtde:
+            self.rtde = MockRTDEServer(address, ports[2], version=(3, 5, 0, 0),
+                                       max_frequency=125.)
+        self._update_rtde()
+        self._thread = threading.Thread(target=self._simulate, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._alive = False
+        for sock in self._socks:
+            sock.close()
+        with self.lock:
+            connections = self._secondary + self._realtime
+        for conn in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        if self.rtde is not None:
+            self.rtde.close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def pose(self):
+        return self.home_pose + (self.q - self.home_q)
+
+    def _to_q(self, pose):
+        return self.home_q + (pose - self.home_pose)
+
+    def _accept(self, sock, handler):
+        while self._alive:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=handler, args=(conn,),
+                             daemon=True).start()
+
+    def _serve_realtime(self, conn):
+        with self.lock:
+            self._realtime.append(conn)
+
+    def _serve_secondary(self, conn):
+        with self.lock:
+            self._secondary.append(conn)
+        text = ''
+        try:
+            while True:
+                data = conn.recv(4096)
+                if not data:
+                    break
+                text += data.decode()
+                text = self._read_programs(text)
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                if conn in self._secondary:
+                    self._secondary.remove(conn)
+            conn.close()
+
+    def _read_programs(self, text):
+        """Run the complete programs in text, return what is left."""
+        while '\n' in text:
+            if text.lstrip().startswith('def '):
+                match = re.search(r'^end\s*$', text, re.MULTILINE)
+                if match is None:
+                    return text
+                prog, text = text[:match.end()], text[match.end():]
+            else:
+                prog, text = text.split('\n', 1)
+            if prog.strip():
+                self.run_program(prog)
+        return text
+
+    def run_program(self, prog):
+        """Abort the running program and run prog."""
+        self.logger.debug(f"Received program: {prog}")
+        with self.lock:
+            self.servo = parse_servo_loop(prog)
+            self.program = [] if self.servo else parse_program(prog)
+            self.program_start = time.time() + self.start_delay
+            self.program_received = time.time()
+            self.motion_end = None
+            self.motion = None
+            self.sleep_until = None
+            self.programs += 1
+
+    def _next_motion(self):
+        """Start the next statement of the program, False if it ended."""
+        while self.program:
+            command, targets, kwargs = self.program.pop(0)
+            vel = kwargs.get('v', 0.25 if command == 'movel' else 1.05)
+            acc = kwargs.get('a', 1.2 if command == 'movel' else 1.4)
+            if command in ('stopl', 'stopj'):
+                self.program = []
+                return False
+            if command == 'sleep':
+                self.sleep_until = self.time + kwargs['t']
+                return True
+            if not targets:
+                continue
+            if command == 'movej':
+                if kwargs.get('ik'):
+                    goal = self._to_q(targets[0])
+                else:
+                    goal = targets[0]
+                self.motion = _Motion(self.q.copy(), goal, vel, acc, 'joint')
+                return True
+            if command in ('movel', 'movep', 'servoc', 'movec'):
+                self.motion = _Motion(self.pose, targets[-1], vel, acc,
+                                      'pose')
+                return True
+        return False
+
+    def _step(self):
+        dt = self.step_time
+        self.time += dt
+        previous = self.q.copy()
+        if self.program is not None and time.time() >= self.program_start:
+            self.program_running = True
+            if self.servo is not None and not self._servo_step(dt):
+                self._end_program()
+            while self.servo is None and self.program is not None:
+                if self.motion is not None:
+                    position, finished = self.motion.step(dt)
+                    if self.motion.space == 'joint':
+                        self.q = position
+                    else:
+                        self.q = self._to_q(position)
+                    self.q_target = self.q.copy()
+                    if finished:
+                        self.motion = None
+                    break
+                if self.sleep_until is not None:
+                    if self.time < self.sleep_until:
+                        break
+                    self.sleep_until = None
+                if not self._next_motion():
+                    self._end_program()
+                    break
+                if self.motion is None and self.sleep_until is None:
+                    break
+        self.qd = (self.q - previous) / dt
+
+    def _end_program(self):
+        self.program = None
+        self.servo = None
+        self.program_running = False
+        self.motion_end = time.time()
+
+    def _servo_step(self, dt):
+        """Follow the pose in the input registers, False once released."""
+        if self.rtde is None:
+            return False
+        servo = self.servo
+        with self.rtde.lock:
+            inputs = self.rtde.inputs
+            if inputs.get(f"input_int_register_{servo['active']}") != 1:
+                return False
+            target = np.array([inputs[f"input_double_register_{i}"]
+                               for i in servo['pose']])
+            self.rtde.outputs[f"output_int_register_{servo['echo']}"] = \
+                inputs[f"input_int_register_{servo['seq']}"]
+        # servoj with a lookahead time acts as a first order lag
+        pose = self.pose
+        pose += (target - pose) * min(dt / max(servo['lookahead'], dt), 1.)
+        self.q = self._to_q(pose)
+        self.q_target = self._to_q(target)
+        return True
+
+    def _update_rtde(self):
+        if self.rtde is None:
+            return
+        with self.rtde.lock:
+            self.rtde.outputs.update(
+                actual_q=self.q.tolist(), actual_qd=self.qd.tolist(),
+                target_q=self.q_target.tolist(),
+                actual_TCP_pose=self.pose.tolist(),
+                target_TCP_pose=self.pose.tolist(),
+                runtime_state=2 if self.program_running else 1)
+
+    def _send(self, connections, packet):
+        for conn in list(connections):
+            try:
+                conn.sendall(packet)
+            except OSError:
+                with self.lock:
+                    if conn in connections:
+                        connections.remove(conn)
+
+    def _simulate(self):
+        next_tick = time.time()
+        next_secondary = next_tick
+        while self._alive:
+            next_tick += self.step_time
+            with self.lock:
+                self._step()
+                self._update_rtde()
+                rt_packet = realtime_packet(self.time, self.q, self.qd,
+                                            self.q_target, self.pose)
+                secondary = False
+                if time.time() >= next_secondary:
+                    next_secondary += self.secondary_period
+                    sec_packet = secondary_packet(
+                        self.time, self.q, self.qd, self.pose,
+                        self.program_running)
+                    secondary = True
+            self._send(self._realtime, rt_packet)
+            if secondary:
+                self._send(self._secondary, sec_packet)
+            time.sleep(max(next_tick - time.time(), 0))
@@ -0,0 +1,239 @@
+"""
+A local stand-in for the RTDE interface of a UR controller, to run
+RTDEClient without a robot.
+It speaks the RTDE protocol (version 1 and 2) over TCP and streams the
+values of `outputs` at the frequency of each client recipe. Inputs written
+by clients land in `inputs`. Both are plain dicts: whatever simulates the
+robot updates `outputs` and reads `inputs`.
+"""
+import itertools
+import logging
+import socket
+import struct
+import threading
+import time
+
+from .rtde import (CONTROL_PACKAGE_PAUSE, CONTROL_PACKAGE_SETUP_INPUTS,
+                   CONTROL_PACKAGE_SETUP_OUTPUTS, CONTROL_PACKAGE_START,
+                   DATA_PACKAGE, GET_URCONTROL_VERSION, INPUTS, OUTPUTS,
+                   REQUEST_PROTOCOL_VERSION, TYPE_CODES, Recipe,
+                   pack_package, recv_package, variable_type)
+
+
+def default_value(vtype):
+    code = TYPE_CODES[vtype]
+    value = False if code == "?" else 0. if code[-1] == "d" else 0
+    if code[:-1]:
+        return [value] * int(code[:-1])
+    return value
+
+
+class MockRTDEServer(object):
+    """
+    Serve RTDE on address:port.
+
+    Args:
+        address (str): address to bind.
+        port (int): port to bind, 0 picks a free one (see `port`).
+        version (tuple): controller version (major, minor, bugfix, build).
+        max_frequency (float): highest output frequency, 125 for CB3 and
+            500 for e-Series controllers.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, address='127.0.0.1', port=30004, version=(5, 9, 0, 0),
+                 max_frequency=500.):
+        self.version = version
+        self.max_frequency = max_frequency
+        self.lock = threading.Lock()
+        self.outputs = {name: default_value(vtype)
+                        for name, vtype in OUTPUTS.items()}
+        self.outputs.update(robot_mode=7, safety_mode=1, runtime_state=1,
+                            speed_scaling=1., target_speed_fraction=1.)
+        self.inputs = {name: default_value(vtype)
+                       for name, vtype in INPUTS.items()}
+        self.input_owners = dict()
+        self._start_time = time.time()
+        self._recipe_ids = itertools.count(1)
+
+        self._connections = []
+        self._alive = True
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((address, port))
+        self._sock.listen()
+        self.address, self.port = self._sock.getsockname()
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+        self.logger.debug(f"Mock RTDE server listening on "
+                          f"{self.address}:{self.port}")
+
+    def close(self):
+        self._alive = False
+        self._sock.close()
+        with self.lock:
+            connections = list(self._connections)
+        for conn in connections:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _accept(self):
+        while self._alive:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = _Connection(self, conn)
+            with self.lock:
+                self._connections.append(connection)
+
+    def read_outputs(self, recipe):
+        with self.lock:
+            self.outputs['timestamp'] = time.time() - self._start_time
+            return recipe.pack(self.outputs)
+
+    def write_inputs(self, recipe, values):
+        with self.lock:
+            for name in recipe.names:
+                self.inputs[name] = recipe.get(values, name)
+
+
+class _Connection(object):
+    """A client connection, with its recipes and output stream."""
+
+    def __init__(self, server, sock):
+        self.server = server
+        self.sock = sock
+        self.send_lock = threading.Lock()
+        self.protocol = 1
+        self.output_recipe = None
+        self.frequency = 125.
+        self.input_recipes = dict()
+        self.streaming = threading.Event()
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+        self.stream_thread = threading.Thread(target=self._stream,
+                                              daemon=True)
+        self.stream_thread.start()
+
+    def close(self):
+        self.streaming.clear()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def _send(self, ptype, payload=b""):
+        with self.send_lock:
+            self.sock.sendall(pack_package(ptype, payload))
+
+    def _serve(self):
+        try:
+            while True:
+                self._handle(*recv_package(self.sock))
+        except OSError:
+            pass
+        finally:
+            self.streaming.clear()
+            with self.server.lock:
+                if self in self.server._connections:
+                    self.server._connections.remove(self)
+                for name, owner in list(self.server.input_owners.items()):
+                    if owner is self:
+                        del self.server.input_owners[name]
+            self.sock.close()
+
+    def _handle(self, ptype, payload):
+        server = self.server
+        if ptype == REQUEST_PROTOCOL_VERSION:
+            version = struct.unpack(">H", payload)[0]
+            accepted = version in (1, 2)
+            if accepted:
+                self.protocol = version
+            self._send(ptype, struct.pack(">B", accepted))
+        elif ptype == GET_URCONTROL_VERSION:
+            self._send(ptype, struct.pack(">IIII", *server.version))
+        elif ptype == CONTROL_PACKAGE_SETUP_OUTPUTS:
+            if self.protocol >= 2:
+                frequency = struct.unpack(">d", payload[:8])[0]
+                payload = payload[8:]
+            else:
+                frequency = 125.
+            names = bytes(payload).decode().split(",")
+            types = [variable_type(name) or "NOT_FOUND" for name in names]
+            recipe_id = 0
+            if "NOT_FOUND" not in types and \
+                    0 < frequency <= server.max_frequency:
+                recipe_id = next(server._recipe_ids)
+                self.output_recipe = Recipe(recipe_id, names, types)
+                self.frequency = frequency
+                with server.lock:
+                    for name, vtype in zip(names, types):
+                        server.outputs.setdefault(name, default_value(vtype))
+            self._send(ptype, struct.pack(">B", recipe_id) +
+                       ",".join(types).encode())
+        elif ptype == CONTROL_PACKAGE_SETUP_INPUTS:
+            names = bytes(payload).decode().split(",")
+            with server.lock:
+                types = []
+                for name in names:
+                    vtype = variable_type(name, inputs=True)
+                    if vtype is None:
+                        vtype = "NOT_FOUND"
+                    elif server.input_owners.get(name, self) is not self:
+                        vtype = "IN_USE"
+                    types.append(vtype)
+                recipe_id = 0
+                if all(t in TYPE_CODES for t in types):
+                    recipe_id = next(server._recipe_ids)
+                    self.input_recipes[recipe_id] = Recipe(recipe_id, names,
+                                                           types)
+                    for name, vtype in zip(names, types):
+                        server.input_owners[name] = self
+                        server.inputs.setdefault(name, default_value(vtype))
+            self._send(ptype, struct.pack(">B", recipe_id) +
+                       ",".join(types).encode())
+        elif ptype == CONTROL_PACKAGE_START:
+            accepted = self.output_recipe is not None or \
+                bool(self.input_recipes)
+            if accepted:
+                self.streaming.set()
+            self._send(ptype, struct.pack(">B", accepted))
+        elif ptype == CONTROL_PACKAGE_PAUSE:
+            self.streaming.clear()
+            self._send(ptype, struct.pack(">B", True))
+        elif ptype == DATA_PACKAGE:
+            recipe = self.input_recipes.get(payload[0])
+            if recipe is None:
+                self.server.logger.warning(f"Data package of unknown recipe "
+                                           f"{payload[0]}")
+                return
+            server.write_inputs(recipe, recipe.unpack(payload))
+        else:
+            self.server.logger.warning(f"Unknown package type {ptype}")
+
+    def _stream(self):
+        next_tick = time.time()
+        while True:
+            if not self.streaming.is_set():
+                if self.sock.fileno() == -1:
+                    break
+                self.streaming.wait(0.1)
+                next_tick = time.time()
+                continue
+            recipe = self.output_recipe
+            if recipe is not None:
+                try:
+                    self._send(DATA_PACKAGE,
+                               self.server.read_outputs(recipe))
+                except OSError:
+                    break
+            next_tick += 1. / self.frequency
+            time.sleep(max(next_tick - time.time(), 0))
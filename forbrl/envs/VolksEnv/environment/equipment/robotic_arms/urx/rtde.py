@@ -0,0 +1,353 @@
+"""
+Client of the Real-Time Data Exchange (RTDE) interface of UR controllers
+over socket port 30004 (controller versions >= 3.4).
+Outputs are subscribed to with a recipe of variable names and are streamed
+by the controller at up to 125Hz (CB3) or 500Hz (e-Series). Inputs are
+written with recipes too, e.g. to registers read by a running URScript.
+https://www.universal-robots.com/articles/ur/interface-communication/real-time-data-exchange-rtde-guide/
+"""
+import logging
+import re
+import socket
+import struct
+import threading
+import time
+from queue import Queue, Empty
+
+PROTOCOL_VERSION = 2
+
+# package types
+REQUEST_PROTOCOL_VERSION = 86  # 'V'
+GET_URCONTROL_VERSION = 118  # 'v'
+TEXT_MESSAGE = 77  # 'M'
+DATA_PACKAGE = 85  # 'U'
+CONTROL_PACKAGE_SETUP_OUTPUTS = 79  # 'O'
+CONTROL_PACKAGE_SETUP_INPUTS = 73  # 'I'
+CONTROL_PACKAGE_START = 83  # 'S'
+CONTROL_PACKAGE_PAUSE = 80  # 'P'
+
+HEADER = struct.Struct(">HB")
+
+# struct codes of the data types
+TYPE_CODES = dict(BOOL="?", UINT8="B", UINT32="I", UINT64="Q", INT32="i",
+                  DOUBLE="d", VECTOR3D="3d", VECTOR6D="6d",
+                  VECTOR6INT32="6i", VECTOR6UINT32="6I")
+
+RUNTIME_STATE_PLAYING = 2
+
+OUTPUTS = dict(
+    timestamp="DOUBLE", target_q="VECTOR6D", target_qd="VECTOR6D",
+    target_qdd="VECTOR6D", target_current="VECTOR6D",
+    target_moment="VECTOR6D", actual_q="VECTOR6D", actual_qd="VECTOR6D",
+    actual_current="VECTOR6D", joint_control_output="VECTOR6D",
+    actual_TCP_pose="VECTOR6D", actual_TCP_speed="VECTOR6D",
+    actual_TCP_force="VECTOR6D", target_TCP_pose="VECTOR6D",
+    target_TCP_speed="VECTOR6D", actual_digital_input_bits="UINT64",
+    joint_temperatures="VECTOR6D", actual_execution_time="DOUBLE",
+    robot_mode="INT32", joint_mode="VECTOR6INT32", safety_mode="INT32",
+    actual_tool_accelerometer="VECTOR3D", speed_scaling="DOUBLE",
+    target_speed_fraction="DOUBLE", actual_momentum="DOUBLE",
+    actual_main_voltage="DOUBLE", actual_robot_voltage="DOUBLE",
+    actual_robot_current="DOUBLE", actual_joint_voltage="VECTOR6D",
+    actual_digital_output_bits="UINT64", runtime_state="UINT32",
+    robot_status_bits="UINT32", safety_status_bits="UINT32",
+    output_bit_registers0_to_31="UINT32",
+    output_bit_registers32_to_63="UINT32")
+
+INPUTS = dict(
+    speed_slider_mask="UINT32", speed_slider_fraction="DOUBLE",
+    standard_digital_output_mask="UINT8", standard_digital_output="UINT8",
+    configurable_digital_output_mask="UINT8",
+    configurable_digital_output="UINT8", tool_digital_output_mask="UINT8",
+    tool_digital_output="UINT8")
+
+_REGISTERS = [
+    (re.compile(r"(output|input)_bit_register_(\d+)$"), "BOOL", 64, 127),
+    (re.compile(r"(output|input)_int_register_(\d+)$"), "INT32", 0, 47),
+    (re.compile(r"(output|input)_double_register_(\d+)$"), "DOUBLE", 0, 47),
+]
+
+DEFAULT_OUTPUTS = ("timestamp", "actual_q", "actual_qd", "actual_TCP_pose",
+                   "actual_TCP_force", "runtime_state", "robot_mode",
+                   "safety_mode")
+
+
+class RTDEException(Exception):
+    pass
+
+
+def variable_type(name, inputs=False):
+    """
+    return the data type of a variable, None if there is no such variable
+    """
+    table = INPUTS if inputs else OUTPUTS
+    if name in table:
+        return table[name]
+    for pattern, vtype, low, high in _REGISTERS:
+        match = pattern.match(name)
+        if match and low <= int(match.group(2)) <= high and \
+                (match.group(1) == "input") == inputs:
+            return vtype
+    return None
+
+
+class Recipe(object):
+    """
+    Layout of the data packages of a recipe, with a precompiled struct.
+    """
+
+    def __init__(self, recipe_id, names, types):
+        self.id = recipe_id
+        self.names = tuple(names)
+        self.types = tuple(types)
+        self.struct = struct.Struct(
+            ">B" + "".join(TYPE_CODES[t] for t in self.types))
+        # slice of each variable in the unpacked values, vectors are lists
+        self.slices = {}
+        start = 1
+        for name, vtype in zip(self.names, self.types):
+            size = int(TYPE_CODES[vtype][:-1] or 1)
+            self.slices[name] = (start, start + size, size > 1)
+            start += size
+
+    def unpack(self, data):
+        return self.struct.unpack_from(data)
+
+    def get(self, values, name):
+        start, end, vector = self.slices[name]
+        if vector:
+            return list(values[start:end])
+        return values[start]
+
+    def pack(self, values):
+        flat = [self.id]
+        for name, vtype in zip(self.names, self.types):
+            value = values[name]
+            if TYPE_CODES[vtype][:-1]:
+                flat.extend(value)
+            else:
+                flat.append(value)
+        return self.struct.pack(*flat)
+
+
+def pack_package(ptype, payload=b""):
+    return HEADER.pack(HEADER.size + len(payload), ptype) + payload
+
+
+def recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionResetError("Connection closed")
+        received += n
+    return buf
+
+
+def recv_package(sock):
+    """return the type and payload of the next package"""
+    size, ptype = HEADER.unpack(recv_exact(sock, HEADER.size))
+    return ptype, recv_exact(sock, size - HEADER.size)
+
+
+class RTDEClient(threading.Thread):
+    """
+    Subscribe to robot data through RTDE and write inputs.
+
+    Args:
+        host (str): address of the robot.
+        outputs (tuple): names of the output variables to receive.
+        frequency (float): rate of the data packages, at most 125 on CB3
+            and 500 on e-Series controllers.
+        inputs (tuple): names of the input variables that set_inputs writes,
+            e.g. 'input_double_register_0'.
+        port (int): RTDE port.
+        timeout (float): seconds to wait for replies and for data.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, host, outputs=DEFAULT_OUTPUTS, frequency=125.,
+                 inputs=(), port=30004, timeout=1.):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        if not 0 < frequency <= 500:
+            raise ValueError("RTDE frequency must be in (0, 500], "
+                             "got {}".format(frequency))
+        self.host = host
+        self.frequency = frequency
+        self.timeout = timeout
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._send_lock = threading.Lock()
+        self._replies = Queue()
+        self._dataEvent = threading.Condition()
+        self._values = None
+        self._count = 0  # data packages received
+        self.lastpacket_timestamp = 0
+        self._trystop = False
+
+        try:
+            self._negotiate()
+            self.output_recipe = self._setup_outputs(outputs, frequency)
+            self.input_recipe = None
+            if inputs:
+                self.input_recipe = self._setup_inputs(inputs)
+                self._inputs = dict.fromkeys(inputs, 0)
+            self._request(CONTROL_PACKAGE_START, b"", "start")
+        except Exception:
+            self._sock.close()
+            raise
+        self._sock.settimeout(None)
+        self.start()
+        self.wait(timeout)
+
+    def _send(self, ptype, payload=b""):
+        with self._send_lock:
+            self._sock.sendall(pack_package(ptype, payload))
+
+    def _request(self, ptype, payload, what):
+        """send a control package and return the payload of its reply"""
+        self._send(ptype, payload)
+        while True:
+            if self.is_alive():
+                try:
+                    rtype, reply = self._replies.get(timeout=self.timeout)
+                except Empty:
+                    raise RTDEException("No reply to {}".format(what))
+            else:
+                rtype, reply = recv_package(self._sock)
+            if rtype == ptype:
+                break
+            self._handle(rtype, reply)
+        if ptype in (REQUEST_PROTOCOL_VERSION, CONTROL_PACKAGE_START,
+                     CONTROL_PACKAGE_PAUSE) and not reply[0]:
+            raise RTDEException("Controller refused {}".format(what))
+        return reply
+
+    def _negotiate(self):
+        self._request(REQUEST_PROTOCOL_VERSION,
+                      struct.pack(">H", PROTOCOL_VERSION), "protocol version")
+        reply = self._request(GET_URCONTROL_VERSION, b"", "version")
+        self.controller_version = struct.unpack(">IIII", reply)
+        self.logger.debug("Controller version: %s", self.controller_version)
+
+    def _setup_outputs(self, names, frequency):
+        reply = self._request(
+            CONTROL_PACKAGE_SETUP_OUTPUTS,
+            struct.pack(">d", frequency) + ",".join(names).encode(),
+            "outputs setup")
+        return self._recipe(names, reply)
+
+    def _setup_inputs(self, names):
+        reply = self._request(CONTROL_PACKAGE_SETUP_INPUTS,
+                              ",".join(names).encode(), "inputs setup")
+        return self._recipe(names, reply)
+
+    @staticmethod
+    def _recipe(names, reply):
+        types = bytes(reply[1:]).decode().split(",")
+        if not reply[0] and all(t in TYPE_CODES for t in types):
+            raise RTDEException("Controller refused the recipe, is the "
+                                "frequency too high?")
+        bad = [(n, t) for n, t in zip(names, types) if t not in TYPE_CODES]
+        if bad:
+            raise RTDEException("Variables not available: {}".format(
+                ", ".join("{} ({})".format(n, t) for n, t in bad)))
+        return Recipe(reply[0], names, types)
+
+    def _handle(self, ptype, payload):
+        if ptype == DATA_PACKAGE:
+            recipe = self.output_recipe
+            if payload[0] != recipe.id:
+                self.logger.warning("Data package of unknown recipe %s",
+                                    payload[0])
+                return
+            values = recipe.unpack(payload)
+            with self._dataEvent:
+                self._values = values
+                self._count += 1
+                self.lastpacket_timestamp = time.time()
+                self._dataEvent.notify_all()
+        elif ptype == TEXT_MESSAGE:
+            size = payload[0]
+            self.logger.warning("Message from controller: %s",
+                                bytes(payload[1:1 + size]).decode())
+        else:
+            self._replies.put((ptype, payload))
+
+    def run(self):
+        try:
+            while not self._trystop:
+                self._handle(*recv_package(self._sock))
+        except OSError as ex:
+            if not self._trystop:
+                self.logger.error("RTDE connection lost: %s", ex)
+
+    def wait(self, timeout=None):
+        """
+        wait for next data package from robot
+        """
+        timeout = timeout or self.timeout
+        count = self._count
+        with self._dataEvent:
+            if not self._dataEvent.wait_for(
+                    lambda: self._count != count, timeout):
+                raise RTDEException("Did not receive a data package from "
+                                    "robot in {}".format(timeout))
+
+    def get(self, name, wait=False):
+        """return the last value of an output variable"""
+        if wait:
+            self.wait()
+        with self._dataEvent:
+            values = self._values
+        return self.output_recipe.get(values, name)
+
+    def get_all_data(self, wait=False):
+        """return the last values of all output variables in a dict"""
+        if wait:
+            self.wait()
+        with self._dataEvent:
+            values = self._values
+        return {name: self.output_recipe.get(values, name)
+                for name in self.output_recipe.names}
+
+    def getl(self, wait=False):
+        """get TCP position"""
+        return self.get("actual_TCP_pose", wait)
+
+    def getj(self, wait=False):
+        """get joints position"""
+        return self.get("actual_q", wait)
+
+    def get_tcp_force(self, wait=False):
+        return self.get("actual_TCP_force", wait)
+
+    def is_program_running(self, wait=False):
+        return self.get("runtime_state", wait) == RUNTIME_STATE_PLAYING
+
+    def set_inputs(self, **values):
+        """
+        write input variables of the input recipe, the others keep their
+        last value
+        """
+        if self.input_recipe is None:
+            raise RTDEException("No inputs were set up")
+        unknown = set(values) - set(self._inputs)
+        if unknown:
+            raise RTDEException("Not in the input recipe: {}".format(
+                ", ".join(sorted(unknown))))
+        self._inputs.update(values)
+        self._send(DATA_PACKAGE, self.input_recipe.pack(self._inputs))
+
+    def close(self):
+        self._trystop = True
+        try:
+            self._send(CONTROL_PACKAGE_PAUSE)
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.join(self.timeout)
+        self._sock.close()
@@ -0,0 +1,239 @@
+"""
+Stream TCP setpoints to a UR arm through a persistent servo loop, instead
+of sending a new program (and stopping the arm) for every move.
+One URScript program is sent: it reads a pose from RTDE input registers at
+every control step and servos the arm to it. A producer thread writes the
+setpoints, interpolated at the controller rate, and the program echoes the
+sequence number of the setpoint it uses so that latency and tracking error
+can be measured.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from .rtde import RTDEClient, RTDEException
+from ....utils.transform import rotm2rotvec_batch, rotvec2rotm_batch
+
+SERVO_PROGRAM = """def servo_stream():
+  while read_input_integer_register({active}) == 1:
+    pose = p[{pose}]
+    write_output_integer_register({echo}, read_input_integer_register({seq}))
+    q = get_inverse_kin(pose)
+    servoj(q, t={period}, lookahead_time={lookahead}, gain={gain})
+  end
+  stopj(2.0)
+end
+"""
+
+
+class ServoStream(object):
+    """
+    Servo a UR arm along streamed TCP poses.
+
+    Args:
+        robot (URRobot): the arm, used to send the program and read the
+            start pose.
+        host (str): address of the robot, defaults to robot.host.
+        period (float): control period, 0.008 on CB3 and 0.002 on e-Series.
+        lookahead_time (float): servoj lookahead time, smooths the
+            trajectory and delays it.
+        gain (float): servoj proportional gain.
+        registers (int): first input register used, registers
+            registers..registers+5 hold the pose (double), registers and
+            registers+1 the active flag and sequence number (int), output
+            int register `registers` echoes the sequence number.
+        transform (callable): maps poses given to the stream to the robot
+            base frame.
+        max_latency (float): setpoints not echoed within this time are
+            dropped from the latency statistics.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, robot, host=None, period=0.008, lookahead_time=0.1,
+                 gain=300, registers=0, transform=None, max_latency=1.):
+        self.robot = robot
+        self.host = host or robot.host
+        self.period = period
+        self.lookahead_time = lookahead_time
+        self.gain = gain
+        self.transform = transform
+        r = registers
+        self._pose_names = ["input_double_register_%s" % (r + i)
+                            for i in range(6)]
+        self._active_name = "input_int_register_%s" % r
+        self._seq_name = "input_int_register_%s" % (r + 1)
+        self._echo_name = "output_int_register_%s" % r
+        self.program = SERVO_PROGRAM.format(
+            active=r, seq=r + 1, echo=r, period=period,
+            lookahead=lookahead_time, gain=gain,
+            pose=", ".join("read_input_float_register(%s)" % (r + i)
+                           for i in range(6)))
+
+        self.rtde = None
+        self._thread = None
+        self._running = False
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._setpoint = None
+        self._seq = 0
+        # (seq, time, setpoint) of the setpoints not echoed yet
+        self._sent = deque(maxlen=max(1, int(max_latency / period)))
+        self._echo = 0
+        self.latencies = []
+        self.errors = []
+        self.overruns = 0
+
+    def start(self):
+        """Send the servo program and start streaming the current pose."""
+        self.rtde = RTDEClient(
+            self.host, outputs=("timestamp", "actual_TCP_pose",
+                                "runtime_state", self._echo_name),
+            frequency=min(1. / self.period, 500.),
+            inputs=self._pose_names + [self._active_name, self._seq_name])
+        self._setpoint = np.array(self.rtde.getl(wait=True))
+        self._write(self._setpoint, active=1)
+        self._running = True
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+        self.robot.send_program(self.program)
+
+    def stop(self, wait=True):
+        """
+        Stop the servo loop. With wait, the queued setpoints are sent and
+        the arm settles on the last one first.
+        """
+        if wait:
+            self.wait()
+            self.settle()
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+        self._write(self._setpoint, active=0)
+        self.rtde.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop(wait=args[0] is None)
+
+    def follow(self, poses):
+        """Queue setpoints, one per control period."""
+        poses = np.atleast_2d(poses).astype(float)
+        if self.transform is not None:
+            poses = np.array([self.transform(p) for p in poses])
+        with self._cond:
+            self._queue.extend(poses)
+
+    def move_to(self, poses, vel=0.1, ang_vel=1.):
+        """
+        Queue linear moves through poses at vel (m/s) and at most ang_vel
+        (rad/s), interpolated at the control period. Orientations are
+        interpolated along the shortest rotation (slerp), as rotation
+        vectors flip near pi, e.g. in every tool down pose.
+        """
+        poses = np.atleast_2d(poses).astype(float)
+        if self.transform is not None:
+            poses = np.array([self.transform(p) for p in poses])
+        with self._cond:
+            start = self._queue[-1] if self._queue else self._setpoint
+        setpoints = []
+        for pose in poses:
+            delta = pose[:3] - start[:3]
+            start_rotm = rotvec2rotm_batch(start[3:])
+            # rotation from the start to the pose, in the start frame
+            turn = rotm2rotvec_batch(
+                start_rotm.T @ rotvec2rotm_batch(pose[3:]))
+            duration = max(np.linalg.norm(delta) / vel,
+                           np.linalg.norm(turn) / ang_vel)
+            steps = max(int(np.ceil(duration / self.period)), 1)
+            ratios = np.arange(1, steps + 1)[:, None] / steps
+            rotms = start_rotm @ rotvec2rotm_batch(ratios * turn)
+            setpoints.append(np.hstack([start[:3] + ratios * delta,
+                                        rotm2rotvec_batch(rotms)]))
+            setpoints[-1][-1] = pose
+            start = pose
+        with self._cond:
+            self._queue.extend(np.concatenate(setpoints))
+
+    def wait(self, timeout=None):
+        """Wait until all queued setpoints are sent, False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._queue or not self._running, timeout)
+
+    def settle(self, tolerance=0.001, timeout=2.):
+        """
+        Wait until the tracking error is below tolerance (m), False on
+        timeout.
+        """
+        end = time.time() + timeout
+        count = len(self.errors)
+        while self._running and time.time() < end:
+            if len(self.errors) > count and self.errors[-1] < tolerance:
+                return True
+            time.sleep(self.period)
+        return False
+
+    def _write(self, pose, active=1):
+        values = dict(zip(self._pose_names, pose))
+        values[self._active_name] = active
+        values[self._seq_name] = self._seq
+        self.rtde.set_inputs(**values)
+
+    def _produce(self):
+        next_tick = time.time()
+        while self._running:
+            with self._cond:
+                if self._queue:
+                    self._setpoint = self._queue.popleft()
+                if not self._queue:
+                    self._cond.notify_all()
+            self._seq += 1
+            now = time.time()
+            self._sent.append((self._seq, now, self._setpoint))
+            try:
+                self._write(self._setpoint)
+            except (OSError, RTDEException) as ex:
+                self.logger.error("Servo stream stopped: %s", ex)
+                self._running = False
+                with self._cond:
+                    self._cond.notify_all()
+                break
+            self._measure(now)
+
+            next_tick += self.period
+            delay = next_tick - time.time()
+            if delay < 0:
+                self.overruns += 1
+                next_tick = time.time()
+            else:
+                time.sleep(delay)
+
+    def _measure(self, now):
+        """Latency and tracking error of the setpoint the robot last used."""
+        data = self.rtde.get_all_data()
+        echo = data[self._echo_name]
+        if echo <= self._echo:
+            return
+        self._echo = echo
+        while self._sent and self._sent[0][0] < echo:
+            self._sent.popleft()
+        if not self._sent or self._sent[0][0] != echo:
+            return
+        _, sent, setpoint = self._sent.popleft()
+        self.latencies.append(now - sent)
+        self.errors.append(np.linalg.norm(
+            np.array(data["actual_TCP_pose"][:3]) - setpoint[:3]))
+
+    def stats(self):
+        """Latency (s) and tracking error (m) of the stream so far."""
+        latencies = np.array(self.latencies or [np.nan])
+        errors = np.array(self.errors or [np.nan])
+        return dict(setpoints=self._seq, overruns=self.overruns,
+                    latency_mean=latencies.mean(), latency_max=latencies.max(),
+                    error_mean=errors.mean(), error_max=errors.max())
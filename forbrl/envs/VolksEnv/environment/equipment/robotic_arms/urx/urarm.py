@@ -5,9 +5,14 @@ Python library to control an UR robot through its TCP/IP interface
 import logging
 import time
 
-import math3d as m3d
 import numpy as np
 
+try:
+    import math3d as m3d
+except ImportError:
+    # not needed by the simulated arms, which share the pose helpers
+    m3d = None
+
 from .urrobot import URRobot
 from ..registry import ROBOTIC_ARMS
 
@@ -26,10 +31,13 @@ class URArm(URRobot):
     logger = logging.getLogger(__name__)
     reconnect_times = 50
 
-    def __init__(self, host, use_rt=False, tcp=None, csys=None):
+    def __init__(self, host, use_rt=False, tcp=None, csys=None,
+                 use_rtde=False):
+        if m3d is None:
+            raise ImportError(f"{self.__class__.__name__} needs math3d")
         for i in range(self.reconnect_times):
             try:
-                URRobot.__init__(self, host, use_rt)
+                URRobot.__init__(self, host, use_rt, use_rtde)
                 if not self.is_running():
                     self.arm.close()
                     time.sleep(2)
@@ -57,8 +65,7 @@ class URArm(URRobot):
         else:
             self.set_csys(m3d.Transform(csys))
 
-    def _get_lin_dist(self, target):
-        pose = URRobot.getl(self, wait=True)
+    def _pose_dist(self, target, pose):
         target = m3d.Transform(target)
         pose = m3d.Transform(pose)
         return pose.dist(target)
@@ -215,6 +222,13 @@ class URArm(URRobot):
         return URRobot.movexs(self, command, new_poses, acc, vel, radius,
                               wait=wait, threshold=threshold)
 
+    def servo_stream(self, **kwargs):
+        """Return a ServoStream taking poses in the current csys."""
+        kwargs.setdefault(
+            'transform',
+            lambda pose: (self.csys * m3d.Transform(pose)).pose_vector)
+        return URRobot.servo_stream(self, **kwargs)
+
     def movel_tool(self, pose, acc=0.01, vel=0.01, wait=True, threshold=None):
         """move linear to given pose in tool coordinate"""
         return self.movex_tool("movel", pose, acc=acc, vel=vel, wait=wait,
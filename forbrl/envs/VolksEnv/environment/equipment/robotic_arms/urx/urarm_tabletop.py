@@ -0,0 +1,44 @@
+
+import logging
+
+import numpy as np
+
+from .urarm import URArm
+from ..registry import ROBOTIC_ARMS
+from ...sim_environments.tabletop import get_scene
+
+
+@ROBOTIC_ARMS.register_module
+class URArmTableTop(URArm):
+    """
+    Python interface to an UR robotic arm in a `TableTop` simulation. Only
+    the tool tip is simulated, it moves straight to its target.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self):
+        self.client_id = None
+        self.scene = None
+        # super().__init__()
+
+    def connect(self, client_id):
+        self.client_id = client_id
+        self.scene = get_scene(client_id)
+
+    def stop(self):
+        self.scene = None
+
+    def get_pos(self):
+        return self.scene.tool_pos.copy()
+
+    def set_pos(self, pos):
+        self.scene.move_tool(pos)
+
+    def get_orientation(self):
+        return np.array([np.pi / 2, self.scene.tool_yaw, np.pi / 2])
+
+    def set_orientation(self, ori):
+        self.scene.tool_yaw = ori[1]
+
+    def movel(self, pvector):
+        self.scene.move_tool(pvector[:3], pvector[3])
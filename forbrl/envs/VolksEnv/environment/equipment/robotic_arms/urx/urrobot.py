@@ -5,9 +5,14 @@ Python library to control an UR robot through its TCP/IP interface
 import collections
 import logging
 import numbers
+import threading
+import time
+from concurrent.futures import Future
 
+from . import rtde
 from . import urrtmon
 from . import ursecmon
+from .servo_stream import ServoStream
 
 __author__ = "Olivier Roulet-Dubonnet * 95% + Tianhe Wang * 5%"
 __copyright__ = "Copyright 2011-2015, Sintef Raufoss Manufacturing"
@@ -27,12 +32,14 @@ class URRobot:
     Since parsing the RT interface uses som CPU, and does not support all robots
     versions, it is disabled by default The RT interfaces is only used for
     the get_force related methods
+    With use_rtde, robot data (getl, getj, get_tcp_force,
+    is_program_running) is read through RTDE (port 30004) instead.
     Rmq: A program sent to the robot will be executed immediately and any
     running program will be stopped
     """
     logger = logging.getLogger(__name__)
 
-    def __init__(self, host, use_rt=False):
+    def __init__(self, host, use_rt=False, use_rtde=False):
         self.host = host
         self.csys = None
 
@@ -43,9 +50,17 @@ class URRobot:
         self.rtmon = None
         if use_rt:
             self.rtmon = self.get_realtime_monitor()
+        self.rtde = None
+        if use_rtde:
+            self.logger.debug("Opening RTDE socket")
+            self.rtde = rtde.RTDEClient(self.host)
         # precision of joint movement used to wait for move completion
         # the value must be conservative! otherwise we may wait forever
         self.joinEpsilon = 0.01
+        # joint speed norm (rad/s) under which a move is considered settled
+        self.settleEpsilon = 0.005
+        # seconds without real-time data before a move wait fails
+        self.rtmon_timeout = 0.5
         # URScript is limited in the character length of floats it accepts
         self.max_float_length = 6  # FIXME: check max length!!!
 
@@ -77,6 +92,8 @@ class URRobot:
         Warning!!!!!:  After sending a program it might take several 10th of
         a second before the robot enters the running state
         """
+        if self.rtde is not None:
+            return self.rtde.is_program_running()
         return self.secmon.is_program_running()
 
     def send_program(self, prog):
@@ -93,6 +110,8 @@ class URRobot:
         return measured force in TCP
         if wait==True, waits for next packet before returning
         """
+        if self.rtde is not None:
+            return self.rtde.get_tcp_force(wait)
         return self.rtmon.getTCFForce(wait)
 
     def get_force(self, wait=True):
@@ -182,8 +201,11 @@ class URRobot:
         wait for a move to complete. Unfortunately there is no good way to
         know when a move has finished so for every received data from robot
         we compute a dist equivalent and when it is lower than 'threshold'
-        we return. if threshold is not reached within timeout, an exception
-        is raised
+        and the joints have settled we return. Data comes from RTDE
+        (125-500Hz) or the real-time monitor (125Hz) if one is running,
+        else from the secondary monitor (10Hz). if threshold is not reached
+        within timeout seconds after the program stopped running, an
+        exception is raised
         """
         self.logger.debug(
             "Waiting for move completion using threshold %s and target %s",
@@ -194,29 +216,112 @@ class URRobot:
             if threshold < 0.001:  # roboten precision is limited
                 threshold = 0.001
             self.logger.debug("No threshold set, setting it to %s", threshold)
-        count = 0
+        stopped_since = None
         while True:
+            dist, speed = self._get_move_state(target, joints)
             if not self.is_running():
                 raise RobotException("Robot stopped")
-            dist = self._get_dist(target, joints)
-            self.logger.debug("distance to target is: %s, target dist is %s",
-                              dist, threshold)
-            if not self.secmon.is_program_running():
-                if dist < threshold:
-                    self.logger.debug(
-                        "we are threshold(%s) close to target, move has ended",
-                        threshold)
-                    return
-                count += 1
-                if count > timeout * 10:
-                    raise RobotException(
-                        "Goal not reached but no program has been running "
-                        "for {} seconds. dist is {}, threshold is {}, "
-                        "target is {}, current pose is {}".format(
-                            timeout, dist, threshold, target,
-                            URRobot.getl(self)))
-            else:
-                count = 0
+            self.logger.debug("distance to target is: %s, target dist is %s, "
+                              "joint speed is %s", dist, threshold, speed)
+            program_running = self.is_program_running()
+            # the program flag of the secondary monitor is only refreshed
+            # at 10Hz, with faster data settled joints tell earlier that
+            # the move has ended
+            if dist < threshold and speed < self.settleEpsilon and (
+                    self.rtmon is not None or self.rtde is not None
+                    or not program_running):
+                self.logger.debug(
+                    "we are threshold(%s) close to target, move has ended",
+                    threshold)
+                return
+            if program_running:
+                stopped_since = None
+            elif stopped_since is None:
+                stopped_since = time.time()
+            elif time.time() - stopped_since > timeout:
+                raise RobotException(
+                    "Goal not reached but no program has been running "
+                    "for {} seconds. dist is {}, threshold is {}, "
+                    "target is {}, current pose is {}".format(
+                        timeout, dist, threshold, target,
+                        URRobot.getl(self)))
+
+    def wait_for_move(self, target, threshold=None, timeout=5, joints=False):
+        """
+        wait for a move to complete in the background, see _wait_for_move.
+        Send the move with wait=False, then call this to do other work
+        while the robot moves.
+        returns a concurrent.futures.Future of the final pose (joints if
+        'joints'), asyncio code can await asyncio.wrap_future(future)
+        """
+        future = Future()
+
+        def wait():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                self._wait_for_move(target, threshold, timeout, joints)
+                future.set_result(self.getj() if joints else self.getl())
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=wait, daemon=True).start()
+        return future
+
+    def wait_settled(self, speed=None, hold=0.1, timeout=5):
+        """
+        wait until the norm of the joint speeds stays under 'speed'
+        (settleEpsilon by default) for 'hold' seconds, e.g. before taking
+        a picture from the arm. returns False on timeout
+        """
+        if speed is None:
+            speed = self.settleEpsilon
+        start = time.time()
+        settled_since = None
+        while time.time() - start < timeout:
+            now = time.time()
+            if self._get_move_data(joints=True)[1] >= speed:
+                settled_since = None
+            elif settled_since is None:
+                settled_since = now
+            elif now - settled_since >= hold:
+                return True
+        return False
+
+    def _get_move_state(self, target, joints=False):
+        """
+        wait for the next data from robot, return the distance to target
+        and the norm of the joint speeds
+        """
+        current, speed = self._get_move_data(joints)
+        return self._dist(target, current, joints), speed
+
+    def _get_move_data(self, joints=False):
+        """
+        wait for the next data from robot, return the current joints or
+        pose and the norm of the joint speeds
+        """
+        if self.rtde is not None:
+            data = self.rtde.get_all_data(wait=True)
+            current = data["actual_q"] if joints \
+                else data["actual_TCP_pose"]
+            speeds = data["actual_qd"]
+        elif self.rtmon is not None:
+            if not self.rtmon.wait(self.rtmon_timeout):
+                raise RobotException(
+                    "Did not receive real-time data from robot in {} "
+                    "seconds".format(self.rtmon_timeout))
+            data = self.rtmon.get_all_data(wait=False)
+            current = data["qActual"] if joints else data["tcpBase"]
+            speeds = data["qdActual"]
+        else:
+            self.secmon.wait()
+            jts = self.secmon.get_joint_data()
+            current = [jts["q_actual%s" % i] for i in range(6)] if joints \
+                else URRobot.getl(self, _log=False)
+            speeds = [jts["qd_actual%s" % i] for i in range(6)]
+        speed = sum(v ** 2 for v in speeds) ** 0.5
+        return current, speed
 
     def _get_dist(self, target, joints=False):
         if joints:
@@ -224,10 +329,18 @@ class URRobot:
         else:
             return self._get_lin_dist(target)
 
+    def _dist(self, target, current, joints=False):
+        if joints:
+            return self._joints_dist(target, current)
+        else:
+            return self._pose_dist(target, current)
+
     def _get_lin_dist(self, target):
+        return self._pose_dist(target, URRobot.getl(self, wait=True))
+
+    def _pose_dist(self, target, pose):
         # FIXME: we have an issue here, it seems sometimes the axis angle
         #   received from robot
-        pose = URRobot.getl(self, wait=True)
         dist = 0
         for i in range(3):
             dist += (target[i] - pose[i]) ** 2
@@ -236,7 +349,10 @@ class URRobot:
         return dist ** 0.5
 
     def _get_joints_dist(self, target):
-        joints = self.getj(wait=True)
+        return self._joints_dist(target, self.getj(wait=True))
+
+    @staticmethod
+    def _joints_dist(target, joints):
         dist = 0
         for i in range(6):
             dist += (target[i] - joints[i]) ** 2
@@ -244,6 +360,8 @@ class URRobot:
 
     def getj(self, wait=False):
         """get joints position"""
+        if self.rtde is not None:
+            return self.rtde.getj(wait)
         jts = self.secmon.get_joint_data(wait)
         return [jts["q_actual0"], jts["q_actual1"], jts["q_actual2"],
                 jts["q_actual3"], jts["q_actual4"], jts["q_actual5"]]
@@ -321,8 +439,11 @@ class URRobot:
 
     def getl(self, wait=False, _log=True):
         """get TCP position"""
-        pose = self.secmon.get_cartesian_info(wait)
-        if pose:
+        if self.rtde is not None:
+            pose = self.rtde.getl(wait)
+        else:
+            pose = self.secmon.get_cartesian_info(wait)
+        if isinstance(pose, dict):
             pose = [pose["X"], pose["Y"], pose["Z"],
                     pose["Rx"], pose["Ry"], pose["Rz"]]
         if _log:
@@ -433,6 +554,14 @@ class URRobot:
                                     joints=True)
             return self.getl()
 
+    def servo_stream(self, **kwargs):
+        """
+        Return a ServoStream to move the robot along streamed poses
+        without stopping between them, see ServoStream for the arguments.
+        Use it as a context manager or call start and stop.
+        """
+        return ServoStream(self, **kwargs)
+
     def stopl(self, acc=0.5):
         self.send_program("stopl(%s)" % acc)
 
@@ -448,6 +577,8 @@ class URRobot:
         self.secmon.close()
         if self.rtmon:
             self.rtmon.stop()
+        if self.rtde:
+            self.rtde.close()
 
     def set_freedrive(self, val, timeout=60):
         """
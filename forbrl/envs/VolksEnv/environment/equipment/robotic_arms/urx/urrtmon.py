@@ -11,17 +11,98 @@ import socket
 import struct
 import threading
 import time
-from copy import deepcopy
 
-import math3d as m3d
 import numpy as np
 
+try:
+    import math3d as m3d
+except ImportError:
+    # only used with a csys, which URArm sets and requires math3d for
+    m3d = None
+
 __author__ = "Morten Lind, Olivier Roulet-Dubonnet * 95% + Tianhe Wang * 5%"
 __copyright__ = "Copyright 2011, NTNU/SINTEF Raufoss Manufacturing AS"
 __credits__ = ["Morten Lind, Olivier Roulet-Dubonnet"]
 __license__ = "LGPLv3"
 
 
+# data that can be buffered, with the shape of each item
+RT_FIELDS = dict(timestamp=(), ctrl_timestamp=(), q_actual=(6,),
+                 qd_actual=(6,), q_target=(6,), tcp=(6,), tcp_force=(6,))
+
+BUFFER_FIELDS = ('timestamp', 'ctrl_timestamp', 'tcp', 'q_actual')
+
+
+class RingBuffer(object):
+    """
+    Fixed size ring of records of a structured dtype. When it is full the
+    oldest records are overwritten and counted in `overflows`.
+    Each record is stored twice, at i and i + size, so that pending records
+    are always a contiguous slice and drains take a single copy.
+    """
+
+    def __init__(self, dtype, size):
+        self.size = size
+        self.dtype = np.dtype(dtype)
+        self.overflows = 0
+        self._data = np.zeros(2 * size, self.dtype)
+        self._head = 0  # number of records put
+        self._tail = 0  # number of records removed
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        with self._cond:
+            return self._head - self._tail
+
+    def put(self, record):
+        with self._cond:
+            i = self._head % self.size
+            self._data[i] = record
+            self._data[i + self.size] = record
+            self._head += 1
+            if self._head - self._tail > self.size:
+                self._tail += 1
+                self.overflows += 1
+            self._cond.notify_all()
+
+    def _wait(self, count, timeout):
+        return self._cond.wait_for(
+            lambda: self._head - self._tail >= count, timeout)
+
+    def pop(self, block=True, timeout=None):
+        """Remove and return the oldest record, None if there is none."""
+        with self._cond:
+            if block:
+                self._wait(1, timeout)
+            if self._head == self._tail:
+                return None
+            record = self._data[self._tail % self.size].copy()
+            self._tail += 1
+            return record
+
+    def drain(self, max_count=None, min_count=0, timeout=None):
+        """
+        Remove the oldest records, at most max_count, after waiting up to
+        timeout for at least min_count of them. Return them as a copy, the
+        ring is overwritten by later puts.
+        """
+        with self._cond:
+            if min_count:
+                self._wait(min_count, timeout)
+            count = self._head - self._tail
+            if max_count is not None:
+                count = min(count, max_count)
+            i = self._tail % self.size
+            self._tail += count
+            return self._data[i:i + count].copy()
+
+    def peek(self):
+        """Return a copy of all pending records."""
+        with self._cond:
+            i = self._tail % self.size
+            return self._data[i:i + self._head - self._tail].copy()
+
+
 class URRTMonitor(threading.Thread):
     # Struct for revision of the UR controller giving 692 bytes
     rtstruct692 = struct.Struct('>d6d6d6d6d6d6d6d6d18d6d6d6dQ')
@@ -44,15 +125,16 @@ class URRTMonitor(threading.Thread):
         self._timestamp = None
         self._ctrlTimestamp = None
         self._qActual = None
+        self._qdActual = None
         self._qTarget = None
         self._tcp = None
+        self._tcp_base = None
         self._tcp_force = None
         self.__recvTime = 0
         self._last_ctrl_ts = 0
         # self._last_ts = 0
         self._buffering = False
-        self._buffer_lock = threading.Lock()
-        self._buffer = []
+        self._buffer = None
         self._csys = None
         self._csys_lock = threading.Lock()
 
@@ -75,9 +157,10 @@ class URRTMonitor(threading.Thread):
         self.__recvTime = recv_time
         return pkg
 
-    def wait(self):
+    def wait(self, timeout=None):
+        """Wait for the next packet, return False on timeout."""
         with self._dataEvent:
-            self._dataEvent.wait()
+            return self._dataEvent.wait(timeout)
 
     def q_actual(self, wait=False, timestamp=False):
         """ Get the actual joint position vector."""
@@ -188,52 +271,80 @@ class URRTMonitor(threading.Thread):
             self._qTarget = np.array(unp[1:7])
             self._tcp_force = np.array(unp[67:73])
             self._tcp = np.array(unp[73:79])
+            self._tcp_base = self._tcp
 
             if self._csys:
                 with self._csys_lock:
                     # might be a good idea to remove dependency on m3d
                     tcp = self._csys.inverse * m3d.Transform(self._tcp)
                 self._tcp = tcp.pose_vector
+            values = dict(timestamp=self._timestamp,
+                          ctrl_timestamp=self._ctrlTimestamp,
+                          q_actual=self._qActual,
+                          qd_actual=self._qdActual,
+                          q_target=self._qTarget,
+                          tcp=self._tcp,
+                          tcp_force=self._tcp_force)
         if self._buffering:
-            with self._buffer_lock:
-                self._buffer.append(
-                    (self._timestamp,
-                     self._ctrlTimestamp,
-                     self._tcp,
-                     self._qActual))  # FIXME use named arrays of allow to
-                # configure what data to buffer
+            buffer = self._buffer
+            # packets of 540 bytes have neither tcp nor tcp_force
+            buffer.put(tuple(values[name] if np.size(values[name]) else np.nan
+                             for name in buffer.dtype.names))
 
         with self._dataEvent:
             self._dataEvent.notifyAll()
 
-    def start_buffering(self):
-        """Start buffering all data from controller."""
-        self._buffer = []
+    def start_buffering(self, fields=BUFFER_FIELDS, size=7500):
+        """
+        Start buffering data from controller. fields are names from
+        RT_FIELDS, records keep them in this order. size is the number of
+        packets kept (7500 is a minute at 125Hz), older ones are dropped
+        and counted in buffer_overflows.
+        """
+        self._buffer = RingBuffer(
+            [(name, np.float64, RT_FIELDS[name]) for name in fields], size)
         self._buffering = True
 
     def stop_buffering(self):
         self._buffering = False
 
+    @property
+    def buffer_overflows(self):
+        """Number of packets dropped because the buffer was full."""
+        if self._buffer is None:
+            return 0
+        return self._buffer.overflows
+
     def try_pop_buffer(self):
-        """Return oldest value in buffer."""
-        with self._buffer_lock:
-            if len(self._buffer) > 0:
-                return self._buffer.pop(0)
-            else:
-                return None
+        """Return oldest record in buffer, None if it is empty."""
+        if self._buffer is None:
+            return None
+        return self._buffer.pop(block=False)
+
+    def pop_buffer(self, timeout=None):
+        """
+        Return oldest record in buffer, wait for one if it is empty. Return
+        None if buffering was never started.
+        """
+        if self._buffer is None:
+            return None
+        return self._buffer.pop(timeout=timeout)
 
-    def pop_buffer(self):
-        """Return oldest value in buffer."""
-        while True:
-            with self._buffer_lock:
-                if len(self._buffer) > 0:
-                    return self._buffer.pop(0)
-            time.sleep(0.001)
+    def drain_buffer(self, max_count=None, min_count=0, timeout=None):
+        """
+        Remove and return the oldest records in buffer as a structured
+        array, see RingBuffer.drain. Return None if buffering was never
+        started.
+        """
+        if self._buffer is None:
+            return None
+        return self._buffer.drain(max_count, min_count, timeout)
 
     def get_buffer(self):
         """Return a copy of the entire buffer."""
-        with self._buffer_lock:
-            return deepcopy(self._buffer)
+        if self._buffer is None:
+            return None
+        return self._buffer.peek()
 
     def get_all_data(self, wait=True):
         """Return all data parsed from robot as a dict."""
@@ -244,8 +355,10 @@ class URRTMonitor(threading.Thread):
                 timestamp=self._timestamp,
                 ctrltimestamp=self._ctrlTimestamp,
                 qActual=self._qActual,
+                qdActual=self._qdActual,
                 qTarget=self._qTarget,
                 tcp=self._tcp,
+                tcpBase=self._tcp_base,
                 tcp_force=self._tcp_force)
 
     def stop(self):
@@ -1,6 +1,9 @@
 """
-This file contains 2 classes:
-- ParseUtils containing utilies to parse data from UR robot
+This file contains 4 classes:
+- ParseUtils containing utilies to parse data from UR robot, using the
+    precompiled sub-packet layouts defined below
+- PacketView, the parsed sub-packets of a packet, decoded on access
+- PacketReader, cutting the socket stream into packets
 - SecondaryMonitor, a class opening a socket to the robot and with methods to
     access data and send programs to the robot Both use data from the
     secondary port of the URRobot.
@@ -14,6 +17,7 @@ import logging
 import socket
 import struct
 import time
+from collections.abc import Mapping
 from copy import copy
 from threading import Condition, Lock, Thread
 
@@ -44,286 +48,255 @@ class TimeoutException(Exception):
         Exception.__init__(self, *args)
 
 
+class Layout:
+    """
+    Precompiled layout of a sub-packet. fmt and names are given as for
+    ParserUtils._get_data, without arrays, only the fields that have a name
+    are decoded.
+    """
+
+    def __init__(self, name, fmt, names):
+        codes = fmt.replace(" ", "").lstrip("!<>")
+        self.name = name
+        self.names = tuple(names[:len(codes)])
+        self.struct = struct.Struct("!" + codes[:len(self.names)])
+        self.size = self.struct.size
+
+    def decode(self, data):
+        return dict(zip(self.names, self.struct.unpack_from(data)))
+
+
+class MessageLayout:
+    """
+    Layout of a message sub-packet, which holds arrays and is decoded by
+    ParserUtils._get_data.
+    """
+    size = 15  # up to robotMessageType
+
+    def __init__(self, name, fmt, names):
+        self.name = name
+        self.fmt = fmt
+        self.names = tuple(names)
+
+    def decode(self, data):
+        return ParserUtils._get_data(bytes(data), self.fmt, self.names)
+
+
+_ROBOT_MODE_NAMES = ("size", "type", "timestamp", "isRobotConnected",
+                     "isRealRobotEnabled", "isPowerOnRobot",
+                     "isEmergencyStopped", "isSecurityStopped",
+                     "isProgramRunning", "isProgramPaused", "robotMode",
+                     "controlMode", "speedFraction", "speedScaling",
+                     "speedFractionLimit", "reservedByUR")
+
+_JOINT_NAMES = ["size", "type"]
+for _i in range(0, 6):
+    _JOINT_NAMES += ["q_actual%s" % _i, "q_target%s" % _i,
+                     "qd_actual%s" % _i, "I_actual%s" % _i,
+                     "V_actual%s" % _i, "T_motor%s" % _i,
+                     "T_micro%s" % _i, "jointMode%s" % _i]
+
+_CARTESIAN_NAMES = ("size", "type", "X", "Y", "Z", "Rx", "Ry", "Rz",
+                    "tcpOffsetX", "tcpOffsetY", "tcpOffsetZ", "tcpOffsetRx",
+                    "tcpOffsetRy", "tcpOffsetRz")
+
+_MASTER_BOARD_NAMES = (
+    "size", "type", "digitalInputBits", "digitalOutputBits",
+    "analogInputRange0", "analogInputRange1", "analogInput0",
+    "analogInput1", "analogInputDomain0", "analogInputDomain1",
+    "analogOutput0", "analogOutput1", "masterBoardTemperature",
+    "robotVoltage48V", "robotCurrent",
+    "masterIOCurrent")  # , "masterSafetyState" ,
+# "masterOnOffState", "euromap67InterfaceInstalled"   ))
+
+_MESSAGE_NAMES = ("size", "type", "timestamp", "source", "robotMessageType")
+
+SECONDARY_CLIENT_DATA = Layout("SecondaryClientData", "!iB", ("size", "type"))
+
+# RobotModeData layouts by sub-packet size, with the controller version the
+# size reveals
+ROBOT_MODE_LAYOUTS = {
+    38: ((3, 0), Layout("RobotModeData", "!IBQ???????BBdd",
+                        _ROBOT_MODE_NAMES[:14])),
+    46: ((3, 2), Layout("RobotModeData", "!IBQ???????BBdd",
+                        _ROBOT_MODE_NAMES[:15])),
+    47: ((3, 5), Layout("RobotModeData", "!IBQ???????BBddc",
+                        _ROBOT_MODE_NAMES)),
+}
+ROBOT_MODE_LAYOUT = Layout("RobotModeData", "!iBQ???????Bd",
+                           _ROBOT_MODE_NAMES[:11] + ("speedFraction",))
+
+# layouts by sub-packet type, as (minimal controller version, layout) from
+# the most recent version
+LAYOUTS = {
+    1: [((0, 0), Layout("JointData", "!iB dddffffB dddffffB dddffffB "
+                                     "dddffffB dddffffB dddffffB",
+                        _JOINT_NAMES))],
+    2: [((0, 0), Layout("ToolData", "iBbbddfBffB", (
+        "size", "type", "analoginputRange2", "analoginputRange3",
+        "analogInput2", "analogInput3", "toolVoltage48V",
+        "toolOutputVoltage", "toolCurrent", "toolTemperature",
+        "toolMode")))],
+    3: [((3, 0), Layout("MasterBoardData", "iBiibbddbbddffffBBb",
+                        _MASTER_BOARD_NAMES)),
+        ((0, 0), Layout("MasterBoardData", "iBhhbbddbbddffffBBb",
+                        _MASTER_BOARD_NAMES))],
+    4: [((3, 2), Layout("CartesianInfo", "iBdddddddddddd",
+                        _CARTESIAN_NAMES)),
+        ((0, 0), Layout("CartesianInfo", "iBdddddd",
+                        _CARTESIAN_NAMES[:8]))],
+    5: [((0, 0), Layout("LaserPointer(OBSOLETE)", "iBddd",
+                        ("size", "type")))],
+    7: [((3, 2), Layout("ForceModeData", "iBddddddd", (
+        "size", "type", "x", "y", "z", "rx", "ry", "rz",
+        "robotDexterity")))],
+    8: [((3, 2), Layout("AdditionalInfo", "iB??", (
+        "size", "type", "teachButtonPressed", "teachButtonEnabled")))],
+    # 9 has a length of 53 bytes. It is used internally by Universal Robots
+    # software only and should be skipped.
+    9: [],
+}
+
+# message layouts by robotMessageType
+MESSAGE_LAYOUTS = {
+    3: MessageLayout("VersionMessage", "!iBQbb bAbBBiAb", _MESSAGE_NAMES + (
+        "projectNameSize", "projectName", "majorVersion", "minorVersion",
+        "svnRevision", "buildDate")),
+    6: MessageLayout("robotCommMessage", "!iBQbb iiAc", _MESSAGE_NAMES + (
+        "code", "argument", "messageText")),
+    1: MessageLayout("labelMessage", "!iBQbb iAc", _MESSAGE_NAMES + (
+        "id", "messageText")),
+    2: MessageLayout("popupMessage", "!iBQbb ??BAcAc", _MESSAGE_NAMES + (
+        "warning", "error", "titleSize", "messageTitle", "messageText")),
+    0: MessageLayout("messageText", "!iBQbb Ac", _MESSAGE_NAMES + (
+        "messageText",)),
+    8: MessageLayout("varMessage", "!iBQbb iiBAcAc", _MESSAGE_NAMES + (
+        "code", "argument", "titleSize", "messageTitle", "messageText")),
+    7: MessageLayout("keyMessage", "!iBQbb iiBAcAc", _MESSAGE_NAMES + (
+        "code", "argument", "titleSize", "messageTitle", "messageText")),
+    5: MessageLayout("keyMessage", "!iBQbb iiAc", _MESSAGE_NAMES + (
+        "code", "argument", "messageText")),
+}
+
+
+class PacketView(Mapping):
+    """
+    Sub-packets of a packet by name, each one is decoded into a dictionary
+    on first access.
+    """
+
+    def __init__(self, data, index):
+        self._data = data
+        self._index = index  # name: (offset, size, layout)
+        self._decoded = {}
+
+    def __getitem__(self, name):
+        try:
+            return self._decoded[name]
+        except KeyError:
+            pass
+        offset, size, layout = self._index[name]
+        value = layout.decode(memoryview(self._data)[offset:offset + size])
+        self._decoded[name] = value
+        return value
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def copy(self):
+        """
+        return all sub-packets decoded in a dictionary
+        """
+        return {name: self[name] for name in self._index}
+
+
 class ParserUtils:
+    header = struct.Struct("!iB")
+    message_type = struct.Struct("!b")
+    _tables = {}
 
     def __init__(self):
         self.logger = logging.getLogger("ursecmon")
         self.version = (0, 0)
+        self._table = self.get_layouts(self.version)
 
-    def parse(self, data):
+    @classmethod
+    def get_layouts(cls, version):
         """
-        parse a packet from the UR socket and return a dictionary with the data
+        return the layouts of a controller version by sub-packet type
         """
-        all_data = {}
-        # print "Total size ", len(data)
-        while data:
-            psize, ptype, pdata, data = self.analyze_header(data)
-            # print "We got packet with size %i and type %s" % (psize, ptype)
+        if version not in cls._tables:
+            table = {}
+            for ptype, layouts in LAYOUTS.items():
+                table[ptype] = next((layout for min_version, layout in layouts
+                                     if version >= min_version), None)
+            cls._tables[version] = table
+        return cls._tables[version]
+
+    def parse(self, data, names=None):
+        """
+        parse a packet from the UR socket and return a PacketView with the
+        data. Only the headers are read here, sub-packets are decoded when
+        accessed. If names is given, only the sub-packets with these names
+        and RobotModeData are kept.
+        """
+        index = {}
+        offset = 0
+        end = len(data)
+        while offset < end:
+            if end - offset < 5:
+                raise ParsingException("Packet size %s smaller than header "
+                                       "size (5 bytes)" % (end - offset))
+            psize, ptype = self.header.unpack_from(data, offset)
+            if psize < 5:
+                raise ParsingException("Error, declared length of data "
+                                       "smaller than its own header(5): ",
+                                       psize)
+            if psize > end - offset:
+                raise ParsingException("Error, length of data smaller (%s) "
+                                       "than declared (%s)" % (end - offset,
+                                                               psize))
             if ptype == 16:
-                all_data["SecondaryClientData"] = self._get_data(pdata,
-                                                                 "!iB",
-                                                                 ("size",
-                                                                  "type"))
-                data = (pdata + data)[5:]  # This is the total size so we
-                # resend data to parser
+                # This is the total size, the sub-packets follow the header
+                layout = SECONDARY_CLIENT_DATA
+                psize = 5
             elif ptype == 0:
-                # this parses RobotModeData for versions >=3.0 (i.e. 3.0)
-                if psize == 38:
-                    self.version = (3, 0)
-                    all_data['RobotModeData'] = self._get_data(
-                        pdata,
-                        "!IBQ???????BBdd",
-                        ("size", "type",
-                         "timestamp",
-                         "isRobotConnected",
-                         "isRealRobotEnabled",
-                         "isPowerOnRobot",
-                         "isEmergencyStopped",
-                         "isSecurityStopped",
-                         "isProgramRunning",
-                         "isProgramPaused",
-                         "robotMode",
-                         "controlMode",
-                         "speedFraction",
-                         "speedScaling"))
-                elif psize == 46:  # It's 46 bytes in 3.2
-                    self.version = (3, 2)
-                    all_data['RobotModeData'] = self._get_data(
-                        pdata,
-                        "!IBQ???????BBdd",
-                        ("size", "type",
-                         "timestamp",
-                         "isRobotConnected",
-                         "isRealRobotEnabled",
-                         "isPowerOnRobot",
-                         "isEmergencyStopped",
-                         "isSecurityStopped",
-                         "isProgramRunning",
-                         "isProgramPaused",
-                         "robotMode",
-                         "controlMode",
-                         "speedFraction",
-                         "speedScaling",
-                         "speedFractionLimit"))
-                elif psize == 47:
-                    self.version = (3, 5)
-                    all_data['RobotModeData'] = self._get_data(
-                        pdata,
-                        "!IBQ???????BBddc",
-                        ("size", "type",
-                         "timestamp",
-                         "isRobotConnected",
-                         "isRealRobotEnabled",
-                         "isPowerOnRobot",
-                         "isEmergencyStopped",
-                         "isSecurityStopped",
-                         "isProgramRunning",
-                         "isProgramPaused",
-                         "robotMode",
-                         "controlMode",
-                         "speedFraction",
-                         "speedScaling",
-                         "speedFractionLimit",
-                         "reservedByUR"))
-                else:
-                    all_data["RobotModeData"] = self._get_data(
-                        pdata,
-                        "!iBQ???????Bd",
-                        ("size", "type",
-                         "timestamp",
-                         "isRobotConnected",
-                         "isRealRobotEnabled",
-                         "isPowerOnRobot",
-                         "isEmergencyStopped",
-                         "isSecurityStopped",
-                         "isProgramRunning",
-                         "isProgramPaused",
-                         "robotMode",
-                         "speedFraction"))
-            elif ptype == 1:
-                tmpstr = ["size", "type"]
-                for i in range(0, 6):
-                    tmpstr += ["q_actual%s" % i, "q_target%s" % i,
-                               "qd_actual%s" % i, "I_actual%s" % i,
-                               "V_actual%s" % i, "T_motor%s" % i,
-                               "T_micro%s" % i, "jointMode%s" % i]
-
-                all_data["JointData"] = self._get_data(
-                    pdata,
-                    "!iB dddffffB dddffffB dddffffB dddffffB dddffffB dddffffB",
-                    tmpstr)
-
-            elif ptype == 4:
-                if self.version < (3, 2):
-                    all_data["CartesianInfo"] = self._get_data(pdata,
-                                                               "iBdddddd",
-                                                               ("size", "type",
-                                                                "X", "Y", "Z",
-                                                                "Rx", "Ry",
-                                                                "Rz"))
-                else:
-                    all_data["CartesianInfo"] = self._get_data(pdata,
-                                                               "iBdddddddddddd",
-                                                               ("size", "type",
-                                                                "X", "Y", "Z",
-                                                                "Rx", "Ry",
-                                                                "Rz",
-                                                                "tcpOffsetX",
-                                                                "tcpOffsetY",
-                                                                "tcpOffsetZ",
-                                                                "tcpOffsetRx",
-                                                                "tcpOffsetRy",
-                                                                "tcpOffsetRz"))
-            elif ptype == 5:
-                all_data["LaserPointer(OBSOLETE)"] = self._get_data(pdata,
-                                                                    "iBddd",
-                                                                    ("size",
-                                                                     "type"))
-            elif ptype == 3:
-
-                if self.version >= (3, 0):
-                    fmt = "iBiibbddbbddffffBBb"  # firmware >= 3.0
-                else:
-                    fmt = "iBhhbbddbbddffffBBb"  # firmware < 3.0
-
-                all_data["MasterBoardData"] = self._get_data(pdata, fmt, (
-                    "size", "type", "digitalInputBits", "digitalOutputBits",
-                    "analogInputRange0", "analogInputRange1", "analogInput0",
-                    "analogInput1", "analogInputDomain0", "analogInputDomain1",
-                    "analogOutput0", "analogOutput1", "masterBoardTemperature",
-                    "robotVoltage48V", "robotCurrent",
-                    "masterIOCurrent"))  # , "masterSafetyState" ,
-                # "masterOnOffState", "euromap67InterfaceInstalled"   ))
-            elif ptype == 2:
-                all_data["ToolData"] = self._get_data(pdata, "iBbbddfBffB", (
-                    "size", "type", "analoginputRange2", "analoginputRange3",
-                    "analogInput2", "analogInput3", "toolVoltage48V",
-                    "toolOutputVoltage", "toolCurrent", "toolTemperature",
-                    "toolMode"))
-            elif ptype == 9:
-                continue  # This package has a length of 53 bytes. It is used
-                # internally by Universal Robots software only and should be
-                # skipped.
-            elif ptype == 8 and self.version >= (3, 2):
-                all_data["AdditionalInfo"] = self._get_data(pdata, "iB??", (
-                    "size", "type", "teachButtonPressed", "teachButtonEnabled"))
-            elif ptype == 7 and self.version >= (3, 2):
-                all_data["ForceModeData"] = self._get_data(pdata, "iBddddddd", (
-                    "size", "type", "x", "y", "z", "rx", "ry", "rz",
-                    "robotDexterity"))
-            # elif ptype == 8: allData["varMessage"] = self._get_data(pdata,
-            # "!iBQbb iiBAcAc", ("size", "type", "timestamp", "source",
-            # "robotMessageType", "code", "argument", "titleSize",
-            # "messageTitle", "messageText")) elif ptype == 7: allData[
-            # "keyMessage"] = self._get_data(pdata, "!iBQbb iiBAcAc",
-            # ("size", "type", "timestamp", "source", "robotMessageType",
-            # "code", "argument", "titleSize", "messageTitle", "messageText"))
-
+                version, layout = ROBOT_MODE_LAYOUTS.get(
+                    psize, (self.version, ROBOT_MODE_LAYOUT))
+                if version != self.version:
+                    self.version = version
+                    self._table = self.get_layouts(version)
             elif ptype == 20:
-                tmp = self._get_data(
-                    pdata, "!iB Qbb",
-                    ("size", "type", "timestamp", "source", "robotMessageType"))
-                if tmp["robotMessageType"] == 3:
-                    all_data["VersionMessage"] = self._get_data(
-                        pdata,
-                        "!iBQbb bAbBBiAb",
-                        ("size", "type",
-                         "timestamp",
-                         "source",
-                         "robotMessageType",
-                         "projectNameSize",
-                         "projectName",
-                         "majorVersion",
-                         "minorVersion",
-                         "svnRevision",
-                         "buildDate"))
-                elif tmp["robotMessageType"] == 6:
-                    all_data["robotCommMessage"] = self._get_data(
-                        pdata,
-                        "!iBQbb iiAc",
-                        (
-                            "size",
-                            "type",
-                            "timestamp",
-                            "source",
-                            "robotMessageType",
-                            "code",
-                            "argument",
-                            "messageText"))
-                elif tmp["robotMessageType"] == 1:
-                    all_data["labelMessage"] = self._get_data(
-                        pdata,
-                        "!iBQbb iAc", (
-                            "size", "type",
-                            "timestamp",
-                            "source",
-                            "robotMessageType",
-                            "id",
-                            "messageText"))
-                elif tmp["robotMessageType"] == 2:
-                    all_data["popupMessage"] = self._get_data(
-                        pdata,
-                        "!iBQbb ??BAcAc", (
-                            "size", "type",
-                            "timestamp",
-                            "source",
-                            "robotMessageType",
-                            "warning",
-                            "error",
-                            "titleSize",
-                            "messageTitle",
-                            "messageText"))
-                elif tmp["robotMessageType"] == 0:
-                    all_data["messageText"] = self._get_data(
-                        pdata, "!iBQbb Ac",
-                        ("size", "type",
-                         "timestamp",
-                         "source",
-                         "robotMessageType",
-                         "messageText"))
-                elif tmp["robotMessageType"] == 8:
-                    all_data["varMessage"] = self._get_data(
-                        pdata,
-                        "!iBQbb iiBAcAc", (
-                            "size", "type",
-                            "timestamp",
-                            "source",
-                            "robotMessageType",
-                            "code",
-                            "argument",
-                            "titleSize",
-                            "messageTitle",
-                            "messageText"))
-                elif tmp["robotMessageType"] == 7:
-                    all_data["keyMessage"] = self._get_data(
-                        pdata,
-                        "!iBQbb iiBAcAc", (
-                            "size", "type",
-                            "timestamp",
-                            "source",
-                            "robotMessageType",
-                            "code",
-                            "argument",
-                            "titleSize",
-                            "messageTitle",
-                            "messageText"))
-                elif tmp["robotMessageType"] == 5:
-                    all_data["keyMessage"] = self._get_data(
-                        pdata, "!iBQbb iiAc",
-                        ("size", "type",
-                         "timestamp",
-                         "source",
-                         "robotMessageType",
-                         "code", "argument",
-                         "messageText"))
-                else:
-                    self.logger.debug("Message type parser not implemented %s",
-                                      tmp)
+                if psize < MessageLayout.size:
+                    raise ParsingException("Error, message of %s bytes is "
+                                           "too small" % psize)
+                mtype = self.message_type.unpack_from(data, offset + 14)[0]
+                layout = MESSAGE_LAYOUTS.get(mtype)
+                if layout is None:
+                    self.logger.debug("Message type parser not implemented "
+                                      "%s", mtype)
             else:
-                self.logger.debug("Unknown packet type %s with size %s", ptype,
-                                  psize)
+                layout = self._table.get(ptype)
+                if layout is None and ptype not in self._table:
+                    self.logger.debug("Unknown packet type %s with size %s",
+                                      ptype, psize)
+
+            if layout is not None and (names is None or layout.name in names
+                                       or layout.name == "RobotModeData"):
+                if psize < layout.size:
+                    raise ParsingException("Error, length of data smaller "
+                                           "than advertized: ", psize,
+                                           layout.size, "for ", layout.name)
+                index[layout.name] = (offset, psize, layout)
+            offset += psize
 
-        return all_data
+        return PacketView(data, index)
 
     @staticmethod
     def _get_data(data, fmt, names):
@@ -372,9 +345,9 @@ class ParserUtils:
                 i += 1
         return d
 
-    @staticmethod
-    def get_header(data):
-        return struct.unpack("!iB", data[0:5])
+    @classmethod
+    def get_header(cls, data):
+        return cls.header.unpack_from(data)
 
     def analyze_header(self, data):
         """
@@ -398,39 +371,88 @@ class ParserUtils:
         find the first complete packet in a string
         returns None if none found
         """
-        counter = 0
-        limit = 100
-        while True:
-            if len(data) >= 5:
-                psize, ptype = self.get_header(data)
-                if psize < 5 or psize > 2000 or ptype != 16:
-                    data = data[1:]
-                    counter += 1
-                    if counter > limit:
-                        self.logger.warning("tried %s times to find a packet "
-                                            "in data, advertised packet size:"
-                                            " %s, type: %s", counter, psize,
-                                            ptype)
-                        self.logger.warning("Data length: %s", len(data))
-                        limit = limit * 10
-                elif len(data) >= psize:
-                    self.logger.debug("Got packet with size %s and type %s",
-                                      psize,
-                                      ptype)
-                    if counter:
-                        self.logger.debug("Remove %s bytes of garbage at "
-                                          "begining of packet", counter)
-                    # ok we we have somehting which looks like a packet"
-                    return data[:psize], data[psize:]
-                else:
-                    # packet is not complete
-                    self.logger.debug("Packet is not complete, advertised "
-                                      "size is %s, received size is %s, "
-                                      "type is %s", psize, len(data), ptype)
-                    return None
+        data = bytearray(data)
+        start, psize = self.find_packet(data, 0, len(data))
+        if psize is None:
+            return None
+        return bytes(data[start:start + psize]), bytes(data[start + psize:])
+
+    def find_packet(self, buf, start, end):
+        """
+        find the first complete packet in buf[start:end] without copying,
+        buf being a bytearray. Garbage in front of a packet is skipped by
+        searching for the next byte that may be the type of a client data
+        packet.
+        returns (offset, size) of the packet, or (offset, None) if there is
+        no complete packet yet, offset being where the next search should
+        start
+        """
+        pos = start
+        while end - pos >= 5:
+            psize, ptype = self.header.unpack_from(buf, pos)
+            if psize < 5 or psize > 2000 or ptype != 16:
+                nxt = buf.find(b"\x10", pos + 5, end)
+                if nxt == -1:
+                    # the last 4 bytes may still start a header
+                    pos = max(end - 4, pos + 1)
+                    break
+                pos = nxt - 4
+            elif end - pos >= psize:
+                self.logger.debug("Got packet with size %s and type %s",
+                                  psize, ptype)
+                if pos > start:
+                    self.logger.debug("Remove %s bytes of garbage at "
+                                      "begining of packet", pos - start)
+                return pos, psize
             else:
-                # self.logger.debug("data smaller than 5 bytes")
-                return None
+                # packet is not complete
+                return pos, None
+        if pos - start > 2000:
+            self.logger.warning("Skipped %s bytes of data without finding "
+                                "a packet", pos - start)
+        return pos, None
+
+
+class PacketReader:
+    """
+    Cut the stream of the secondary interface into packets. Data is received
+    with recv_into in a preallocated buffer and headers are scanned in
+    place, the buffer is only compacted when its tail is too short for the
+    next read, so the cost per packet does not grow with the backlog.
+    """
+
+    def __init__(self, sock, parser, recv_size=8192, buffer_size=65536):
+        self._sock = sock
+        self._parser = parser
+        self.recv_size = recv_size
+        self._buf = bytearray(max(buffer_size, 2 * recv_size))
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+
+    def read_packet(self):
+        """
+        returns something that looks like a packet, nothing is guaranted
+        """
+        while True:
+            self._start, psize = self._parser.find_packet(
+                self._buf, self._start, self._end)
+            if psize is not None:
+                packet = bytes(self._view[self._start:self._start + psize])
+                self._start += psize
+                return packet
+            self._recv()
+
+    def _recv(self):
+        if len(self._buf) - self._end < self.recv_size:
+            # move what is left of the data to the front
+            size = self._end - self._start
+            self._buf[:size] = self._buf[self._start:self._end]
+            self._start, self._end = 0, size
+        n = self._sock.recv_into(self._view[self._end:], self.recv_size)
+        if n == 0:
+            raise ConnectionResetError("Connection closed by the robot")
+        self._end += n
 
 
 class SecondaryMonitor(Thread):
@@ -439,10 +461,13 @@ class SecondaryMonitor(Thread):
     """
     reconnect_time = 50
 
-    def __init__(self, host):
+    def __init__(self, host, subscriptions=None):
         Thread.__init__(self)
         self.logger = logging.getLogger("ursecmon")
         self._parser = ParserUtils()
+        self._subscriptions = None
+        if subscriptions is not None:
+            self._subscriptions = frozenset(subscriptions)
         self._dict = {}
         self._dictLock = Lock()
         self.host = host
@@ -452,7 +477,7 @@ class SecondaryMonitor(Thread):
                                                      timeout=0.5)
         self._prog_queue = []
         self._prog_queue_lock = Lock()
-        self._dataqueue = bytes()
+        self._reader = PacketReader(self._s_secondary, self._parser)
         self._trystop = False  # to stop thread
         self.running = False  # True when robot is on and listening
         self._dataEvent = Condition()
@@ -465,6 +490,20 @@ class SecondaryMonitor(Thread):
             self.close()
             raise ex
 
+    def subscribe(self, *names):
+        """
+        restrict the data kept from each packet to the sub-packets of the
+        given names (e.g. "CartesianInfo", "JointData"), the others are
+        dropped when parsing. RobotModeData is always kept.
+        """
+        self._subscriptions = frozenset(names).union(self._subscriptions or ())
+
+    def unsubscribe(self):
+        """
+        keep all sub-packets again
+        """
+        self._subscriptions = None
+
     def send_program(self, prog):
         """
         send program to robot in URRobot format If another program is send
@@ -500,7 +539,7 @@ class SecondaryMonitor(Thread):
 
             data = self._get_data()
             try:
-                tmpdict = self._parser.parse(data)
+                tmpdict = self._parser.parse(data, self._subscriptions)
                 with self._dictLock:
                     self._dict = tmpdict
             except ParsingException as ex:
@@ -538,18 +577,7 @@ class SecondaryMonitor(Thread):
         """
         returns something that looks like a packet, nothing is guaranted
         """
-        while True:
-            # self.logger.debug("data queue size is: {}".format(len(
-            # self._dataqueue)))
-            ans = self._parser.find_first_packet(self._dataqueue[:])
-            if ans:
-                self._dataqueue = ans[1]
-                # self.logger.debug("found packet of size {}".format(len(ans[
-                # 0])))
-                return ans[0]
-            # self.logger.debug("Could not find packet in received data")
-            tmp = self._s_secondary.recv(1024)
-            self._dataqueue += tmp
+        return self._reader.read_packet()
 
     def wait(self, timeout=0.5):
         """
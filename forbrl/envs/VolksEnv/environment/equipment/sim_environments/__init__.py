@@ -1,3 +1,6 @@
 # from .builder import build_vision_sensors
-from .vrep import Vrep
+from .tabletop import TableTop
 from .registry import SIM_ENVIRONMENTS
+
+# imported by the first config that uses it, as it loads the V-REP remote API
+SIM_ENVIRONMENTS.register_lazy(f"{__name__}.vrep.vrep.Vrep")
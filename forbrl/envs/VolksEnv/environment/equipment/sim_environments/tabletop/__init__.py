@@ -0,0 +1,2 @@
+from .scene import Scene
+from .tabletop import TableTop, get_scene
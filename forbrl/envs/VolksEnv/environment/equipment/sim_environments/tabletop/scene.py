@@ -0,0 +1,344 @@
+import math
+
+
+import numpy as np
+
+# sample points (in units of half extents) used to test footprint overlaps
+FOOTPRINT_GRID = np.array(
+    [[-1, -1], [-1, 0], [-1, 1],
+     [0, -1], [0, 0], [0, 1],
+     [1, -1], [1, 0], [1, 1]], dtype=np.float64)
+
+
+def _to_local(points, centers, yaws):
+    """Express points (P, 2) in the frames of blocks, returns two (P, N)."""
+    d = points[:, None, :] - centers[None, :, :]
+    c, s = np.cos(yaws), np.sin(yaws)
+    local_x = d[..., 0] * c + d[..., 1] * s
+    local_y = -d[..., 0] * s + d[..., 1] * c
+    return local_x, local_y
+
+
+def _inside(points, centers, yaws, half_xy, margin=0.):
+    """Check which points (P, 2) lie in which block footprints, (P, N)."""
+    local_x, local_y = _to_local(points, centers, yaws)
+    return ((np.abs(local_x) <= half_xy[:, 0] + margin) &
+            (np.abs(local_y) <= half_xy[:, 1] + margin))
+
+
+def _footprints(centers, yaws, half_xy, shrink=0.9):
+    """Sample points on the footprints of blocks, (N, 9, 2)."""
+    local = FOOTPRINT_GRID[None] * half_xy[:, None, :] * shrink
+    c, s = np.cos(yaws)[:, None], np.sin(yaws)[:, None]
+    world_x = local[..., 0] * c - local[..., 1] * s
+    world_y = local[..., 0] * s + local[..., 1] * c
+    return np.stack([world_x, world_y], axis=-1) + centers[:, None, :]
+
+
+def _extent(yaws, half_xy, angle):
+    """Half width of blocks projected on the direction of `angle`."""
+    d = angle - yaws
+    return (np.abs(half_xy[:, 0] * np.cos(d)) +
+            np.abs(half_xy[:, 1] * np.sin(d)))
+
+
+class Scene(object):
+    """
+    A tabletop world made of yaw-only box primitives, kept in NumPy arrays.
+
+    This is an approximation of what V-REP simulates for the VPG task:
+    blocks rest on whatever is under their footprint, a finger sweeping
+    below the top of a block pushes it (and whatever it runs into) ahead of
+    the finger, and closing the gripper around a block that fits between the
+    jaws picks it up. Nothing is integrated over time, so every call
+    resolves instantly.
+
+    Handles of blocks are their indices in the arrays, a removed block keeps
+    its slot and is only marked as dead.
+    """
+
+    def __init__(self,
+                 table_limits,
+                 table_height=0.,
+                 table_color=(0.3, 0.3, 0.3),
+                 home=None,
+                 finger_radius=0.01,
+                 finger_length=0.05,
+                 max_grasp_width=0.1,
+                 grasp_margin=0.01,
+                 max_chain=3):
+        self.table_limits = np.asarray(table_limits, dtype=np.float64)[:2]
+        self.table_height = table_height
+        self.table_color = np.asarray(table_color) * 255
+        if home is None:
+            home = np.append(self.table_limits.mean(axis=1),
+                             table_height + 0.4)
+        self.home = np.asarray(home, dtype=np.float64)
+        self.finger_radius = finger_radius
+        self.finger_length = finger_length
+        self.max_grasp_width = max_grasp_width
+        self.grasp_margin = grasp_margin
+        self.max_chain = max_chain
+
+        self.reset()
+
+    def reset(self):
+        self.pos = np.zeros((0, 3))
+        self.yaw = np.zeros(0)
+        self.half = np.zeros((0, 3))
+        self.color = np.zeros((0, 3), dtype=np.uint8)
+        self.alive = np.zeros(0, dtype=bool)
+
+        self.tool_pos = self.home.copy()
+        self.tool_yaw = 0.
+        self.gripper_closed = False
+        self.held = None
+        self._held_offset = None
+
+    @property
+    def num_blocks(self):
+        return int(np.sum(self.alive))
+
+    @property
+    def tops(self):
+        return self.pos[:, 2] + self.half[:, 2]
+
+    @property
+    def bottoms(self):
+        return self.pos[:, 2] - self.half[:, 2]
+
+    def add_block(self, half_extents, pos, yaw=0., color=(1., 0., 0.)):
+        """Drop a block at pos, it lands on whatever is below it."""
+        handle = len(self.alive)
+        self.pos = np.vstack([self.pos, np.asarray(pos, dtype=np.float64)])
+        self.yaw = np.append(self.yaw, yaw)
+        self.half = np.vstack([self.half, np.asarray(half_extents)])
+        self.color = np.vstack(
+            [self.color, (np.asarray(color) * 255).astype(np.uint8)])
+        self.alive = np.append(self.alive, True)
+        self._drop(handle)
+        return handle
+
+    def remove_block(self, handle):
+        if self.held == handle:
+            self.held = None
+        self.alive[handle] = False
+        self.settle()
+
+    def get_position(self, handle):
+        return self.pos[handle].copy()
+
+    def set_position(self, handle, pos):
+        self.pos[handle] = pos
+        self.settle()
+
+    def support_height(self, handle, others):
+        """Height of the highest of `others` under the footprint of handle"""
+        others = np.asarray(others, dtype=int)
+        if len(others) == 0:
+            return self.table_height
+        half_xy = self.half[:, :2]
+
+        own = _footprints(self.pos[[handle], :2], self.yaw[[handle]],
+                          half_xy[[handle]])[0]
+        below = _inside(own, self.pos[others, :2], self.yaw[others],
+                        half_xy[others]).any(axis=0)
+
+        theirs = _footprints(self.pos[others, :2], self.yaw[others],
+                             half_xy[others]).reshape(-1, 2)
+        below |= _inside(theirs, self.pos[[handle], :2], self.yaw[[handle]],
+                         half_xy[[handle]]).reshape(len(others), -1).any(1)
+
+        if not below.any():
+            return self.table_height
+        return max(self.table_height, self.tops[others][below].max())
+
+    def settle(self):
+        """Let every free block rest on the table or on blocks below it."""
+        free = self.alive.copy()
+        if self.held is not None:
+            free[self.held] = False
+        handles = np.flatnonzero(free)
+        order = handles[np.argsort(self.bottoms[handles], kind='stable')]
+        for i, handle in enumerate(order):
+            support = self.support_height(handle, order[:i])
+            self.pos[handle, 2] = support + self.half[handle, 2]
+
+    def _drop(self, handle):
+        others = np.flatnonzero(self.alive)
+        others = others[others != handle]
+        if self.held is not None:
+            others = others[others != self.held]
+        support = self.support_height(handle, others)
+        self.pos[handle, 2] = support + self.half[handle, 2]
+
+    def _sweep(self, start, end, z_range, radius, exclude, depth=0):
+        """
+        Push blocks reached by a disc of radius moving from start to end.
+
+        Blocks hit are moved right in front of the disc at the end of its
+        path, and in turn push the blocks they run into, for up to
+        `max_chain` levels.
+        """
+        move = end - start
+        length = np.linalg.norm(move)
+        if length < 1e-9:
+            return False
+        direct = move / length
+        normal = np.array([-direct[1], direct[0]])
+        angle = np.arctan2(direct[1], direct[0])
+
+        candidates = (self.alive &
+                      (self.tops > z_range[0]) &
+                      (self.bottoms < z_range[1]))
+        candidates[list(exclude)] = False
+        if self.held is not None:
+            candidates[self.held] = False
+        handles = np.flatnonzero(candidates)
+        if len(handles) == 0:
+            return False
+
+        rel = self.pos[handles, :2] - start
+        along = rel @ direct
+        across = rel @ normal
+        half_along = _extent(self.yaw[handles], self.half[handles, :2], angle)
+        half_across = _extent(self.yaw[handles], self.half[handles, :2],
+                              angle + np.pi / 2)
+        target = length + radius + half_along
+        hit = ((np.abs(across) < half_across + radius) &
+               (along + half_along > 0) &
+               (along < target))
+        if not hit.any():
+            return False
+
+        pushed = []
+        for idx in np.flatnonzero(hit)[np.argsort(along[hit])]:
+            handle = handles[idx]
+            old = self.pos[handle, :2].copy()
+            self.pos[handle, :2] = old + (target[idx] - along[idx]) * direct
+            pushed.append((handle, old, half_across[idx]))
+
+        if depth < self.max_chain:
+            exclude = set(exclude) | {p[0] for p in pushed}
+            for handle, old, half_width in pushed:
+                self._sweep(old, self.pos[handle, :2],
+                            (self.bottoms[handle], self.tops[handle]),
+                            half_width, exclude, depth + 1)
+        return True
+
+    def _drop_fallen(self):
+        lower, upper = self.table_limits[:, 0], self.table_limits[:, 1]
+        off_table = np.any((self.pos[:, :2] < lower) |
+                           (self.pos[:, :2] > upper), axis=1)
+        off_table &= self.alive
+        if self.held is not None:
+            off_table[self.held] = False
+        self.alive[off_table] = False
+
+    def move_tool(self, pos, yaw=None):
+        """Move the finger tip straight to pos, pushing what's in the way."""
+        pos = np.asarray(pos, dtype=np.float64)
+        if yaw is not None:
+            self.tool_yaw = yaw
+
+        if self.held is not None:
+            self.pos[self.held] = pos + self._held_offset
+        else:
+            tip_z = max(self.tool_pos[2], pos[2])
+            if self._sweep(self.tool_pos[:2], pos[:2], (tip_z, np.inf),
+                           self.finger_radius, exclude=()):
+                self._drop_fallen()
+                self.settle()
+        self.tool_pos = pos.copy()
+
+    def open_gripper(self):
+        self.gripper_closed = False
+        if self.held is not None:
+            self.held = None
+            self._held_offset = None
+            self._drop_fallen()
+            self.settle()
+
+    def close_gripper(self):
+        """
+        Close the jaws at the tool position.
+
+        Returns:
+            closed (bool): True if jaws closed completely, i.e. nothing is
+                held in between.
+        """
+        self.gripper_closed = True
+        if self.held is not None:
+            return False
+
+        tip = self.tool_pos
+        candidates = (self.alive &
+                      (self.tops > tip[2]) &
+                      (self.bottoms < tip[2] + self.finger_length))
+        candidates &= _inside(tip[None, :2], self.pos[:, :2], self.yaw,
+                              self.half[:, :2], self.grasp_margin)[0]
+        # jaws close perpendicular to the tool orientation
+        width = 2 * _extent(self.yaw, self.half[:, :2],
+                            self.tool_yaw + np.pi / 2)
+        candidates &= width <= self.max_grasp_width
+        if not candidates.any():
+            return True
+
+        handles = np.flatnonzero(candidates)
+        self.held = handles[np.argmax(self.tops[handles])]
+        self._held_offset = self.pos[self.held] - tip
+        return False
+
+    def render(self, center, shape, pixel_size):
+        """
+        Render an orthographic top-down view of the scene.
+
+        Args:
+            center (array): x, y of the center of the view.
+            shape (tuple): height and width of the view in pixels.
+            pixel_size (float): size of a pixel in meters.
+
+        Returns:
+            color_img (np.ndarray): (h, w, 3) uint8 RGB image.
+            height_img (np.ndarray): (h, w) height of the visible surface.
+        """
+        h, w = shape
+        cx, cy = center[0], center[1]
+        height_img = np.full((h, w), self.table_height)
+        # colors are looked up once at the end, 0 is the table and
+        # handle + 1 a block
+        labels = np.zeros((h, w), dtype=np.intp)
+        # view coordinates of the pixel centers
+        xs = cx + (np.arange(w) - (w - 1) / 2) * pixel_size
+        ys = cy - (np.arange(h) - (h - 1) / 2) * pixel_size
+
+        handles = np.flatnonzero(self.alive)
+        handles = handles[np.argsort(self.tops[handles])]
+        reaches = np.hypot(self.half[handles, 0], self.half[handles, 1]) / \
+            pixel_size
+        for handle, reach, (x, y, z), (hx, hy, hz), yaw in zip(
+                handles.tolist(), reaches.tolist(),
+                self.pos[handles].tolist(), self.half[handles].tolist(),
+                self.yaw[handles].tolist()):
+            u_c = (x - cx) / pixel_size + (w - 1) / 2
+            v_c = (cy - y) / pixel_size + (h - 1) / 2
+            u0, u1 = max(int(u_c - reach), 0), min(int(u_c + reach) + 2, w)
+            v0, v1 = max(int(v_c - reach), 0), min(int(v_c + reach) + 2, h)
+            if u0 >= u1 or v0 >= v1:
+                continue
+
+            dx = xs[u0:u1] - x
+            dy = ys[v0:v1, None] - y
+            c, s = math.cos(yaw), math.sin(yaw)
+            mask = np.abs(dx * c + dy * s) <= hx
+            mask &= np.abs(dy * c - dx * s) <= hy
+
+            top = z + hz
+            height_win = height_img[v0:v1, u0:u1]
+            mask &= top > height_win
+            np.copyto(height_win, top, where=mask)
+            np.copyto(labels[v0:v1, u0:u1], handle + 1, where=mask)
+
+        palette = np.vstack([self.table_color.astype(np.uint8), self.color])
+        color_img = np.take(palette, labels, axis=0)
+        return color_img, height_img
@@ -0,0 +1,72 @@
+import itertools
+
+import numpy as np
+
+from .scene import Scene
+from ..registry import SIM_ENVIRONMENTS
+
+# scenes are looked up by client id, the same way equipment talks to V-REP
+_SCENES = dict()
+_CLIENT_IDS = itertools.count()
+
+
+def get_scene(client_id):
+    if client_id not in _SCENES:
+        raise KeyError(f"No TableTop simulation with client id {client_id}")
+    return _SCENES[client_id]
+
+
+@SIM_ENVIRONMENTS.register_module
+class TableTop(object):
+    """
+    A pure NumPy stand-in for V-REP that simulates blocks on a table.
+
+    Equipment connects to it with `client_id` just like with `Vrep`, see the
+    `*TableTop` arms, cameras, grippers and objects. The scene is dropped
+    from the client ids on `close`, or once the TableTop is collected.
+
+    Args:
+        workspace (np.ndarray): x, y and z limits of the workspace, the
+            table spans x and y and lies at the lower z limit.
+    """
+    client_id = None
+
+    def __init__(self,
+                 workspace,
+                 table_color=(0.3, 0.3, 0.3),
+                 home=None,
+                 finger_radius=0.01,
+                 finger_length=0.05,
+                 max_grasp_width=0.1,
+                 grasp_margin=0.01,
+                 max_chain=3):
+        workspace = np.asarray(workspace)
+        self.scene = Scene(workspace[:2], workspace[2][0],
+                           table_color=table_color,
+                           home=home,
+                           finger_radius=finger_radius,
+                           finger_length=finger_length,
+                           max_grasp_width=max_grasp_width,
+                           grasp_margin=grasp_margin,
+                           max_chain=max_chain)
+        self.client_id = next(_CLIENT_IDS)
+        _SCENES[self.client_id] = self.scene
+        self.start()
+
+    def start(self):
+        self.scene.reset()
+
+    def stop(self):
+        pass
+
+    def close(self):
+        _SCENES.pop(self.client_id, None)
+
+    def __del__(self):
+        self.close()
+
+    def __enter__(self):
+        self.start()
+
+    def __exit__(self, *args):
+        self.stop()
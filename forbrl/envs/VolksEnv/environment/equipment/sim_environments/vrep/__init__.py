@@ -1,2 +1,3 @@
 from .vrep import Vrep
 from .vrep_const import OPERATION_MODES
+from .mock_server import MockVrepServer
@@ -0,0 +1,483 @@
+"""
+A local stand-in for the V-REP remote API server.
+
+It speaks the wire protocol of remoteApi.so, so that `vrep_api` connects
+to it unmodified, and serves the subset of commands used by the equipment
+(object handles, positions, orientations, vision sensor image and depth,
+joints, script calls and simulation start/stop) with synthetic data.
+
+The client sends a message every communication cycle and waits for the
+reply, a message being split in packets behind a 6 bytes header (1 to
+tell the endianness, size, packets left). A message is a header (see
+SIMX_HEADER_SIZE in vrep_const) followed by commands, each a sub-header
+(SIMX_SUBHEADER_SIZE), the data identifying the command (e.g. the object
+handle) and its other arguments. The reply echoes the message id and
+holds a reply per command, with the identifying data followed by the
+returned values. The operation mode is in the high bits of the command:
+streaming commands are stored and executed at every simulation step, their
+replies go out with the next reply message, discontinue drops them.
+Everything is little endian.
+"""
+import logging
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from . import vrep_const
+
+PACKET_HEADER = struct.Struct('<HHH')
+# largest packet data, as sent by remoteApi.so, which sizes its receive
+# buffer from the first packet of a message
+MAX_PACKET_DATA = 1294
+HEADER = struct.Struct('<HBiiiHB')
+SUBHEADER = struct.Struct('<iiHiiHiBB')
+assert HEADER.size == vrep_const.SIMX_HEADER_SIZE
+assert SUBHEADER.size == vrep_const.SIMX_SUBHEADER_SIZE
+
+CMD_MASK = 0xffff
+MODE_MASK = 0xff0000
+
+# command codes of remoteApi.so, without the operation mode
+START_PAUSE_STOP = 0x1007
+GET_OBJECT_HANDLE = 0x3001
+GET_OBJECT_POSITION = 0x200e
+SET_OBJECT_POSITION = 0x101b
+GET_OBJECT_ORIENTATION = 0x200d
+SET_OBJECT_ORIENTATION = 0x101a
+REMOVE_OBJECT = 0x1028
+GET_JOINT_POSITION = 0x1001
+SET_JOINT_POSITION = 0x1002
+SET_JOINT_FORCE = 0x100e
+SET_JOINT_TARGET_VELOCITY = 0x1008
+SET_OBJECT_INT_PARAMETER = 0x200a
+SET_OBJECT_FLOAT_PARAMETER = 0x2009
+GET_VISION_SENSOR_IMAGE_BW = 0x1003
+GET_VISION_SENSOR_IMAGE_RGB = 0x1004
+GET_VISION_SENSOR_DEPTH_BUFFER = 0x1017
+CALL_SCRIPT_FUNCTION = 0x3401
+
+# values of START_PAUSE_STOP
+START, PAUSE, STOP = 0, 1, 2
+
+DEFAULT_OBJECTS = ('UR5_target', 'Vision_sensor_persp',
+                   'RG2_openCloseJoint', 'remoteApiCommandServer')
+
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            return None
+        received += n
+    return buf
+
+
+def recv_message(sock):
+    """Read the packets of a message, None once the peer is gone."""
+    parts = []
+    while True:
+        header = _recv_exact(sock, PACKET_HEADER.size)
+        if header is None:
+            return None
+        _, size, left = PACKET_HEADER.unpack(header)
+        data = _recv_exact(sock, size)
+        if data is None:
+            return None
+        parts.append(data)
+        if left == 0:
+            return b''.join(parts)
+
+
+def send_message(sock, message):
+    """Split a message in packets and send them at once."""
+    chunks = [message[i:i + MAX_PACKET_DATA]
+              for i in range(0, len(message), MAX_PACKET_DATA)]
+    sock.sendall(b''.join(
+        PACKET_HEADER.pack(1, len(chunk), len(chunks) - 1 - i) + chunk
+        for i, chunk in enumerate(chunks)))
+
+
+def parse_commands(message):
+    """Yield the (cmd, ident, data) of the commands of a message."""
+    offset = HEADER.size
+    while offset + SUBHEADER.size <= len(message):
+        size, _, ident_size, _, cmd, _, _, _, _ = \
+            SUBHEADER.unpack_from(message, offset)
+        start = offset + SUBHEADER.size
+        yield (cmd, bytes(message[start:start + ident_size]),
+               bytes(message[start + ident_size:offset + size]))
+        offset += size
+
+
+def pack_reply(cmd, ident, data, sim_time, error=False):
+    """The reply to a command, data being the values it returns."""
+    size = SUBHEADER.size + len(ident) + len(data)
+    return SUBHEADER.pack(size, size, len(ident), 0, cmd, 0,
+                          int(sim_time * 1000), int(error), 0) + ident + data
+
+
+def _strings(data, num):
+    """Split num zero terminated strings, return them and the rest."""
+    strings = data.split(b'\0', num)
+    return [s.decode() for s in strings[:num]], strings[num]
+
+
+class _Object(object):
+    def __init__(self, handle, name, pos=(0., 0., 0.), ori=(0., 0., 0.),
+                 added=False):
+        self.handle = handle
+        self.name = name
+        self.pos = list(pos)
+        self.ori = list(ori)
+        self.added = added
+        self.joint_pos = 0.
+        self.joint_vel = 0.
+        self.joint_force = 0.
+        self.int_params = {vrep_const.sim_visionintparam_resolution_x: 640,
+                           vrep_const.sim_visionintparam_resolution_y: 480}
+        self.float_params = {
+            vrep_const.sim_visionfloatparam_near_clipping: 0.01,
+            vrep_const.sim_visionfloatparam_far_clipping: 10.,
+            vrep_const.sim_visionfloatparam_perspective_angle: 0.95}
+
+
+class MockVrepServer(object):
+    """
+    Serve a synthetic V-REP scene on address:port to `vrep_api` clients.
+
+    Args:
+        address (str): address to bind.
+        port (int): port to bind, 0 picks a free one (see `port`).
+        step_time (float): simulation step in seconds, streaming commands
+            are executed once per step.
+        objects (tuple): names of objects in the scene.
+        joint_limits (tuple): range of joint positions.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, address='127.0.0.1', port=19997, step_time=0.05,
+                 objects=DEFAULT_OBJECTS, joint_limits=(-0.05, 0.06)):
+        self.step_time = step_time
+        self.joint_limits = joint_limits
+        self.default_objects = objects
+
+        self.lock = threading.RLock()
+        self.running = False
+        self.sim_time = 0.
+        self.frame = 0
+        self.objects = dict()
+        self.names = dict()
+        self._next_handle = 0
+        self._reset_scene()
+        self._commands = {
+            START_PAUSE_STOP: self._start_pause_stop,
+            GET_OBJECT_HANDLE: self._get_object_handle,
+            GET_OBJECT_POSITION: self._get_object_position,
+            SET_OBJECT_POSITION: self._set_object_position,
+            GET_OBJECT_ORIENTATION: self._get_object_orientation,
+            SET_OBJECT_ORIENTATION: self._set_object_orientation,
+            REMOVE_OBJECT: self._remove_object,
+            GET_JOINT_POSITION: self._get_joint_position,
+            SET_JOINT_POSITION: self._set_joint_position,
+            SET_JOINT_FORCE: self._set_joint_force,
+            SET_JOINT_TARGET_VELOCITY: self._set_joint_target_velocity,
+            SET_OBJECT_INT_PARAMETER: self._set_object_int_parameter,
+            SET_OBJECT_FLOAT_PARAMETER: self._set_object_float_parameter,
+            GET_VISION_SENSOR_IMAGE_BW: self._get_vision_sensor_image_bw,
+            GET_VISION_SENSOR_IMAGE_RGB: self._get_vision_sensor_image_rgb,
+            GET_VISION_SENSOR_DEPTH_BUFFER:
+                self._get_vision_sensor_depth_buffer,
+            CALL_SCRIPT_FUNCTION: self._call_script_function,
+        }
+
+        self._start_time = time.time()
+        self._connections = []
+        self._alive = True
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((address, port))
+        self._sock.listen()
+        self.address, self.port = self._sock.getsockname()
+
+        self._threads = [threading.Thread(target=self._accept, daemon=True),
+                         threading.Thread(target=self._simulate, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        self.logger.debug(f"Mock V-REP server listening on "
+                          f"{self.address}:{self.port}")
+
+    def close(self):
+        self._alive = False
+        self._sock.close()
+        with self.lock:
+            connections = list(self._connections)
+        for conn in connections:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def server_time(self):
+        """Milliseconds since the server started."""
+        return int((time.time() - self._start_time) * 1000)
+
+    def _reset_scene(self):
+        with self.lock:
+            for handle in [h for h, o in self.objects.items() if o.added]:
+                self._remove(handle)
+            for name in self.default_objects:
+                if name not in self.names:
+                    self._add(name)
+
+    def _add(self, name, pos=(0., 0., 0.), ori=(0., 0., 0.), added=False):
+        handle = self._next_handle
+        self._next_handle += 1
+        self.objects[handle] = _Object(handle, name, pos, ori, added)
+        self.names[name] = handle
+        return handle
+
+    def _remove(self, handle):
+        obj = self.objects.pop(handle)
+        self.names.pop(obj.name, None)
+
+    def _accept(self):
+        while self._alive:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = _Connection(self, conn)
+            with self.lock:
+                self._connections.append(connection)
+
+    def _simulate(self):
+        next_tick = time.time()
+        while self._alive:
+            next_tick += self.step_time
+            with self.lock:
+                if self.running:
+                    self._step()
+                    connections = list(self._connections)
+                else:
+                    connections = []
+            for conn in connections:
+                conn.run_streams()
+            time.sleep(max(next_tick - time.time(), 0))
+
+    def _step(self):
+        self.sim_time += self.step_time
+        self.frame += 1
+        low, high = self.joint_limits
+        for obj in self.objects.values():
+            if obj.joint_vel:
+                obj.joint_pos = min(max(
+                    obj.joint_pos + obj.joint_vel * self.step_time, low), high)
+
+    def execute(self, cmd, ident, data):
+        """Run a command, return its reply."""
+        with self.lock:
+            func = self._commands.get(cmd & CMD_MASK)
+            error = func is None
+            values = b''
+            if not error:
+                try:
+                    values = func(ident, data)
+                except (KeyError, IndexError, ValueError, struct.error):
+                    error = True
+            return pack_reply(cmd, ident, values, self.sim_time, error)
+
+    # commands, each decodes its identifying data and arguments and returns
+    # the packed values the client reads
+
+    def _start_pause_stop(self, ident, data):
+        action, = struct.unpack('<i', ident)
+        if action == STOP:
+            self.running = False
+            self.sim_time = 0.
+            self._reset_scene()
+        else:
+            self.running = action == START
+        return b''
+
+    def _get_object_handle(self, ident, data):
+        name = ident.split(b'\0', 1)[0].decode()
+        return struct.pack('<i', self.names[name])
+
+    def _get_object_position(self, ident, data):
+        handle, _ = struct.unpack('<ii', ident)
+        return struct.pack('<3f', *self.objects[handle].pos)
+
+    def _set_object_position(self, ident, data):
+        handle, = struct.unpack('<i', ident)
+        self.objects[handle].pos = list(struct.unpack('<i3f', data)[1:])
+        return b''
+
+    def _get_object_orientation(self, ident, data):
+        handle, _ = struct.unpack('<ii', ident)
+        return struct.pack('<3f', *self.objects[handle].ori)
+
+    def _set_object_orientation(self, ident, data):
+        handle, = struct.unpack('<i', ident)
+        self.objects[handle].ori = list(struct.unpack('<i3f', data)[1:])
+        return b''
+
+    def _remove_object(self, ident, data):
+        self._remove(struct.unpack('<i', ident)[0])
+        return b''
+
+    def _get_joint_position(self, ident, data):
+        handle, = struct.unpack('<i', ident)
+        return struct.pack('<f', self.objects[handle].joint_pos)
+
+    def _set_joint_position(self, ident, data):
+        handle, = struct.unpack('<i', ident)
+        self.objects[handle].joint_pos, = struct.unpack('<f', data)
+        return b''
+
+    def _set_joint_force(self, ident, data):
+        handle, = struct.unpack('<i', ident)
+        self.objects[handle].joint_force, = struct.unpack('<f', data)
+        return b''
+
+    def _set_joint_target_velocity(self, ident, data):
+        handle, = struct.unpack('<i', ident)
+        self.objects[handle].joint_vel, = struct.unpack('<f', data)
+        return b''
+
+    def _set_object_int_parameter(self, ident, data):
+        handle, param = struct.unpack('<ii', ident)
+        self.objects[handle].int_params[param], = struct.unpack('<i', data)
+        return b''
+
+    def _set_object_float_parameter(self, ident, data):
+        handle, param = struct.unpack('<ii', ident)
+        self.objects[handle].float_params[param], = \
+            struct.unpack('<f', data)
+        return b''
+
+    def _resolution(self, handle):
+        params = self.objects[handle].int_params
+        return (params[vrep_const.sim_visionintparam_resolution_x],
+                params[vrep_const.sim_visionintparam_resolution_y])
+
+    def _get_vision_sensor_image_bw(self, ident, data):
+        return self._image(struct.unpack('<i', ident)[0], 1)
+
+    def _get_vision_sensor_image_rgb(self, ident, data):
+        return self._image(struct.unpack('<i', ident)[0], 3)
+
+    def _image(self, handle, channels):
+        res_x, res_y = self._resolution(handle)
+        row = (np.arange(res_x * channels) + self.frame) % 256
+        image = np.broadcast_to(row, (res_y, res_x * channels))
+        return struct.pack('<ii', res_x, res_y) + \
+            image.astype(np.uint8).tobytes()
+
+    def _get_vision_sensor_depth_buffer(self, ident, data):
+        handle, = struct.unpack('<i', ident)
+        res_x, res_y = self._resolution(handle)
+        column = (np.arange(res_y) + self.frame) % res_y / res_y
+        depth = np.broadcast_to(column[:, None], (res_y, res_x))
+        return struct.pack('<ii', res_x, res_y) + \
+            depth.astype('<f4').tobytes()
+
+    def _call_script_function(self, ident, data):
+        # ident: script type, script name and function name, data: the
+        # counts of ints, floats, strings and buffer bytes, then them
+        func = _strings(ident[4:], 2)[0][1]
+        num_ints, num_floats, num_strings, _ = \
+            struct.unpack_from('<4i', data)
+        floats = struct.unpack_from(f'<{num_floats}f', data,
+                                    16 + 4 * num_ints)
+        strings, _ = _strings(data[16 + 4 * (num_ints + num_floats):],
+                              num_strings)
+
+        ints = []
+        if func == 'importShape':
+            ints = [self._add(strings[1], floats[:3], floats[3:6],
+                              added=True)]
+        return struct.pack(f'<4i{len(ints)}i', len(ints), 0, 0, 0, *ints)
+
+
+class _Connection(object):
+    """A client connection, with its streaming commands."""
+
+    def __init__(self, server, sock):
+        self.server = server
+        self.sock = sock
+        self.lock = threading.Lock()
+        # (code, ident) of the streaming commands, to their command and
+        # data, and the replies of their last run
+        self.streams = dict()
+        self.stream_replies = dict()
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def _serve(self):
+        try:
+            while True:
+                message = recv_message(self.sock)
+                if message is None:
+                    break
+                send_message(self.sock, self._reply(message))
+        except OSError:
+            pass
+        finally:
+            with self.server.lock:
+                if self in self.server._connections:
+                    self.server._connections.remove(self)
+            self.sock.close()
+
+    def _reply(self, message):
+        _, version, message_id, client_time, _, _, _ = \
+            HEADER.unpack_from(message)
+        replies = []
+        for cmd, ident, data in parse_commands(message):
+            key = (cmd & CMD_MASK, ident)
+            mode = cmd & MODE_MASK
+            if mode == vrep_const.simx_opmode_discontinue:
+                with self.lock:
+                    self.streams.pop(key, None)
+                    self.stream_replies.pop(key, None)
+                continue
+            if mode == vrep_const.simx_opmode_streaming:
+                with self.lock:
+                    self.streams[key] = (cmd, data)
+            replies.append(self.server.execute(cmd, ident, data))
+        # replies of the streaming commands run since the last message go
+        # first, the ones above are newer
+        with self.lock:
+            replies[:0] = self.stream_replies.values()
+            self.stream_replies.clear()
+        with self.server.lock:
+            state = int(self.server.running)
+        header = HEADER.pack(0, version, message_id, client_time,
+                             self.server.server_time, 0, state)
+        return header + b''.join(replies)
+
+    def run_streams(self):
+        with self.lock:
+            streams = list(self.streams.items())
+        for (code, ident), (cmd, data) in streams:
+            reply = self.server.execute(cmd, ident, data)
+            with self.lock:
+                if (code, ident) in self.streams:
+                    self.stream_replies[(code, ident)] = reply
@@ -1,2 +1,8 @@
-from . import realsense
-from . import realsense_sim
+from ..registry import VISION_SENSORS
+
+# imported by the first config that uses them, as they need pyrealsense2
+# and the V-REP remote API
+VISION_SENSORS.register_lazy(f"{__name__}.realsense.RealsenseCam")
+VISION_SENSORS.register_lazy(f"{__name__}.realsense_sim.RealsenseCamSim")
+VISION_SENSORS.register_lazy(
+    f"{__name__}.realsense_tabletop.RealsenseCamTableTop")
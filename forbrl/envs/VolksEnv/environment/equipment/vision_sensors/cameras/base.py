@@ -20,7 +20,11 @@ class CamBase:
         pass
 
     @abstractmethod
-    def capture(self):
+    def capture(self, newer_than=None):
+        """
+        Return a color and a depth image, taken after newer_than (seconds
+        since the epoch) if given.
+        """
         pass
 
     def __enter__(self):
@@ -0,0 +1,199 @@
+import logging
+
+import numpy as np
+
+
+class DepthAligner:
+    """
+    Align depth images to the color stream of a camera whose intrinsics and
+    extrinsics do not change while streaming, in place of
+    `pyrealsense2.align`.
+    The ray of every depth pixel, rotated into the color frame, is computed
+    once. A depth image then only costs scaling these rays by the depth,
+    projecting them into the color image and scattering the depth values,
+    each on a splat x splat square to cover the color pixels between the
+    projections of neighbouring depth pixels. Like librealsense, zero depth
+    is invalid and overlapping pixels keep the nearest depth, so that the
+    background seen past the edges of an object does not cover it.
+
+    Args:
+        depth_intrinsics (np.ndarray): 3x3 matrix of the depth stream.
+        depth_shape (tuple): (height, width) of the depth images.
+        color_intrinsics (np.ndarray): 3x3 matrix of the color stream.
+        color_shape (tuple): (height, width) of the color images.
+        extrinsics (np.ndarray): 4x4 transform from the depth to the color
+            frame, in meters.
+        depth_scale (float): meters per depth unit.
+        depth_coeffs (sequence): inverse Brown-Conrady coefficients of the
+            depth stream (k1, k2, p1, p2, k3), which undistort its pixels,
+            None for no distortion.
+        color_coeffs (sequence): Brown-Conrady coefficients of the color
+            stream, which distort the projections, None for no distortion.
+        splat (int): side of the square a depth pixel covers, by default
+            the ratio of the focal lengths rounded up.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, depth_intrinsics, depth_shape, color_intrinsics,
+                 color_shape, extrinsics=None, depth_scale=0.001,
+                 depth_coeffs=None, color_coeffs=None, splat=None):
+        self.depth_shape = tuple(depth_shape)
+        self.color_shape = tuple(color_shape)
+        self.color_intrinsics = np.asarray(color_intrinsics, np.float64)
+        self.depth_scale = depth_scale
+        if extrinsics is None:
+            extrinsics = np.eye(4)
+        self.color_coeffs = self._coeffs(color_coeffs)
+        if splat is None:
+            ratio = self.color_intrinsics[(0, 1), (0, 1)] / \
+                np.asarray(depth_intrinsics)[(0, 1), (0, 1)]
+            splat = max(int(np.ceil(ratio.max() - 1e-6)), 1)
+        self.splat = splat
+
+        # rays of the depth pixels at unit depth, in the color frame
+        h, w = self.depth_shape
+        pix_x, pix_y = np.meshgrid(np.arange(w), np.arange(h))
+        depth_intrinsics = np.asarray(depth_intrinsics, np.float64)
+        x = (pix_x.ravel() - depth_intrinsics[0, 2]) / depth_intrinsics[0, 0]
+        y = (pix_y.ravel() - depth_intrinsics[1, 2]) / depth_intrinsics[1, 1]
+        coeffs = self._coeffs(depth_coeffs)
+        if coeffs is not None:
+            x, y = self._distort(x, y, coeffs)
+        rays = np.stack([x, y, np.ones_like(x)])
+        rays = np.asarray(extrinsics)[:3, :3] @ rays * depth_scale
+        translation = np.asarray(extrinsics)[:3, 3]
+        if self.color_coeffs is None:
+            # project straight to pixels, saves the intrinsics per frame
+            rays = self.color_intrinsics @ rays
+            translation = self.color_intrinsics @ translation
+        # float32 halves the memory traffic of the per frame work
+        self._rays = np.ascontiguousarray(rays, np.float32)
+        self._translation = translation.astype(np.float32)
+        self.logger.debug(f"Initialized {self.__class__.__name__}:\n"
+                          f" {self.__repr__()}")
+
+    def __repr__(self):
+        msg = (f"Depth aligner from {self.depth_shape} to "
+               f"{self.color_shape} with splat {self.splat}")
+        return msg
+
+    @classmethod
+    def from_profiles(cls, depth_profile, color_profile, depth_scale,
+                      splat=None):
+        """Build from the video stream profiles of a pyrealsense2 pipeline."""
+        import pyrealsense2 as rs
+
+        depth = depth_profile.as_video_stream_profile().get_intrinsics()
+        color = color_profile.as_video_stream_profile().get_intrinsics()
+        rs_extrinsics = depth_profile.get_extrinsics_to(color_profile)
+        extrinsics = np.eye(4)
+        # librealsense stores the rotation column major
+        extrinsics[:3, :3] = np.reshape(rs_extrinsics.rotation, (3, 3)).T
+        extrinsics[:3, 3] = rs_extrinsics.translation
+        return cls(cls._matrix(depth), (depth.height, depth.width),
+                   cls._matrix(color), (color.height, color.width),
+                   extrinsics, depth_scale,
+                   cls._coeffs_of(depth, rs.distortion.inverse_brown_conrady),
+                   cls._coeffs_of(color, rs.distortion.modified_brown_conrady),
+                   splat)
+
+    @classmethod
+    def _coeffs_of(cls, intrinsics, model):
+        """
+        Coefficients of intrinsics if it has the distortion model that
+        rs.align applies to the stream, it ignores the others.
+        """
+        if intrinsics.model == model:
+            return intrinsics.coeffs
+        if np.any(intrinsics.coeffs):
+            cls.logger.warning(f"Ignored the distortion of {intrinsics}, "
+                               f"like rs.align")
+        return None
+
+    @staticmethod
+    def _matrix(intrinsics):
+        return np.array([[intrinsics.fx, 0, intrinsics.ppx],
+                         [0, intrinsics.fy, intrinsics.ppy],
+                         [0, 0, 1]])
+
+    @staticmethod
+    def _coeffs(coeffs):
+        if coeffs is None or not np.any(coeffs):
+            return None
+        return np.asarray(coeffs, np.float64)
+
+    @staticmethod
+    def _distort(x, y, coeffs):
+        k1, k2, p1, p2, k3 = coeffs[:5]
+        r2 = x * x + y * y
+        f = 1 + r2 * (k1 + r2 * (k2 + r2 * k3))
+        xy = x * y
+        return (x * f + 2 * p1 * xy + p2 * (r2 + 2 * x * x),
+                y * f + 2 * p2 * xy + p1 * (r2 + 2 * y * y))
+
+    def project(self, depth_img):
+        """
+        Return the color pixels x and y of the pixels of a depth image, nan
+        for zero depth.
+        """
+        z = depth_img.ravel().astype(np.float32)
+        z[z == 0] = np.nan
+        t = self._translation
+        inv_z = self._rays[2] * z
+        inv_z += t[2]
+        np.reciprocal(inv_z, out=inv_z)
+        x = self._rays[0] * z
+        x += t[0]
+        x *= inv_z
+        y = self._rays[1] * z
+        y += t[1]
+        y *= inv_z
+        if self.color_coeffs is not None:
+            x, y = self._distort(x, y, self.color_coeffs)
+            k = self.color_intrinsics
+            x *= k[0, 0]
+            x += k[0, 2]
+            y *= k[1, 1]
+            y += k[1, 2]
+        return x, y
+
+    def align(self, depth_img):
+        """Return depth_img (in depth units) seen from the color camera."""
+        h, w = self.color_shape
+        pix_x, pix_y = self.project(depth_img)
+        # top left corner of the square of each depth pixel, rounded
+        offset = 0.5 - (self.splat - 1) / 2
+        pix_x += offset
+        pix_y += offset
+        inside = (pix_x >= 0) & (pix_x < w - self.splat + 1) & \
+                 (pix_y >= 0) & (pix_y < h - self.splat + 1)
+        with np.errstate(invalid='ignore'):
+            corners = pix_y.astype(np.intp)
+            corners *= w
+            corners += pix_x.astype(np.intp)
+        # pixels outside the color image and with zero depth are written
+        # past its end, which saves selecting the others
+        dump = h * w
+        corners[~inside] = dump
+
+        aligned = np.zeros(dump + (self.splat - 1) * (w + 1) + 1,
+                           depth_img.dtype)
+        values = depth_img.ravel()
+        shifts = np.array([dy * w + dx for dy in range(self.splat)
+                           for dx in range(self.splat)])
+        for shift in shifts:
+            # shifting the array saves shifting the indices
+            aligned[shift:][corners] = values
+        # the last written value wins where squares overlap. The depth pixels
+        # whose square kept a farther value, the few on the edges of
+        # occluding objects, are written again from far to near, so that
+        # overlapping pixels keep the nearest depth.
+        farthest = aligned[:dump + 1].copy()
+        for shift in shifts[1:]:
+            np.maximum(farthest, aligned[shift:][:dump + 1], out=farthest)
+        lost = np.flatnonzero(inside & (values < farthest[corners]))
+        lost = lost[np.argsort(values[lost], kind='stable')[::-1]]
+        pixels = (corners[lost, None] + shifts).ravel()
+        aligned[pixels] = np.minimum(
+            aligned[pixels], np.repeat(values[lost], shifts.size))
+        return aligned[:dump].reshape(h, w)
@@ -1,11 +1,19 @@
 import json
 import logging
+import threading
 import time
+from collections import deque
 
 import numpy as np
-import pyrealsense2 as rs
+
+try:
+    import pyrealsense2 as rs
+except ImportError:
+    # not needed by the simulated cameras
+    rs = None
 
 from .base import CamBase
+from .depth_align import DepthAligner
 from ..registry import VISION_SENSORS
 
 DS5_PRODUCT_IDS = ["0AD1", "0AD2", "0AD3", "0AD4", "0AD5", "0AF6", "0AFE",
@@ -14,7 +22,16 @@ DS5_PRODUCT_IDS = ["0AD1", "0AD2", "0AD3", "0AD4", "0AD5", "0AF6", "0AFE",
 
 @VISION_SENSORS.register_module
 class RealsenseCam(CamBase):
-    """Python interface for Intel Realsense Family cameras."""
+    """
+    Python interface for Intel Realsense Family cameras.
+    With threaded, a background thread keeps the last buffer_size aligned
+    frames with their timestamps, so that capture returns without waiting
+    for the sensor and the alignment. capture(newer_than=t) returns the
+    first frame taken after t (time.time() seconds), e.g. after the arm
+    settled, waiting for it at most frame_timeout seconds.
+    align selects how depth is aligned to color: 'librealsense' for
+    `rs.align`, 'cached' for a DepthAligner built once per stream profile.
+    """
     # TODO: consider using decorator for patterns in functions such as
     #  'restart', 'capture' and 'update_device' if necessary
     logger = logging.getLogger(__name__)
@@ -27,7 +44,13 @@ class RealsenseCam(CamBase):
                  serial_number=None,
                  reset_delay=3,
                  timeout=50,
-                 preset=None):
+                 preset=None,
+                 threaded=False,
+                 buffer_size=4,
+                 frame_timeout=1.,
+                 align='librealsense'):
+        if rs is None:
+            raise ImportError(f"{self.__class__.__name__} needs pyrealsense2")
         self._align = None
         self._serial_number = None
         self._depth_scale = None
@@ -42,6 +65,18 @@ class RealsenseCam(CamBase):
         self.depth_fr = depth_fr
         self.reset_delay = reset_delay
         self.timeout = timeout
+        if align not in ('librealsense', 'cached'):
+            raise ValueError(f"align should be 'librealsense' | 'cached', "
+                             f"while '{align}' provided")
+        self.align = align
+        self.threaded = threaded
+        self.frame_timeout = frame_timeout
+        self.timestamp = None
+        self._frames = deque(maxlen=buffer_size)
+        self._frame_cond = threading.Condition()
+        self._grabber = None
+        self._grabbing = False
+        self._grab_error = None
 
         if serial_number is not None:
             self.serial_number = serial_number
@@ -179,7 +214,12 @@ class RealsenseCam(CamBase):
         depth_sensor = profile.get_device().first_depth_sensor()
         self._depth_scale = depth_sensor.get_depth_scale()
 
-        self._align = rs.align(rs.stream.color)
+        if self.align == 'cached':
+            self._align = DepthAligner.from_profiles(
+                profile.get_stream(rs.stream.depth), stream,
+                self._depth_scale)
+        else:
+            self._align = rs.align(rs.stream.color)
         self.logger.debug(f"{self.device_cat} with serial number: "
                           f"{self.serial_number} start streaming.")
 
@@ -200,6 +240,7 @@ class RealsenseCam(CamBase):
         # Start streaming
         try:
             self.start_()
+            self.start_grabber()
         except RuntimeError as e:
             orig_msg = f'{e}'
             if "No device connected" in orig_msg:
@@ -229,39 +270,132 @@ class RealsenseCam(CamBase):
                        f"{self.reset_delay} seconds")
                 self.logger.warning(msg)
                 self.restart()
+                self.start_grabber()
             else:
                 raise e
 
+    def start_grabber(self):
+        if not self.threaded:
+            return
+        self._frames.clear()
+        self._grab_error = None
+        self._grabbing = True
+        self._grabber = threading.Thread(target=self._grab, daemon=True)
+        self._grabber.start()
+
+    def stop_grabber(self):
+        self._grabbing = False
+        if self._grabber is not None:
+            self._grabber.join()
+            self._grabber = None
+
+    def _grab(self):
+        failures = 0
+        while self._grabbing:
+            try:
+                frame = self.capture_()
+            except (AssertionError, RuntimeError) as e:
+                # wait_for_frames raises RuntimeError when it times out
+                failures += 1
+                self.logger.warning(f"{e}, trying again, retried {failures} "
+                                    f"times")
+                if failures < self.timeout:
+                    continue
+                with self._frame_cond:
+                    self._grab_error = e
+                    self._frame_cond.notify_all()
+                break
+            failures = 0
+            with self._frame_cond:
+                self._frames.append(frame)
+                self._frame_cond.notify_all()
+
+    @staticmethod
+    def frame_time(frames):
+        """Time of frames in seconds since the epoch."""
+        if frames.get_frame_timestamp_domain() in (
+                rs.timestamp_domain.system_time,
+                rs.timestamp_domain.global_time):
+            return frames.get_timestamp() / 1000.
+        # the hardware clock of the camera is not the host clock
+        return time.time()
+
     def capture_(self):
         frames = self._pipeline.wait_for_frames()
-        # Align the depth frame to color frame
-        aligned_frames = self._align.process(frames)
-        # Get aligned frames
-        aligned_depth_frame = aligned_frames.get_depth_frame()
-        color_frame = aligned_frames.get_color_frame()
-        for _ in [aligned_depth_frame, color_frame]:
-            assert _ is not None, "Didn't get intended frame"
-        depth_img = (np.asanyarray(aligned_depth_frame.get_data()) *
-                     self.depth_scale)
-        color_img = np.asanyarray(color_frame.get_data())
+        timestamp = self.frame_time(frames)
+        if self.align == 'cached':
+            depth_frame = frames.get_depth_frame()
+            color_frame = frames.get_color_frame()
+            for _ in [depth_frame, color_frame]:
+                assert _ is not None, "Didn't get intended frame"
+            depth_img = (self._align.align(
+                np.asanyarray(depth_frame.get_data())) * self.depth_scale)
+        else:
+            # Align the depth frame to color frame
+            aligned_frames = self._align.process(frames)
+            # Get aligned frames
+            aligned_depth_frame = aligned_frames.get_depth_frame()
+            color_frame = aligned_frames.get_color_frame()
+            for _ in [aligned_depth_frame, color_frame]:
+                assert _ is not None, "Didn't get intended frame"
+            depth_img = (np.asanyarray(aligned_depth_frame.get_data()) *
+                         self.depth_scale)
+        # copied so that the frame goes back to the pool of librealsense
+        color_img = np.array(color_frame.get_data())
         self.logger.debug(f"Frame captured!\n With color image of size "
                           f"{color_img.shape}, depth image of size"
                           f" {depth_img.shape}")
-        return color_img, depth_img
+        return timestamp, color_img, depth_img
 
-    def capture(self):
+    def capture(self, newer_than=None):
+        if self.threaded:
+            return self.capture_buffered(newer_than)
         for _ in range(self.timeout):
             try:
-                return self.capture_()
+                timestamp, color_img, depth_img = self.capture_()
             except AssertionError as e:
                 self.logger.warning(f"{e}, trying again, retried {_} times")
+                continue
+            # frames queued by the pipeline may predate newer_than
+            if newer_than is None or timestamp > newer_than:
+                self.timestamp = timestamp
+                return color_img, depth_img
         else:
             msg = (f"Could not get complete frame in {self.timeout} "
                    f"tries.")
             self.logger.error(msg)
             raise TimeoutError(msg)
 
+    def capture_buffered(self, newer_than=None):
+        """
+        Return copies of the newest buffered frame, or of the first one
+        taken after newer_than, waiting for it if needed.
+        """
+        def find():
+            if self._grab_error is not None:
+                raise TimeoutError(f"Could not get complete frame in "
+                                   f"{self.timeout} tries: "
+                                   f"{self._grab_error}")
+            if newer_than is None:
+                return self._frames[-1] if self._frames else None
+            for frame in self._frames:
+                if frame[0] > newer_than:
+                    return frame
+            return None
+
+        with self._frame_cond:
+            frame = self._frame_cond.wait_for(find, self.frame_timeout)
+        if frame is None:
+            msg = f"No frame received in {self.frame_timeout} s."
+            self.logger.error(msg)
+            raise TimeoutError(msg)
+        timestamp, color_img, depth_img = frame
+        self.timestamp = timestamp
+        # consumers draw on the images, the buffer is shared
+        return color_img.copy(), depth_img.copy()
+
     def stop(self):
+        self.stop_grabber()
         self.hardware_reset()
         self._pipeline.stop()
 
@@ -90,7 +90,7 @@ class RealsenseCamSim(RealsenseCam):
         # depth
         self._depth_scale = self.depth
 
-    def capture(self):
+    def capture(self, newer_than=None):
         # Get color image from simulation
         sim_ret, resolution, raw_image = vrep_api.simxGetVisionSensorImage(
             self.client_id, self.cam_handle, 0, self.mode)
@@ -0,0 +1,100 @@
+
+import logging
+
+import numpy as np
+
+from .realsense_sim import RealsenseCamSim
+from ..registry import VISION_SENSORS
+from ...sim_environments.tabletop import get_scene
+
+
+@VISION_SENSORS.register_module
+class RealsenseCamTableTop(RealsenseCamSim):
+    """
+    Python interface for Intel Realsense Family cameras in a `TableTop`
+    simulation. The camera looks straight down from `position` and renders
+    an orthographic view in which a pixel covers `pixel_size` meters of the
+    table, intrinsics are chosen to match at the height of the table.
+    Being orthographic, it also renders heightmaps directly, see
+    `capture_heightmap`.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self,
+                 color_res=(224, 224),
+                 position=(-0.5, 0., 10.),
+                 pixel_size=0.002,
+                 depth=1.):
+
+        self.res_x, self.res_y = color_res
+        self.position = np.asarray(position, dtype=np.float64)
+        self.pixel_size = pixel_size
+        self.depth = depth
+        self.client_id = None
+        self.scene = None
+
+        # super().__init__()
+
+    def connect(self, client_id):
+        self.client_id = client_id
+        self.init_pipeline()
+
+    def init_pipeline(self):
+        self.start()
+
+    def get_property(self):
+        # intrinsics
+        ppx = (self.res_x - 1) / 2
+        ppy = (self.res_y - 1) / 2
+        cam_height = self.position[2] - self.scene.table_height
+        fx = fy = cam_height / self.pixel_size
+        self._intrinsics = np.array(
+            [[fx, 0, ppx],
+             [0, fy, ppy],
+             [0, 0, 1]])
+
+        # extrinsics, looking down with image x along robot x
+        self._extrinsics = np.eye(4, 4)
+        self._extrinsics[0:3, 0:3] = np.diag([1., -1., -1.])
+        self._extrinsics[0:3, 3] = self.position
+
+        # depth
+        self._depth_scale = self.depth
+
+    def capture(self, newer_than=None):
+        color_img, height_img = self.scene.render(
+            self.position[:2], (self.res_y, self.res_x), self.pixel_size)
+        depth_img = self.position[2] - height_img
+        return color_img, depth_img
+
+    def capture_heightmap(self, workspace_limits, heightmap_resolution):
+        """
+        Render the heightmaps that utils.get_heightmap builds from a
+        captured frame, without the perspective frame and its point cloud.
+        Rows go along robot y and columns along robot x, heights are above
+        the bottom of the workspace, nan above its top.
+        """
+        workspace_limits = np.asarray(workspace_limits)
+        heightmap_size = np.round((
+            (workspace_limits[1][1] - workspace_limits[1][0]) /
+            heightmap_resolution,
+            (workspace_limits[0][1] - workspace_limits[0][0]) /
+            heightmap_resolution)).astype(int)
+        color_heightmap, height_img = self.scene.render(
+            workspace_limits[:2].mean(axis=1), heightmap_size,
+            heightmap_resolution)
+        # rendered views have robot y pointing up
+        color_heightmap = color_heightmap[::-1]
+        depth_heightmap = height_img[::-1] - workspace_limits[2][0]
+        above = height_img[::-1] >= workspace_limits[2][1]
+        if above.any():
+            color_heightmap[above] = 0
+            depth_heightmap[above] = np.nan
+        return color_heightmap, depth_heightmap
+
+    def start(self):
+        self.scene = get_scene(self.client_id)
+        self.get_property()
+
+    def stop(self):
+        self.scene = None
@@ -3,7 +3,12 @@ This module contains different runners designed for different tasks which
 makes use of the equipment and cerebrum of the VedaEnv
 """
 from .builder import build_runner
-from .calib_verifier import CalibVerifier
-from .eye_in_hand_calibrator import EyeInHandCalibrator
-from .path_verifier import PathVerifier
-from .vpg import VPG
+from .registry import RUNNERS
+
+# imported by the first config that uses them, e.g. the calibration runners
+# need math3d
+RUNNERS.register_lazy(f"{__name__}.calib_verifier.CalibVerifier")
+RUNNERS.register_lazy(
+    f"{__name__}.eye_in_hand_calibrator.EyeInHandCalibrator")
+RUNNERS.register_lazy(f"{__name__}.path_verifier.PathVerifier")
+RUNNERS.register_lazy(f"{__name__}.vpg.VPG")
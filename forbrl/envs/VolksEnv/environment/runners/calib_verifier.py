@@ -126,7 +126,8 @@ class CalibVerifier:
         self.cam.start()
         try:
             while True:
-                color_img, _ = self.cam.capture()
+                # each frame once, the loop runs at the frame rate
+                color_img, _ = self.cam.capture(newer_than=self.cam.timestamp)
                 cv2.circle(color_img, (round(self.cam.intrinsics.ppx),
                                        round(self.cam.intrinsics.ppy)),
                            2, (0, 255, 0), 2)
@@ -2,13 +2,16 @@ import glob
 import logging
 import os
 import pickle
+import threading
 import time
+from queue import Full, Queue
 
 import numpy as np
 from tqdm import tqdm
 
 from .registry import RUNNERS
-from ..utils import get_time_iso, save_collected
+from ..utils import (SessionReader, SessionWriter, get_time_iso,
+                     is_session, save_collected)
 
 
 @RUNNERS.register_module
@@ -17,12 +20,20 @@ class EyeInHandCalibrator:
     A calibrator that does eye in hand calibration for a system that contains
     a robotic arm, a camera and a fiducial marker that serves as a
     calibration board.
+    Frames are captured once the joints of the arm have settled, for
+    settle_hold seconds. With pipeline, board detection and saving run in a
+    worker thread while the arm moves to the next pose, at most queue_size
+    frames wait for it. Samples are appended to a columnar session (see
+    utils.session) by a background writer, sessions saved as one file per
+    matrix by earlier versions can still be calculated.
     """
     logger = logging.getLogger(__name__)
 
     def __init__(self, arm=None, cam=None, calhcam=None,
                  path_generator=None, axyb_solver=None, work_dir=None,
-                 calculate_from_past_session=None):
+                 calculate_from_past_session=None, acc=0.6, vel=3,
+                 settle_hold=0.1, settle_timeout=5, pipeline=True,
+                 queue_size=4):
         self.arm = arm
         self.cam = cam
         self.calhcam = calhcam
@@ -30,6 +41,12 @@ class EyeInHandCalibrator:
         self.axyb_solver = axyb_solver
         self.work_dir = work_dir
         self.calculate_session = calculate_from_past_session
+        self.acc = acc
+        self.vel = vel
+        self.settle_hold = settle_hold
+        self.settle_timeout = settle_timeout
+        self.pipeline = pipeline
+        self.queue_size = queue_size
         self.logger.debug(f"Initialized {self.__class__.__name__}:\n"
                           f" {self.__repr__()}")
 
@@ -41,7 +58,8 @@ class EyeInHandCalibrator:
                f"    path_generator:{self.path_generator}\n"
                f"    axyb_solver:{self.axyb_solver}\n"
                f"    work_dir:{self.work_dir}\n"
-               f"    calculate_only:{self.calculate_session}\n")
+               f"    calculate_only:{self.calculate_session}\n"
+               f"    pipeline:{self.pipeline}\n")
         return msg
 
     def run(self):
@@ -53,7 +71,21 @@ class EyeInHandCalibrator:
             session_dir = os.path.join(self.work_dir, self.calculate_session)
         self.calculate(session_dir)
 
-    def calculate(self, session_dir):
+    def load_session(self, session_dir):
+        """
+        Return the names of the samples of a session and their cal2cam and
+        base2tool matrices, stacked on the last axis.
+        """
+        if is_session(session_dir):
+            session = SessionReader(session_dir)
+            for required in ['cal2cam_mat', 'base2tool_mat']:
+                assert required in session.arrays, f"404 {required} not found"
+            samples = [f"pose {sample.get('index', idx)}"
+                       for idx, sample in enumerate(session.samples)]
+            return (samples,
+                    np.moveaxis(session['cal2cam_mat'], 0, -1),
+                    np.moveaxis(session['base2tool_mat'], 0, -1))
+
         stored = os.listdir(session_dir)
         for required in ['cal2cam_mat', 'base2tool_mat']:
             assert required in stored, f"404 {required} not found"
@@ -67,15 +99,21 @@ class EyeInHandCalibrator:
                 cc_mats.append(pickle.load(mat))
             with open(bt_dir, 'rb') as mat:
                 bt_mats.append(pickle.load(mat))
-        cc_mats = np.stack(cc_mats, axis=-1)
-        bt_mats = np.stack(bt_mats, axis=-1)
+        return samples, np.stack(cc_mats, axis=-1), np.stack(bt_mats, axis=-1)
+
+    def calculate(self, session_dir):
+        samples, cc_mats, bt_mats = self.load_session(session_dir)
 
         estimation = self.axyb_solver.by_kronecker_product(cc_mats, bt_mats)
 
         calibrate_res = {'cam2tool': estimation[0],
                          'calib2base': estimation[1],
                          'calib2base_check': estimation[2],
-                         'Error(mean, std)': estimation[3]}
+                         'Error(mean, std)': estimation[3],
+                         'Residuals(m, deg)': self.axyb_solver.residuals}
+        for idx in np.flatnonzero(~self.axyb_solver.inliers):
+            self.logger.info(f"Dropped outlier {samples[idx]} with "
+                             f"residuals {self.axyb_solver.residuals[idx]}")
 
         calibration_dir = os.path.join(session_dir, 'results')
         save_collected(calibration_dir, flat=True, **calibrate_res)
@@ -87,39 +125,110 @@ class EyeInHandCalibrator:
 
     def capture(self, session_dir):
         self.cam.start()
-        for idx, point in enumerate(
-                tqdm(self.path_generator.path_by_grid(),
-                     total=self.path_generator.path_step ** 3,
-                     dynamic_ncols=True,
-                     desc="Calibrating Eye in hand",
-                     unit='pose',
-                     unit_scale=True)):
-            try:
-                self.arm.movej(point, 0.6, 3)  # 0.8acc + 0.5sleep not working
-                time.sleep(0.8)
-                color_img, depth_img = self.cam.capture()
-                cam2cal = self.calhcam(color_img)
-                if cam2cal is not None:
+        devices = dict(arm=repr(self.arm), camera=repr(self.cam),
+                       calhcam=repr(self.calhcam))
+        self._writer = SessionWriter(session_dir, devices=devices,
+                                     queue_size=self.queue_size)
+        frames = Queue(maxsize=self.queue_size)
+        worker = threading.Thread(target=self._process_frames,
+                                  args=(session_dir, frames), daemon=True)
+        self._worker_error = None
+        if self.pipeline:
+            worker.start()
+        self._process_time = 0
+        move_time = 0
+        path = self.path_generator.path_by_grid()
+        estimated = self.path_generator.motion_time(path, self.vel, self.acc)
+        self.logger.info(f"Estimated motion time through {len(path)} poses: "
+                         f"{estimated:.1f} s")
+        start = time.time()
+        try:
+            for idx, point in enumerate(
+                    tqdm(path,
+                         dynamic_ncols=True,
+                         desc="Calibrating Eye in hand",
+                         unit='pose',
+                         unit_scale=True)):
+                try:
+                    tic = time.time()
+                    self.arm.movej(point, self.acc, self.vel)
+                    if not self.arm.wait_settled(hold=self.settle_hold,
+                                                 timeout=self.settle_timeout):
+                        self.logger.warning(f"Arm not settled after "
+                                            f"{self.settle_timeout} s at "
+                                            f"frame: {idx}")
+                    settled = time.time()
+                    move_time += settled - tic
+                    color_img, depth_img = self.cam.capture(
+                        newer_than=settled)
                     base2tool = np.array(self.arm.get_pose().get_matrix())
-                    cal2cam = np.linalg.inv(cam2cal)
-                    data = {
-                        'color_img': color_img,
-                        # 'depth_img': depth_img,
-                        # 'movej_cmd': (idx, point),
-                        # 'getl_cmd': (idx, ur5.getl()),
-                        'cal2cam_mat': cal2cam,
-                        'base2tool_mat': base2tool,
-                        # 'tool2base_mat': tool2base
-                    }
-                    save_collected(session_dir, **data)
-                    self.logger.debug(f"Successfully collected a data point "
-                                      f"with joint positions: {point}.")
+                except RuntimeError as e:
+                    self.logger.info(f"Unexpected event happened, {e}")
+                    continue
+                frame = (idx, point, color_img, base2tool)
+                if self.pipeline:
+                    self._raise_worker_error()
+                    frames.put(frame)
                 else:
-                    tqdm.write(f"Oops, didn't find the calibration board at "
-                               f"frame: {idx} with joint positions: {point}.")
-
-            except RuntimeError as e:
-                self.logger.info(f"Unexpected event happened, {e}")
-
-        self.cam.stop()
-        self.arm.close()
+                    self._process_frame(session_dir, *frame)
+        finally:
+            if self.pipeline:
+                # the worker may be gone, never block on a full queue
+                while worker.is_alive():
+                    try:
+                        frames.put(None, timeout=1)
+                        break
+                    except Full:
+                        pass
+                worker.join()
+            self._writer.close()
+            self.cam.stop()
+            self.arm.close()
+        self._raise_worker_error()
+        self.logger.info(f"Captured in {time.time() - start:.1f} s, moving "
+                         f"and settling took {move_time:.1f} s, detection "
+                         f"and saving {self._process_time:.1f} s")
+
+    def _process_frames(self, session_dir, frames):
+        while True:
+            frame = frames.get()
+            if frame is None:
+                break
+            if self._worker_error is not None:
+                continue
+            try:
+                self._process_frame(session_dir, *frame)
+            except Exception as ex:
+                self.logger.error(f"Failed to process frame {frame[0]}: "
+                                  f"{ex}")
+                self._worker_error = ex
+
+    def _raise_worker_error(self):
+        if self._worker_error is not None:
+            error, self._worker_error = self._worker_error, None
+            raise RuntimeError("Failed to process the frames") from error
+
+    def _process_frame(self, session_dir, idx, point, color_img, base2tool):
+        """Detect the board in a frame and save the sample."""
+        tic = time.time()
+        try:
+            cam2cal = self.calhcam(color_img)
+            if cam2cal is not None:
+                cal2cam = np.linalg.inv(cam2cal)
+                data = {
+                    'color_img': color_img,
+                    # 'depth_img': depth_img,
+                    'cal2cam_mat': cal2cam,
+                    'base2tool_mat': base2tool,
+                    # 'tool2base_mat': tool2base
+                }
+                meta = dict(index=idx, joints=[float(q) for q in point])
+                self._writer.append(meta, **data)
+                self.logger.debug(f"Successfully collected a data point "
+                                  f"with joint positions: {point}.")
+            else:
+                tqdm.write(f"Oops, didn't find the calibration board at "
+                           f"frame: {idx} with joint positions: {point}.")
+        except RuntimeError as e:
+            self.logger.info(f"Unexpected event happened, {e}")
+        self._process_time += time.time() - tic
@@ -37,7 +37,8 @@ class PathVerifier:
         self.cam.start()
         try:
             while True:
-                color_img, depth_img = self.cam.capture()
+                color_img, depth_img = self.cam.capture(
+                    newer_than=self.cam.timestamp)
                 cv2.namedWindow("camera feed", cv2.WINDOW_AUTOSIZE)
                 cv2.imshow("camera feed", color_img)
 
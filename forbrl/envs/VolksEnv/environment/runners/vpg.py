@@ -1,11 +1,48 @@
 
 import time
 import logging
+from functools import partial
 
 import numpy as np
 
 from .registry import RUNNERS
-from ..utils import get_heightmap
+from ..utils import PixelProjector, get_heightmap, run_concurrently
+
+
+class MotionSequencer(object):
+    """
+    Chain the arm moves and gripper actions of a motion primitive.
+    Gripper actions start in the background and the following arm moves
+    run along, a move issued with `after_gripper` waits for the pending
+    action first. The result of an action is only waited for when asked,
+    through the returned future.
+    """
+
+    def __init__(self, arm, gripper):
+        self.arm = arm
+        self.gripper = gripper
+        self._pending = None
+
+    def move(self, pos, ori, after_gripper=False):
+        if after_gripper:
+            self.wait()
+        self.arm.movel(np.append(pos, ori))
+
+    def open(self):
+        self.wait()
+        self._pending = self.gripper.open_async()
+        return self._pending
+
+    def close(self):
+        self.wait()
+        self._pending = self.gripper.close_async()
+        return self._pending
+
+    def wait(self):
+        """Wait for the pending gripper action and return its result"""
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            return pending.result()
 
 
 @RUNNERS.register_module
@@ -25,7 +62,8 @@ class VPG(object):
                  grasp_loc_margin=0.15, push_margin=0.1,
                  push_length=0.1,
                  pixel_thresh=300, depth_thresh=[0.01, 0.3],
-                 no_change_thresh=10, empty_threshold=300):
+                 no_change_thresh=10, empty_threshold=300,
+                 restart_delay=2):
 
         self.sim = sim
         self.arm = arm
@@ -48,18 +86,30 @@ class VPG(object):
         self.depth_low_thresh, self.depth_high_thresh = depth_thresh
         self.no_change_thresh = no_change_thresh
         self.empty_threshold = empty_threshold
+        self.restart_delay = restart_delay
 
         # refresh after calling get-state()
         self.depth_heightmap = None
         self.no_change = [0, 0]
-
-        print(self)
+        self.sequencer = MotionSequencer(arm, gripper)
+        self.projector = None
+        # state of the scene, until the next action or episode
+        self._state = None
 
     def connect(self):
-        self.arm.connect(self.sim.client_id)
-        self.camera.connect(self.sim.client_id)
-        self.gripper.connect(self.sim.client_id)
-        self.obj.connect(self.sim.client_id)
+        """Connect the equipment to the simulation, concurrently."""
+        client_id = self.sim.client_id
+        components = dict(arm=self.arm, camera=self.camera,
+                          gripper=self.gripper, obj=self.obj)
+        _, timings = run_concurrently(
+            {name: partial(component.connect, client_id)
+             for name, component in components.items()})
+        self.logger.debug("Connected " + ", ".join(
+            f"{name} in {timing:.3f} s" for name, timing in timings.items()))
+        # maps pixels and heightmap cells to the robot frame
+        self.projector = PixelProjector(
+            self.camera.intrinsics, self.camera.extrinsics,
+            self.workspace, self.resolution)
 
     def close(self):
         self.arm.stop()
@@ -68,26 +118,43 @@ class VPG(object):
         self.obj.stop()
 
     def new_episode(self):
+        self._state = None
         self.close()
         self.sim.stop()
-        time.sleep(2)
+        time.sleep(self.restart_delay)
         self.sim.start()
         self.connect()
         self.obj.add_objs()
 
     def get_state(self):
-        color_img, depth_img = self.camera.capture()
-        return self._get_heightmap(color_img, depth_img)
+        """
+        Return the heightmaps stacked as (h, w, 6), color then depth thrice.
+        The scene only changes with the actions, it is captured once after
+        each action and new episode, later calls return the same state.
+        """
+        if self._state is not None:
+            return self._state
+        if hasattr(self.camera, 'capture_heightmap'):
+            # orthographic cameras render the heightmaps directly
+            heightmaps = self.camera.capture_heightmap(self.workspace,
+                                                       self.resolution)
+        else:
+            color_img, depth_img = self.camera.capture()
+            heightmaps = get_heightmap(
+                color_img, depth_img,
+                self.camera.intrinsics, self.camera.extrinsics,
+                self.workspace, self.resolution)
+        self._state = self._get_heightmap(*heightmaps)
+        return self._state
 
     def make_action(self, action):
         act = action['action']
         idx = action['best_idx']
+        self._state = None
 
         ori = np.deg2rad(idx[0] / self.num_rotations * 360.0)
         height = self.depth_heightmap[idx[1], idx[2]]
-
-        y, x = idx[1:] * self.resolution
-        pos = np.array([x, y, height]) + self.workspace[:, 0]
+        pos = self.projector.heightmap_to_robot(idx[1:], height)[0]
 
         grasp_res = False
         if act == 'grasp':
@@ -126,30 +193,21 @@ class VPG(object):
 
         return done
 
-    def _get_heightmap(self, color_img, depth_img):
-        color_heightmap, depth_heightmap = get_heightmap(
-            color_img, depth_img,
-            self.camera.intrinsics, self.camera.extrinsics,
-            self.workspace, self.resolution)
+    def _get_heightmap(self, color_heightmap, depth_heightmap):
         depth_heightmap[np.isnan(depth_heightmap)] = 0
         self.depth_heightmap = depth_heightmap
 
-        return np.concatenate(
-            [color_heightmap,
-             depth_heightmap[:, :, None],
-             depth_heightmap[:, :, None],
-             depth_heightmap[:, :, None]], axis=2)
+        # filled channel by channel and returned as a (h, w, 6) view, as
+        # interleaving the channels costs several times more
+        state = np.empty((6,) + depth_heightmap.shape)
+        state[:3] = np.moveaxis(color_heightmap, 2, 0)
+        state[3:] = depth_heightmap
+        return np.moveaxis(state, 0, 2)
 
     def _move_to(self, pos, ori):
         pvector = np.append(pos, ori)
         self.arm.movel(pvector)
 
-    def _open_gripper(self,):
-        self.gripper.open()
-
-    def _close_gripper(self):
-        return self.gripper.close()
-
     def _check_gripper(self):
         pass
 
@@ -164,7 +222,7 @@ class VPG(object):
             (depth_diff > self.depth_low_thresh) *
             (depth_diff < self.depth_high_thresh))
 
-        print('change_value: ', change_value)
+        self.logger.debug(f"Change value: {change_value}")
         changed = change_value > self.pixel_thresh or grasp_success
 
         return changed
@@ -182,16 +240,22 @@ class VPG(object):
         pos_above_target = pos.copy()
         pos_above_target[2] += self.grasp_loc_margin
 
-        self._move_to(pos_above_target, ortho_ori)
-        self._open_gripper()
-        self._move_to(pos, ortho_ori)
-        self._close_gripper()
+        start = time.time()
+        seq = self.sequencer
+        # Open the gripper on the way
+        seq.open()
+        seq.move(pos_above_target, ortho_ori)
+        seq.move(pos, ortho_ori, after_gripper=True)
+        closing = seq.close()
 
         # Move gripper to location above grasp target
-        self._move_to(pos_above_target, ortho_ori)
+        seq.move(pos_above_target, ortho_ori, after_gripper=True)
 
-        # Check if grasp is successful
-        closed = self._close_gripper()
+        # Check if grasp is successful, unless the jaws closed on nothing
+        closed = closing.result()
+        if not closed:
+            closed = seq.close().result()
+        self.logger.debug(f"Grasp took {time.time() - start:.2f} s")
 
         # Move the grasped object elsewhere
         if not closed:
@@ -221,10 +285,12 @@ class VPG(object):
         pos_above_target = pos.copy()
         pos_above_target[2] += self.push_margin
 
-        # Compute gripper pos and linear movement increments
-        self._move_to(pos_above_target, ortho_ori)
-        self._close_gripper()
-        self._move_to(pos, ortho_ori)
+        # Compute gripper pos and linear movement increments, the gripper
+        # closes on the way
+        seq = self.sequencer
+        seq.close()
+        seq.move(pos_above_target, ortho_ori)
+        seq.move(pos, ortho_ori, after_gripper=True)
 
         # Compute target location (push to the right)
         target_pos = np.minimum(
@@ -1,5 +1,7 @@
 from .common import (basic_builder, build_from_cfg, get_root_logger,
-                     get_time_iso, save_collected, set_random_seed)
+                     get_time_iso, run_concurrently, save_collected,
+                     set_random_seed)
 from .config import Config, ConfigDict
 from .registry import Registry
-from .transform import get_heightmap, euler2rotm
+from .transform import PixelProjector, euler2rotm, get_heightmap
+from .session import SessionReader, SessionWriter, is_session
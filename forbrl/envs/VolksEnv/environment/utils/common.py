@@ -6,6 +6,7 @@ import pickle
 import random
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2
 import numpy as np
@@ -29,7 +30,7 @@ def get_time_iso():
     return now.isoformat()[:19].replace(':', '-')
 
 
-def save_collected(session_dir, flat=False, **data):
+def save_collected(session_dir, flat=False, suffix=None, **data):
     # TODO: generate a summery for the session include info like devices,
     #  robotic_arms, calibrate board, blah blah blah
     dirs = dict()
@@ -42,6 +43,9 @@ def save_collected(session_dir, flat=False, **data):
         os.makedirs(dirs[key], exist_ok=True)
     for key in data:
         file_name = os.path.join(dirs[key], f"{key}_{timestamp}")
+        if suffix is not None:
+            # timestamps have a resolution of a second
+            file_name += f"_{suffix}"
         if 'color_img' in key:
             cv2.imwrite(file_name + '.png',
                         cv2.cvtColor(data[key], cv2.COLOR_BGR2RGB))
@@ -65,6 +69,37 @@ def basic_builder(cfg, registry_):
     return components
 
 
+def run_concurrently(tasks, num_workers=None):
+    """
+    Call the functions of tasks, a dict of name: function, on a thread pool
+    of num_workers threads, one per task by default. Return their results
+    and their durations in seconds, by name. Every function runs even when
+    others raise, the error of the first one that failed is raised after.
+    """
+    def timed(func):
+        tic = time.time()
+        result = func()
+        return result, time.time() - tic
+
+    logger = logging.getLogger(__name__)
+    if num_workers is None:
+        num_workers = len(tasks)
+    with ThreadPoolExecutor(max_workers=max(num_workers, 1)) as pool:
+        futures = {name: pool.submit(timed, func)
+                   for name, func in tasks.items()}
+    results, timings, error = dict(), dict(), None
+    for name, future in futures.items():
+        try:
+            results[name], timings[name] = future.result()
+        except Exception as ex:
+            logger.error(f"Failed to run {name}: {ex}")
+            if error is None:
+                error = ex
+    if error is not None:
+        raise error
+    return results, timings
+
+
 # modify from mmcv and mmdetection
 
 
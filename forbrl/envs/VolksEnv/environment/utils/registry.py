@@ -1,15 +1,26 @@
 """Modified from vedaseg"""
 
+import importlib
 import inspect
 
 
 class Registry:
+    """
+    Map class names to classes, for building them from configs.
+    Classes register themselves with the `register_module` decorator when
+    their module is imported. `register_lazy` registers a class by its dotted
+    path instead, its module (and the libraries it needs, e.g. a camera SDK)
+    is then only imported by the first `get` of the class.
+    """
+
     def __init__(self, name):
         self._name = name
         self._module_dict = dict()
+        self._lazy_dict = dict()
 
     def __repr__(self):
-        items = list(self._module_dict.keys())
+        items = list(self._module_dict.keys()) + [
+            key for key in self._lazy_dict if key not in self._module_dict]
         format_str = (f"{self.__class__.__name__}"
                       f"(name={self._name}, items={items})")
         return format_str
@@ -22,7 +33,18 @@ class Registry:
     def module_dict(self):
         return self._module_dict
 
+    def __contains__(self, key):
+        return key in self._module_dict or key in self._lazy_dict
+
     def get(self, key):
+        if key not in self._module_dict and key in self._lazy_dict:
+            module_path = self._lazy_dict[key]
+            try:
+                # the module registers the class on import
+                importlib.import_module(module_path)
+            except ImportError as ex:
+                raise ImportError(f"Failed to import {module_path} for {key} "
+                                  f"in {self.name}: {ex}") from ex
         return self._module_dict.get(key, None)
 
     def _register_module(self, module_class):
@@ -42,3 +64,13 @@ class Registry:
     def register_module(self, cls):
         self._register_module(cls)
         return cls
+
+    def register_lazy(self, path):
+        """
+        Register a class by its dotted path, 'package.module.Class',
+        without importing its module.
+        """
+        module_path, _, module_name = path.rpartition('.')
+        if module_name in self:
+            raise KeyError(f"{module_name} already registered in {self.name}")
+        self._lazy_dict[module_name] = module_path
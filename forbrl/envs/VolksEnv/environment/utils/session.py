@@ -0,0 +1,247 @@
+"""
+Columnar store of the samples of a capture session.
+A session directory holds:
+    manifest.json: the devices of the session, the layout of the columns and
+        one record per sample (e.g. its index and joint positions).
+    arrays/<key>.bin: a fixed shape array per sample, rows appended back to
+        back in chunks, read with a single np.fromfile.
+    images.bin: PNG encoded images appended back to back, their offsets and
+        sizes are in the manifest.
+Only the samples counted by the manifest are valid, the manifest is written
+after the data it covers, so that an interrupted session loads up to its
+last flush.
+"""
+import json
+import logging
+import os
+import threading
+from queue import Queue
+
+import cv2
+import numpy as np
+
+MANIFEST = 'manifest.json'
+ARRAYS_DIR = 'arrays'
+IMAGES = 'images.bin'
+
+
+def is_session(session_dir):
+    return os.path.isfile(os.path.join(session_dir, MANIFEST))
+
+
+def _read_manifest(session_dir):
+    with open(os.path.join(session_dir, MANIFEST), 'r') as file:
+        return json.load(file)
+
+
+class SessionWriter:
+    """
+    Append samples to a session from a background thread.
+    A sample is a set of named numpy arrays, the keys containing 'img' are
+    stored as images. Arrays of the same key share the shape and dtype of
+    their first sample. Images are encoded and written in the background,
+    arrays are buffered and written every chunk_size samples along with the
+    manifest. Opening an existing session appends to it.
+
+    Args:
+        session_dir (str): directory of the session.
+        devices (dict): description of the devices, saved in the manifest.
+        chunk_size (int): number of samples between two flushes.
+        queue_size (int): number of samples waiting for the writer before
+            append blocks.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, session_dir, devices=None, chunk_size=32,
+                 queue_size=64):
+        self.session_dir = session_dir
+        self.chunk_size = chunk_size
+        os.makedirs(os.path.join(session_dir, ARRAYS_DIR), exist_ok=True)
+        if is_session(session_dir):
+            self.manifest = _read_manifest(session_dir)
+            self._truncate()
+        else:
+            self.manifest = dict(devices=dict(), arrays=dict(), images=dict(),
+                                 samples=[])
+        if devices is not None:
+            self.manifest['devices'].update(devices)
+        self._buffers = {key: [] for key in self.manifest['arrays']}
+        self._pending = 0
+        self._error = None
+        self._queue = Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return len(self.manifest['samples']) + self._pending
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def append(self, meta=None, **data):
+        """
+        Queue a sample, meta is a JSON serializable record of it, e.g. its
+        index and joint positions.
+        """
+        self._raise_error()
+        self._queue.put((dict() if meta is None else meta, data))
+
+    def flush(self):
+        """Wait until the queued samples are on disk."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._queue.put(StopIteration)
+            self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError(f"Failed to write {self.session_dir}") \
+                from error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is StopIteration:
+                    break
+                if self._error is not None:
+                    continue
+                if item is None:
+                    self._flush()
+                else:
+                    self._write(*item)
+                    if self._pending >= self.chunk_size:
+                        self._flush()
+            except Exception as ex:
+                self.logger.error(f"Failed to write a sample to "
+                                  f"{self.session_dir}: {ex}")
+                self._error = ex
+            finally:
+                self._queue.task_done()
+
+    def _write(self, meta, data):
+        arrays = {key: np.asarray(value) for key, value in data.items()
+                  if 'img' not in key}
+        for key, value in arrays.items():
+            layout = self.manifest['arrays'].get(key)
+            if layout is not None and tuple(layout['shape']) != value.shape:
+                raise ValueError(f"{key} of shape {value.shape} while the "
+                                 f"session stores {tuple(layout['shape'])}")
+        record = dict(meta)
+        for key, value in data.items():
+            if key not in arrays:
+                record[key] = self._write_image(key, value)
+        for key, value in arrays.items():
+            if key not in self.manifest['arrays']:
+                # keys met after the first samples start with zero rows
+                self.manifest['arrays'][key] = dict(dtype=value.dtype.str,
+                                                    shape=value.shape)
+                self._buffers[key] = [np.zeros_like(value)] * \
+                    len(self.manifest['samples'])
+        # one row per sample, missing values are stored as zeros
+        for key, layout in self.manifest['arrays'].items():
+            value = arrays.get(key, np.zeros(layout['shape']))
+            self._buffers[key].append(value.astype(layout['dtype']))
+        self.manifest['samples'].append(record)
+        self._pending += 1
+
+    def _write_image(self, key, img):
+        """Append an RGB image to the blob store, return (offset, size)."""
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+        ok, encoded = cv2.imencode('.png', img)
+        if not ok:
+            raise ValueError(f"Failed to encode {key}")
+        self.manifest['images'].setdefault(key, dict(format='png'))
+        with open(os.path.join(self.session_dir, IMAGES), 'ab') as file:
+            offset = file.tell()
+            file.write(encoded.tobytes())
+        return offset, len(encoded)
+
+    def _flush(self):
+        if not self._pending:
+            return
+        for key, rows in list(self._buffers.items()):
+            path = os.path.join(self.session_dir, ARRAYS_DIR, f"{key}.bin")
+            dtype = self.manifest['arrays'][key]['dtype']
+            with open(path, 'ab') as file:
+                file.write(np.stack(rows).astype(dtype).tobytes())
+            self._buffers[key] = []
+        self._pending = 0
+        # write the manifest after the data it covers
+        path = os.path.join(self.session_dir, MANIFEST)
+        with open(path + '.tmp', 'w') as file:
+            json.dump(self.manifest, file)
+        os.replace(path + '.tmp', path)
+
+    def _truncate(self):
+        """Drop the data written after the last manifest."""
+        num = len(self.manifest['samples'])
+        for key, layout in self.manifest['arrays'].items():
+            path = os.path.join(self.session_dir, ARRAYS_DIR, f"{key}.bin")
+            row = np.dtype(layout['dtype']).itemsize * \
+                int(np.prod(layout['shape']))
+            if os.path.exists(path):
+                os.truncate(path, min(os.path.getsize(path), num * row))
+        ends = [sum(sample[key]) for sample in self.manifest['samples']
+                for key in self.manifest['images'] if key in sample]
+        path = os.path.join(self.session_dir, IMAGES)
+        if os.path.exists(path):
+            os.truncate(path, max(ends, default=0))
+
+
+class SessionReader:
+    """
+    Read a session written by SessionWriter.
+    `arrays` maps each key to an array of all samples, stacked on the first
+    axis, images are read on demand.
+
+    Args:
+        session_dir (str): directory of the session.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, session_dir):
+        self.session_dir = session_dir
+        self.manifest = _read_manifest(session_dir)
+        self.devices = self.manifest['devices']
+        self.samples = self.manifest['samples']
+        self.arrays = dict()
+        for key, layout in self.manifest['arrays'].items():
+            shape = tuple(layout['shape'])
+            path = os.path.join(session_dir, ARRAYS_DIR, f"{key}.bin")
+            data = np.fromfile(path, dtype=layout['dtype'],
+                               count=len(self) * int(np.prod(shape)))
+            self.arrays[key] = data.reshape((len(self),) + shape)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def image(self, key, idx):
+        """Decode the RGB image key of sample idx."""
+        offset, size = self.samples[idx][key]
+        with open(os.path.join(self.session_dir, IMAGES), 'rb') as file:
+            file.seek(offset)
+            encoded = np.frombuffer(file.read(size), np.uint8)
+        img = cv2.imdecode(encoded, cv2.IMREAD_UNCHANGED)
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        return img
+
+    def images(self, key):
+        """Decode the images key of all samples."""
+        return [self.image(key, idx) for idx in range(len(self))]
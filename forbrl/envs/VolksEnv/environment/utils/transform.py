@@ -29,21 +29,99 @@ def cam_coor_to_robot_coor(surface_pts, cam_pose):
 def get_point_heightmap(point, point_depth,
                         cam_intrinsics, cam_pose,
                         workspace_limits, heightmap_resolution):
+    """
+    Heightmap cell (row, col) and height of a pixel (row, col) with its
+    depth, see PixelProjector for many points.
+    """
+    projector = PixelProjector(cam_intrinsics, cam_pose,
+                               workspace_limits, heightmap_resolution)
+    points = projector.to_robot(np.reshape(point, (1, 2)), point_depth)
+    cells = projector.to_heightmap(points, mask=False)
+    heightmap_point = tuple(int(idx) for idx in cells[0])
+    depth_heightmap = points[:, 2] - workspace_limits[2][0]
 
-    cam_pts_x, cam_pts_y = img_pixel_to_cam_coor(point[1], point[0], point_depth, cam_intrinsics)
-    cam_pts = np.array([cam_pts_x, cam_pts_y, point_depth]).reshape(1, -1)
-    surface_pts = cam_coor_to_robot_coor(cam_pts, cam_pose)
+    return heightmap_point, depth_heightmap
 
-    # Create orthographic top-down-view RGB-D heightmaps
-    heightmap_pix_x = int((surface_pts[:, 0] - workspace_limits[0][0]) / heightmap_resolution)
-    heightmap_pix_y = int((surface_pts[:, 1] - workspace_limits[1][0]) / heightmap_resolution)
-    heightmap_point = (heightmap_pix_y, heightmap_pix_x)
 
-    depth_heightmap = surface_pts[:, 2]
-    z_bottom = workspace_limits[2][0]
-    depth_heightmap = depth_heightmap - z_bottom
-
-    return heightmap_point, depth_heightmap
+class PixelProjector(object):
+    """
+    Project pixels of a camera with their depths to the robot frame and to
+    the cells of the top-down heightmap of get_heightmap, for many query
+    points at once. The camera matrices are kept from the construction,
+    build one per camera pose.
+    Pixels and cells are (row, col), stacked as (N, 2) arrays.
+
+    Args:
+        intrinsics (np.ndarray): 3x3 matrix of the camera.
+        extrinsics (np.ndarray): 4x4 pose of the camera in the robot frame.
+        workspace (np.ndarray): 3x2 limits of the heightmap in the robot
+            frame, the heights are relative to its bottom.
+        resolution (float): side of a heightmap cell, in meters.
+    """
+
+    def __init__(self, intrinsics, extrinsics, workspace, resolution):
+        intrinsics = np.asarray(intrinsics, dtype=np.float64)
+        extrinsics = np.asarray(extrinsics, dtype=np.float64)
+        # (row, col) order, like the pixels
+        self.focal = intrinsics[(1, 0), (1, 0)]
+        self.center = intrinsics[(1, 0), (2, 2)]
+        self.rotation = extrinsics[:3, :3].copy()
+        self.translation = extrinsics[:3, 3].copy()
+        self.workspace = np.asarray(workspace, dtype=np.float64)
+        self.resolution = resolution
+        # rows and cols, as in get_heightmap
+        self.heightmap_size = np.round(
+            (self.workspace[(1, 0), 1] - self.workspace[(1, 0), 0]) /
+            resolution).astype(int)
+
+    def __call__(self, pixels, depths):
+        """
+        Return the robot frame points (N, 3), heightmap cells (N, 2) and
+        whether they are within the workspace (N) of pixels with depths.
+        """
+        points = self.to_robot(pixels, depths)
+        cells, valid = self.to_heightmap(points)
+        return points, cells, valid
+
+    def to_robot(self, pixels, depths):
+        """Robot frame points (N, 3) of pixels (N, 2) with depths (N)."""
+        pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 2)
+        depths = np.asarray(depths, dtype=np.float64).reshape(-1)
+        cam_pts = np.empty((len(depths), 3))
+        # camera x and y, from the columns and rows
+        cam_pts[:, 1::-1] = (pixels - self.center) * depths[:, None] / \
+            self.focal
+        cam_pts[:, 2] = depths
+        return cam_pts @ self.rotation.T + self.translation
+
+    def to_heightmap(self, points, mask=True):
+        """
+        Heightmap cells (N, 2) of robot frame points (N, 3) and, with mask,
+        whether they are within the workspace, like the points kept by
+        get_heightmap. The cells of the others are -1.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        with np.errstate(invalid='ignore'):
+            cells = np.floor((points[:, 1::-1] - self.workspace[1::-1, 0]) /
+                             self.resolution)
+        if not mask:
+            return cells.astype(int)
+        valid = np.all((cells >= 0) & (cells < self.heightmap_size), axis=1)
+        valid &= np.all(points[:, :2] < self.workspace[:2, 1], axis=1)
+        valid &= points[:, 2] < self.workspace[2, 1]
+        cells[~valid] = -1
+        return cells.astype(int), valid
+
+    def heightmap_to_robot(self, cells, heights):
+        """
+        Robot frame points (N, 3) at the corner of heightmap cells (N, 2),
+        at heights (N) above the bottom of the workspace.
+        """
+        cells = np.asarray(cells, dtype=np.float64).reshape(-1, 2)
+        points = np.empty((len(cells), 3))
+        points[:, 1::-1] = cells * self.resolution
+        points[:, 2] = heights
+        return points + self.workspace[:, 0]
 
 
 def get_pointcloud(color_img, depth_img, camera_intrinsics):
@@ -304,3 +382,189 @@ def rotm2euler_ixyz(R):
         z = 0
 
     return np.array([x, y, z])
+
+
+# Batched counterparts of the functions above, on stacked poses: euler
+# angles and rotation vectors (N, 3), rotations (N, 3, 3) and homogeneous
+# poses (N, 4, 4).
+
+def is_rotm_batch(R, tol=1e-6):
+    """Which of the matrices R (N, 3, 3) are rotations, within tol."""
+    R = np.asarray(R)
+    errors = np.linalg.norm(np.eye(3) - np.swapaxes(R, -1, -2) @ R,
+                            axis=(-2, -1))
+    return (errors < tol) & (np.linalg.det(R) > 0)
+
+
+def check_rotm_batch(R, tol=1e-6):
+    """Raise ValueError unless all the matrices R (N, 3, 3) are rotations."""
+    valid = is_rotm_batch(R, tol)
+    if not valid.all():
+        raise ValueError(f"Not rotation matrices, at indices "
+                         f"{np.flatnonzero(~valid)}")
+
+
+def _axis_rotms(c, s, axis):
+    """Elementary rotations about axis (0, 1 or 2) of cosines c, sines s."""
+    R = np.zeros(c.shape + (3, 3))
+    i, j = [k for k in range(3) if k != axis]
+    R[..., axis, axis] = 1
+    R[..., i, i] = c
+    R[..., j, j] = c
+    # the sine below the diagonal is positive for x and z, above it for y
+    sign = -1 if axis == 1 else 1
+    R[..., j, i] = sign * s
+    R[..., i, j] = -sign * s
+    return R
+
+
+def euler2rotm_batch(theta):
+    """Batched euler2rotm, rotations (N, 3, 3) of extrinsic XYZ angles."""
+    theta = np.asarray(theta, dtype=np.float64)
+    c, s = np.cos(theta), np.sin(theta)
+    r_x, r_y, r_z = [_axis_rotms(c[..., k], s[..., k], k) for k in range(3)]
+    return r_z @ r_y @ r_x
+
+
+def rotm2euler_batch(R, validate=True, tol=1e-6):
+    """Batched rotm2euler, extrinsic XYZ angles (N, 3) of rotations."""
+    R = np.asarray(R, dtype=np.float64)
+    if validate:
+        check_rotm_batch(R, tol)
+    sy = np.hypot(R[..., 0, 0], R[..., 1, 0])
+    singular = sy < 1e-6
+    x = np.where(singular, np.arctan2(-R[..., 1, 2], R[..., 1, 1]),
+                 np.arctan2(R[..., 2, 1], R[..., 2, 2]))
+    y = np.arctan2(-R[..., 2, 0], sy)
+    z = np.where(singular, 0., np.arctan2(R[..., 1, 0], R[..., 0, 0]))
+    return np.stack([x, y, z], axis=-1)
+
+
+def euler2rotm_ixyz_batch(theta):
+    """Batched euler2rotm_ixyz, rotations (N, 3, 3) of intrinsic XYZ."""
+    theta = np.asarray(theta, dtype=np.float64)
+    c, s = np.cos(theta), np.sin(theta)
+    r_x, r_y, r_z = [_axis_rotms(c[..., k], s[..., k], k) for k in range(3)]
+    return r_x @ r_y @ r_z
+
+
+def rotm2euler_ixyz_batch(R, validate=True, tol=1e-6):
+    """Batched rotm2euler_ixyz, intrinsic XYZ angles (N, 3) of rotations."""
+    R = np.asarray(R, dtype=np.float64)
+    if validate:
+        check_rotm_batch(R, tol)
+    sy = np.hypot(R[..., 1, 2], R[..., 2, 2])
+    singular = sy < 1e-6
+    x = np.where(singular, np.arctan2(R[..., 2, 1], R[..., 1, 1]),
+                 np.arctan2(-R[..., 1, 2], R[..., 2, 2]))
+    y = np.arctan2(R[..., 0, 2], sy)
+    z = np.where(singular, 0., np.arctan2(-R[..., 0, 1], R[..., 0, 0]))
+    return np.stack([x, y, z], axis=-1)
+
+
+def _skew_batch(v):
+    """Cross product matrices (N, 3, 3) of vectors (N, 3)."""
+    S = np.zeros(v.shape[:-1] + (3, 3))
+    S[..., 0, 1], S[..., 0, 2] = -v[..., 2], v[..., 1]
+    S[..., 1, 0], S[..., 1, 2] = v[..., 2], -v[..., 0]
+    S[..., 2, 0], S[..., 2, 1] = -v[..., 1], v[..., 0]
+    return S
+
+
+def _axis_angle2rotm_batch(angle, axis):
+    """Rodrigues' formula for unit axes (N, 3) and angles (N)."""
+    c, s = np.cos(angle)[..., None, None], np.sin(angle)[..., None, None]
+    outer = axis[..., :, None] * axis[..., None, :]
+    return c * np.eye(3) + (1 - c) * outer + s * _skew_batch(axis)
+
+
+def angle2rotm_batch(angle, axis, point=None):
+    """
+    Batched angle2rotm, poses (N, 4, 4) rotating by angle (N) about axis
+    (N, 3), through point (N, 3) if given.
+    """
+    angle = np.asarray(angle, dtype=np.float64)
+    axis = np.asarray(axis, dtype=np.float64)
+    axis = axis / np.linalg.norm(axis, axis=-1, keepdims=True)
+    R = _axis_angle2rotm_batch(angle, axis)
+    M = np.zeros(R.shape[:-2] + (4, 4))
+    M[..., :3, :3] = R
+    M[..., 3, 3] = 1
+    if point is not None:
+        point = np.asarray(point, dtype=np.float64)[..., :3]
+        M[..., :3, 3] = point - np.einsum('...ij,...j->...i', R, point)
+    return M
+
+
+def rotm2angle_batch(R, validate=True, tol=1e-6):
+    """
+    Batched rotm2angle, [angle, x, y, z] (N, 4) of rotations (N, 3, 3),
+    angles in [0, pi]. Unlike rotm2angle, rotations closer to the identity
+    than its margin keep their angle, the identity gives [0, 1, 0, 0].
+    """
+    R = np.asarray(R, dtype=np.float64)
+    if validate:
+        check_rotm_batch(R, tol)
+    cos = (np.trace(R, axis1=-2, axis2=-1) - 1) / 2
+    # 2 sin(angle) axis, which loses the axis as the angle nears pi
+    v = np.stack([R[..., 2, 1] - R[..., 1, 2], R[..., 0, 2] - R[..., 2, 0],
+                  R[..., 1, 0] - R[..., 0, 1]], axis=-1)
+    norm = np.linalg.norm(v, axis=-1)
+    # accurate near 0 and pi, unlike arccos
+    angle = np.arctan2(norm / 2, cos)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        axis = v / norm[..., None]
+        # beyond pi / 2, the axis from the symmetric part, outer(axis, axis)
+        # = (sym(R) - cos I) / (1 - cos), signed by v
+        outer = ((R + np.swapaxes(R, -1, -2)) / 2 -
+                 cos[..., None, None] * np.eye(3)) / \
+            (1 - cos[..., None, None])
+        diag = np.diagonal(outer, axis1=-2, axis2=-1)
+        k = diag.argmax(axis=-1)[..., None]
+        col = np.take_along_axis(outer, k[..., None], axis=-1)[..., 0]
+        col = col / np.sqrt(np.take_along_axis(diag, k, axis=-1))
+    col *= np.where(np.einsum('...i,...i->...', col, v) < 0, -1, 1)[..., None]
+    axis = np.where((cos < 0)[..., None], col, axis)
+    identity = (cos >= 0) & (norm < 1e-12)
+    axis[identity] = (1., 0., 0.)
+    angle = np.where(identity, 0., angle)
+    return np.concatenate([angle[..., None], axis], axis=-1)
+
+
+def rotvec2rotm_batch(rotvec):
+    """Rotations (N, 3, 3) of rotation vectors (N, 3), axis * angle."""
+    rotvec = np.asarray(rotvec, dtype=np.float64)
+    angle = np.linalg.norm(rotvec, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        axis = np.where((angle > 0)[..., None], rotvec / angle[..., None], 0.)
+    return _axis_angle2rotm_batch(angle, axis)
+
+
+def rotm2rotvec_batch(R, validate=True, tol=1e-6):
+    """Rotation vectors (N, 3), axis * angle, of rotations (N, 3, 3)."""
+    angle_axis = rotm2angle_batch(R, validate, tol)
+    return angle_axis[..., :1] * angle_axis[..., 1:]
+
+
+def compose_poses(*poses):
+    """Products of poses (N, 4, 4) or (4, 4), left to right, broadcast."""
+    result = np.asarray(poses[0])
+    for pose in poses[1:]:
+        result = result @ pose
+    return result
+
+
+def invert_poses(poses, validate=False, tol=1e-6):
+    """
+    Inverses of rigid poses (N, 4, 4) from their transposed rotations,
+    cheaper and more accurate than np.linalg.inv.
+    """
+    poses = np.asarray(poses, dtype=np.float64)
+    if validate:
+        check_rotm_batch(poses[..., :3, :3], tol)
+    rot_t = np.swapaxes(poses[..., :3, :3], -1, -2)
+    inv = np.zeros_like(poses)
+    inv[..., :3, :3] = rot_t
+    inv[..., :3, 3] = -np.einsum('...ij,...j->...i', rot_t, poses[..., :3, 3])
+    inv[..., 3, 3] = 1
+    return inv
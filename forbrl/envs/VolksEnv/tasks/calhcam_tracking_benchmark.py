@@ -0,0 +1,106 @@
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+cur_path = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(cur_path, '..'))
+
+from environment.cerebrum.visual_cortex.calhcam import CalHCam
+from environment.equipment.fiducial_markers.simple_grids.circle_grid import (
+    CircleGridBoard)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark CalHCam tracking on a synthetic board sequence')
+
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--downscale', type=float, default=0.5)
+    parser.add_argument('--jump', type=int, default=50,
+                        help="move the board far away every jump frames")
+
+    args = parser.parse_args()
+    return args
+
+
+def render(board, rvec, tvec, intrinsic, size, radius=0.004):
+    """Gray image of the circles and the dark corner marker of a board."""
+    w, h = size
+    supersample = 4
+    img = np.full((h * supersample, w * supersample), 255, np.uint8)
+    angles = np.linspace(0, 2 * np.pi, 32, endpoint=False)
+    ring = np.stack([np.cos(angles), np.sin(angles), 0 * angles], axis=-1)
+    centers = np.vstack([board.local_points, board.corner_points[:1]])
+    for center in centers:
+        outline, _ = cv2.projectPoints(center + radius * ring, rvec, tvec,
+                                       intrinsic, None)
+        outline = np.rint(outline.reshape(-1, 2) * supersample).astype(
+            np.int32)
+        cv2.fillPoly(img, [outline], 0)
+    img = cv2.resize(img, (w, h), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+
+
+def sequence(board, intrinsic, size, num, jump, seed=0):
+    """Frames of a board drifting slowly, with a jump every jump frames."""
+    rng = np.random.default_rng(seed)
+    center = board.local_points.mean(axis=0)
+    rvec, tvec = np.array([0.3, -0.2, 0.1]), np.array([0., 0., 0.45])
+    for idx in range(num):
+        if idx and idx % jump == 0:
+            tvec = np.array([rng.uniform(-0.06, 0.06),
+                             rng.uniform(-0.04, 0.04), 0.45])
+        rvec = rvec + rng.normal(0, 0.005, 3)
+        tvec = tvec + rng.normal(0, 0.001, 3)
+        rotation, _ = cv2.Rodrigues(rvec)
+        # keep the board center on the drifting point
+        shifted = tvec - rotation @ center
+        yield render(board, rvec, shifted, intrinsic, size), rotation, tvec
+
+
+def run(calhcam, frames, center):
+    times, errors, missed = [], [], 0
+    for img, rotation, tvec in frames:
+        tic = time.perf_counter()
+        mat = calhcam(img)
+        times.append(time.perf_counter() - tic)
+        if mat is None:
+            missed += 1
+            continue
+        estimated = mat[:3, :3] @ center + mat[:3, 3]
+        errors.append(np.linalg.norm(estimated - tvec))
+    return 1e3 * np.array(times), 1e3 * np.array(errors), missed
+
+
+def main():
+    args = parse_args()
+
+    board = CircleGridBoard()
+    size = (args.width, args.height)
+    intrinsic = np.array([[900., 0, args.width / 2],
+                          [0, 900., args.height / 2],
+                          [0, 0, 1]])
+    distortion = np.zeros(5)
+    frames = list(sequence(board, intrinsic, size, args.frames, args.jump))
+    center = board.local_points.mean(axis=0)
+
+    print("mode          mean ms   max ms   error mm   missed")
+    for name, track in (('full frame', False), ('tracked', True)):
+        calhcam = CalHCam(board, cam_instrinsics=intrinsic,
+                          cam_distortion=distortion, track=track,
+                          downscale=args.downscale)
+        times, errors, missed = run(calhcam, frames, center)
+        print(f"{name:<12}{times.mean():>9.2f}{times.max():>9.2f}"
+              f"{errors.mean():>11.3f}{missed:>9d}")
+        if track:
+            print(f"searches: {calhcam.stats}")
+
+
+if __name__ == '__main__':
+    main()
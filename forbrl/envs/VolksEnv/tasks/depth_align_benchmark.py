@@ -0,0 +1,217 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+cur_path = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(cur_path, '..'))
+
+from environment.equipment.vision_sensors.cameras.depth_align import (
+    DepthAligner)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Check DepthAligner on synthetic depth frames and '
+                    'benchmark it against pyrealsense2.align')
+
+    parser.add_argument('--depth-res', type=int, nargs=2, default=(1280, 720))
+    parser.add_argument('--color-res', type=int, nargs=2,
+                        default=(1920, 1080))
+    parser.add_argument('--baseline', type=float, default=0.015,
+                        help="meters between the depth and color cameras")
+    parser.add_argument('--repeat', type=int, default=20)
+
+    args = parser.parse_args()
+    return args
+
+
+def intrinsics(res, hfov=np.deg2rad(69)):
+    w, h = res
+    f = w / 2 / np.tan(hfov / 2)
+    return np.array([[f, 0, (w - 1) / 2], [0, f, (h - 1) / 2], [0, 0, 1]])
+
+
+def ray_cast(k, res, origin, rotation):
+    """
+    Depth along the optical axis of the pixels of a camera at origin, with
+    rotation from the camera to the world frame, and the world points seen.
+    The scene is a tilted table at 0.6 m with a ball of 8 cm radius on it.
+    """
+    w, h = res
+    pix_x, pix_y = np.meshgrid(np.arange(w), np.arange(h))
+    rays = np.stack([(pix_x - k[0, 2]) / k[0, 0],
+                     (pix_y - k[1, 2]) / k[1, 1],
+                     np.ones(pix_x.shape)], axis=-1) @ rotation.T
+
+    normal = np.array([0., np.sin(0.3), -np.cos(0.3)])
+    table = (-0.6 * np.cos(0.3) - origin @ normal) / (rays @ normal)
+    table[table <= 0] = np.inf
+
+    center, radius = np.array([0.05, 0.02, 0.5]), 0.08
+    oc = origin - center
+    b = rays @ oc
+    a = np.einsum('...i,...i', rays, rays)
+    disc = b ** 2 - a * (oc @ oc - radius ** 2)
+    ball = np.where(disc >= 0, (-b - np.sqrt(np.maximum(disc, 0))) / a,
+                    np.inf)
+    ball[ball <= 0] = np.inf
+
+    scale = np.minimum(table, ball)
+    points = origin + rays * scale[..., None]
+    return scale, points
+
+
+def synthetic(args):
+    """A depth frame, the aligner and the expected aligned depth."""
+    depth_k, color_k = intrinsics(args.depth_res), intrinsics(args.color_res)
+    # the color camera is to the right of the depth camera, slightly turned
+    angle = 0.01
+    rotation = np.array([[np.cos(angle), 0, np.sin(angle)],
+                         [0, 1, 0],
+                         [-np.sin(angle), 0, np.cos(angle)]])
+    origin = np.array([args.baseline, 0, 0])
+    extrinsics = np.eye(4)
+    extrinsics[:3, :3] = rotation.T
+    extrinsics[:3, 3] = -rotation.T @ origin
+
+    depth_z, _ = ray_cast(depth_k, args.depth_res, np.zeros(3), np.eye(3))
+    depth_img = np.rint(depth_z * 1000).astype(np.uint16)
+    # the aligned depth of a color pixel is the depth of what it sees, in
+    # the depth frame
+    _, points = ray_cast(color_k, args.color_res, origin, rotation)
+    expected = points[..., 2] * 1000
+
+    aligner = DepthAligner(depth_k, depth_img.shape, color_k,
+                           expected.shape, extrinsics, 0.001)
+    return depth_img, aligner, expected, (depth_k, color_k, extrinsics)
+
+
+def librealsense_align(depth_img, params, args, repeat):
+    """Time pyrealsense2.align on a software device fed depth_img."""
+    import pyrealsense2 as rs
+
+    depth_k, color_k, extrinsics = params
+    device = rs.software_device()
+    profiles = []
+    for idx, (name, res, k, stream, fmt, bpp) in enumerate((
+            ('Depth', args.depth_res, depth_k, rs.stream.depth,
+             rs.format.z16, 2),
+            ('Color', args.color_res, color_k, rs.stream.color,
+             rs.format.bgr8, 3))):
+        intr = rs.intrinsics()
+        intr.width, intr.height = res
+        intr.fx, intr.fy = k[0, 0], k[1, 1]
+        intr.ppx, intr.ppy = k[0, 2], k[1, 2]
+        intr.model = rs.distortion.none
+        intr.coeffs = [0.] * 5
+        video = rs.video_stream()
+        video.type, video.index, video.uid = stream, 0, idx
+        video.width, video.height = res
+        video.fps, video.bpp, video.fmt = 30, bpp, fmt
+        video.intrinsics = intr
+        sensor = device.add_sensor(name)
+        profiles.append((sensor, sensor.add_video_stream(video), bpp, res))
+    profiles[0][0].add_read_only_option(rs.option.depth_units, 0.001)
+    rs_extrinsics = rs.extrinsics()
+    rs_extrinsics.rotation = extrinsics[:3, :3].T.ravel().tolist()
+    rs_extrinsics.translation = extrinsics[:3, 3].tolist()
+    profiles[0][1].register_extrinsics_to(profiles[1][1], rs_extrinsics)
+
+    device.create_matcher(rs.matchers.default)
+    syncer = rs.syncer()
+    for sensor, profile, _, _ in profiles:
+        sensor.open(profile)
+        sensor.start(syncer)
+    pixels = (depth_img,
+              np.zeros(tuple(args.color_res[::-1]) + (3,), np.uint8))
+
+    align = rs.align(rs.stream.color)
+    times, aligned, idx = [], None, 0
+    while len(times) < repeat:
+        idx += 1
+        for (sensor, profile, bpp, res), data in zip(profiles, pixels):
+            frame = rs.software_video_frame()
+            frame.pixels = data
+            frame.stride = res[0] * bpp
+            frame.bpp = bpp
+            frame.timestamp = idx * 33.
+            frame.domain = rs.timestamp_domain.hardware_clock
+            frame.frame_number = idx
+            frame.profile = profile.as_video_stream_profile()
+            sensor.on_video_frame(frame)
+        frames = syncer.wait_for_frames()
+        # the syncer passes the first frames alone
+        if frames.size() < 2:
+            continue
+        tic = time.perf_counter()
+        result = align.process(frames)
+        aligned = np.asanyarray(result.get_depth_frame().get_data()).copy()
+        times.append(time.perf_counter() - tic)
+    for sensor, _, _, _ in profiles:
+        sensor.stop()
+        sensor.close()
+    return 1e3 * np.array(times), aligned
+
+
+def report(name, aligned, expected, times):
+    valid = aligned > 0
+    error = np.abs(aligned[valid] - expected[valid])
+    # projections rounded to the nearest pixel err by up to half a pixel
+    # on the slopes of the ball
+    print(f"{name:<14}{times.mean():>8.2f}{np.percentile(times, 90):>8.2f}"
+          f"{valid.mean():>10.1%}{np.median(error):>9.2f}"
+          f"{np.percentile(error, 99):>9.1f}")
+
+
+def occluded(aligned, expected, tolerance=10):
+    """
+    Number of pixels where the background covers a nearer surface, the
+    depth of the nearer pixels that overlap them is lost.
+    """
+    return np.sum((aligned > 0) & (aligned > expected + tolerance))
+
+
+def main():
+    args = parse_args()
+    depth_img, aligner, expected, params = synthetic(args)
+
+    times = []
+    for _ in range(args.repeat):
+        tic = time.perf_counter()
+        aligned = aligner.align(depth_img)
+        times.append(time.perf_counter() - tic)
+    print(f"depth {args.depth_res} -> color {args.color_res}, splat "
+          f"{aligner.splat}")
+    print("aligner        mean ms  p90 ms  coverage  err mm  p99 mm")
+    report('DepthAligner', aligned, expected, 1e3 * np.array(times))
+    valid = aligned > 0
+    assert valid.mean() > 0.9 and \
+        np.median(np.abs(aligned[valid] - expected[valid])) < 1, \
+        "aligned depth does not match the synthetic scene"
+    num = occluded(aligned, expected)
+    print(f"background over foreground: {num} pixels")
+    # a handful of pixels on the outline of the ball, where the depth and
+    # color pixels sample it differently
+    assert num < 1e-4 * aligned.size, \
+        "overlapping pixels do not keep the nearest depth"
+
+    try:
+        times, rs_aligned = librealsense_align(depth_img, params, args,
+                                               args.repeat)
+    except ImportError as e:
+        print(f"pyrealsense2 not available: {e}")
+        return
+    report('rs.align', rs_aligned, expected, times)
+    print(f"background over foreground with rs.align: "
+          f"{occluded(rs_aligned, expected)} pixels")
+    both = (aligned > 0) & (rs_aligned > 0)
+    diff = np.abs(aligned[both].astype(int) - rs_aligned[both])
+    print(f"agreement with rs.align: {np.mean(diff <= 1):.1%} of the pixels "
+          f"both fill within 1 mm")
+
+
+if __name__ == '__main__':
+    main()
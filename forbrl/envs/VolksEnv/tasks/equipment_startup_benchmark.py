@@ -0,0 +1,44 @@
+import argparse
+import os
+import sys
+import time
+
+cur_path = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(cur_path, '..'))
+
+from environment.equipment import build_equipment
+from environment.utils import Config
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Time the construction of the equipment of a config')
+
+    parser.add_argument('config', help="config file, e.g. "
+                                       "configs/calib_test.py")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="threads building the equipment, 1 builds it "
+                             "one component after the other, one per "
+                             "component by default")
+
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = parse_args()
+    cfg = Config.fromfile(args.config)
+    tic = time.perf_counter()
+    equipment, timings = build_equipment(cfg['equipment'], args.workers)
+    total = time.perf_counter() - tic
+
+    for category, components in equipment.items():
+        for name, component in components.items():
+            print(f"{category:<18} {name:<20} {timings[name]:8.3f} s")
+    print(f"built {len(timings)} components in {total:.3f} s with "
+          f"{args.workers or len(timings)} workers, "
+          f"{sum(timings.values()):.3f} s one by one")
+
+
+if __name__ == '__main__':
+    main()
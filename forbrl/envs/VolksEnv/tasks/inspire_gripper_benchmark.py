@@ -0,0 +1,129 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+cur_path = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(cur_path, '..'))
+
+from environment.equipment.end_effectors.grippers.inspire import (
+    InspireGripper)
+from environment.equipment.end_effectors.grippers.mock_inspire import (
+    MockInspireGripper)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark InspireGripper against a pty gripper emulator')
+
+    parser.add_argument('--gripper-id', type=int, default=5,
+                        help="id of the emulated gripper, found by a scan")
+    parser.add_argument('--commands', type=int, default=200,
+                        help="round trips measured per command")
+    parser.add_argument('--moves', type=int, default=5,
+                        help="open and close cycles")
+    parser.add_argument('--reply-delay', type=float, default=0.002)
+    parser.add_argument('--stroke-time', type=float, default=0.5)
+    parser.add_argument('--mute', type=float, default=1.,
+                        help="seconds without answers during a close")
+    parser.add_argument('--loss', type=float, default=0.05,
+                        help="drop and corruption rate of the lossy link")
+
+    args = parser.parse_args()
+    return args
+
+
+def round_trips(gripper, num):
+    """Milliseconds per round trip of the query and setting commands."""
+    commands = dict(getstate=gripper.getstate, getcopen=gripper.getcopen,
+                    getopenlimit=gripper.getopenlimit,
+                    setopenlimit=gripper.setopenlimit)
+    times = dict()
+    for name, command in commands.items():
+        samples = []
+        for _ in range(num):
+            tic = time.perf_counter()
+            command()
+            samples.append(time.perf_counter() - tic)
+        times[name] = 1e3 * np.array(samples)
+    return times
+
+
+def moves(emulator, gripper, num):
+    """Seconds between the end of the jaw motion and the return."""
+    lags = []
+    for _ in range(num):
+        for command in (gripper.close, gripper.open):
+            command()
+            returned = time.time()
+            lags.append(returned - emulator.motion_end)
+    return np.array(lags)
+
+
+def recovery(emulator, gripper, mute):
+    """
+    Mute the gripper in the middle of a close, return the seconds from the
+    end of the mute to the return of close and whether it reconnected.
+    """
+    ser = gripper.ser
+    timer = threading.Timer(0.05, emulator.mute, (mute,))
+    timer.start()
+    tic = time.time()
+    gripper.close()
+    returned = time.time()
+    timer.join()
+    gripper.open()
+    return returned - (tic + 0.05 + mute), gripper.ser is not ser
+
+
+def main():
+    args = parse_args()
+
+    emulator = MockInspireGripper(args.gripper_id,
+                                  stroke_time=args.stroke_time,
+                                  reply_delay=args.reply_delay)
+    try:
+        tic = time.time()
+        gripper = InspireGripper(usb_dir=emulator.port)
+        print(f"construction with id scan to {gripper.gripper_id}: "
+              f"{time.time() - tic:.3f} s")
+        try:
+            print("round trip (ms)   mean     p99")
+            for name, times in round_trips(gripper, args.commands).items():
+                print(f"  {name:<14}{times.mean():>7.2f}"
+                      f"{np.percentile(times, 99):>8.2f}")
+
+            lags = 1e3 * moves(emulator, gripper, args.moves)
+            print(f"open/close return after the jaws stop: "
+                  f"{lags.mean():.1f} ms (max {lags.max():.1f})")
+
+            late, reconnected = recovery(emulator, gripper, args.mute)
+            print(f"mute of {args.mute} s during close: close returned "
+                  f"{late:.3f} s after the mute, reconnected: {reconnected}")
+        finally:
+            gripper.shutdown()
+    finally:
+        emulator.close()
+
+    emulator = MockInspireGripper(stroke_time=args.stroke_time,
+                                  reply_delay=args.reply_delay,
+                                  drop_rate=args.loss,
+                                  corrupt_rate=args.loss)
+    try:
+        gripper = InspireGripper(usb_dir=emulator.port)
+        try:
+            answered = sum(len(gripper.getstate()) > 0
+                           for _ in range(args.commands))
+            print(f"lossy link ({args.loss:.0%} dropped, {args.loss:.0%} "
+                  f"corrupted): {answered}/{args.commands} states read")
+        finally:
+            gripper.shutdown()
+    finally:
+        emulator.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+cur_path = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(cur_path, '..'))
+
+from environment.runners.eye_in_hand_calibrator import EyeInHandCalibrator
+from environment.utils import SessionReader, SessionWriter, save_collected
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the session store against one file per sample')
+
+    parser.add_argument('--poses', type=int, default=1000)
+    parser.add_argument('--width', type=int, default=320)
+    parser.add_argument('--height', type=int, default=240)
+
+    args = parser.parse_args()
+    return args
+
+
+def samples(num, size, seed=0):
+    rng = np.random.default_rng(seed)
+    w, h = size
+    # smooth images compress like camera frames, noise would not
+    img = np.linspace(0, 255, w * h * 3).reshape(h, w, 3).astype(np.uint8)
+    for idx in range(num):
+        yield idx, dict(color_img=np.roll(img, idx, axis=1),
+                        cal2cam_mat=rng.normal(size=(4, 4)),
+                        base2tool_mat=rng.normal(size=(4, 4)))
+
+
+def main():
+    args = parse_args()
+    size = (args.width, args.height)
+    calibrator = EyeInHandCalibrator()
+    root = tempfile.mkdtemp()
+    try:
+        legacy_dir = os.path.join(root, 'legacy')
+        tic = time.perf_counter()
+        for idx, data in samples(args.poses, size):
+            save_collected(legacy_dir, suffix=f"{idx:04d}", **data)
+        legacy_write = time.perf_counter() - tic
+
+        session_dir = os.path.join(root, 'session')
+        tic = time.perf_counter()
+        with SessionWriter(session_dir) as writer:
+            for idx, data in samples(args.poses, size):
+                writer.append(dict(index=idx), **data)
+            append = time.perf_counter() - tic
+        session_write = time.perf_counter() - tic
+
+        tic = time.perf_counter()
+        _, legacy_cc, _ = calibrator.load_session(legacy_dir)
+        legacy_load = time.perf_counter() - tic
+        tic = time.perf_counter()
+        _, session_cc, _ = calibrator.load_session(session_dir)
+        session_load = time.perf_counter() - tic
+        assert legacy_cc.shape == session_cc.shape
+
+        session = SessionReader(session_dir)
+        expected = dict(samples(args.poses, size))
+        for idx in (0, args.poses - 1):
+            assert np.array_equal(session.image('color_img', idx),
+                                  expected[idx]['color_img'])
+            assert np.array_equal(session['cal2cam_mat'][idx],
+                                  expected[idx]['cal2cam_mat'])
+
+        print(f"{args.poses} poses, {args.width}x{args.height} images")
+        print(f"write: one file per sample {legacy_write:.2f} s, session "
+              f"{session_write:.2f} s (appends returned after "
+              f"{append:.2f} s)")
+        print(f"load matrices: one file per sample {1e3 * legacy_load:.1f} "
+              f"ms, session {1e3 * session_load:.1f} ms")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+cur_path = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(cur_path, '..'))
+
+from environment.utils import transform
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the batched transforms against looping over '
+                    'the scalar ones')
+
+    parser.add_argument('--num', type=int, default=10000,
+                        help="number of poses")
+    parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+    return args
+
+
+def timed(func):
+    tic = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - tic
+
+
+def main():
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+    # pitches within (-pi/2, pi/2), where euler angles are unique
+    theta = rng.uniform(-np.pi, np.pi, (args.num, 3)) * [1, 0.45, 1]
+    angle = rng.uniform(0, np.pi, args.num)
+    axis = rng.normal(size=(args.num, 3))
+    axis /= np.linalg.norm(axis, axis=1, keepdims=True)
+    rotms = transform.euler2rotm_batch(theta)
+    rotms_ixyz = transform.euler2rotm_ixyz_batch(theta)
+    poses = np.tile(np.eye(4), (args.num, 1, 1))
+    poses[:, :3, :3] = rotms
+    poses[:, :3, 3] = rng.normal(size=(args.num, 3))
+
+    cases = dict(
+        euler2rotm=(
+            lambda: np.stack([transform.euler2rotm(t) for t in theta]),
+            lambda: transform.euler2rotm_batch(theta)),
+        rotm2euler=(
+            lambda: np.stack([transform.rotm2euler(r) for r in rotms]),
+            lambda: transform.rotm2euler_batch(rotms)),
+        euler2rotm_ixyz=(
+            lambda: np.stack([transform.euler2rotm_ixyz(t) for t in theta]),
+            lambda: transform.euler2rotm_ixyz_batch(theta)),
+        rotm2euler_ixyz=(
+            lambda: np.stack([transform.rotm2euler_ixyz(r)
+                              for r in rotms_ixyz]),
+            lambda: transform.rotm2euler_ixyz_batch(rotms_ixyz)),
+        angle2rotm=(
+            lambda: np.stack([transform.angle2rotm(a, x.copy())
+                              for a, x in zip(angle, axis)]),
+            lambda: transform.angle2rotm_batch(angle, axis)),
+        rotm2angle=(
+            lambda: np.stack([transform.rotm2angle(r) for r in rotms]),
+            lambda: transform.rotm2angle_batch(rotms)),
+        invert_poses=(
+            lambda: np.stack([np.linalg.inv(p) for p in poses]),
+            lambda: transform.invert_poses(poses)),
+        compose_poses=(
+            lambda: np.stack([p @ q for p, q in zip(poses, poses[::-1])]),
+            lambda: transform.compose_poses(poses, poses[::-1])),
+    )
+
+    print(f"{args.num} poses")
+    print(f"{'':<16} {'scalar (ms)':>12} {'batched (ms)':>13} {'speedup':>8}"
+          f" {'max diff':>9}")
+    for name, (scalar, batched) in cases.items():
+        expected, scalar_time = timed(scalar)
+        result, batch_time = timed(batched)
+        # rotm2angle keeps the angles its scalar version rounds to 0 or pi
+        close = np.abs(result - expected).max(axis=tuple(
+            range(1, result.ndim))) < 1e-6
+        print(f"{name:<16} {1e3 * scalar_time:12.1f} "
+              f"{1e3 * batch_time:13.2f} {scalar_time / batch_time:7.0f}x"
+              f" {np.abs(result - expected)[close].max():9.1e}"
+              + ("" if close.all() else
+                 f" ({(~close).sum()} near 0 or pi differ)"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+cur_path = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(cur_path, '..'))
+
+from environment.equipment.robotic_arms.urx.mock_controller import (
+    MockURController, realtime_packet, secondary_packet)
+from environment.equipment.robotic_arms.urx.rtde import (DEFAULT_OUTPUTS,
+                                                         OUTPUTS, Recipe)
+from environment.equipment.robotic_arms.urx.urrobot import URRobot
+from environment.equipment.robotic_arms.urx.urrtmon import URRTMonitor
+from environment.equipment.robotic_arms.urx.ursecmon import ParserUtils
+
+SOURCES = dict(secondary=dict(), realtime=dict(use_rt=True),
+               rtde=dict(use_rtde=True))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark urx against a local mock UR controller')
+
+    parser.add_argument('--address', default='127.0.0.1')
+    parser.add_argument('--sources', nargs='+', default=list(SOURCES),
+                        choices=list(SOURCES),
+                        help="data used by URRobot to follow moves")
+    parser.add_argument('--moves', type=int, default=5,
+                        help="moves per source")
+    parser.add_argument('--distance', type=float, default=0.05,
+                        help="length of the moves in meters")
+    parser.add_argument('--vel', type=float, default=0.25)
+    parser.add_argument('--acc', type=float, default=1.2)
+    parser.add_argument('--segments', type=int, default=5,
+                        help="segments of the push run stop-go and streamed")
+    parser.add_argument('--packets', type=int, default=5000,
+                        help="packets decoded to measure parse throughput")
+
+    args = parser.parse_args()
+    return args
+
+
+def parse_throughput(num_packets):
+    """Packets per second each interface takes to decode."""
+    rng = np.random.RandomState(0)
+    q = rng.rand(num_packets, 6)
+    rates = dict()
+
+    parser = ParserUtils()
+    packets = [secondary_packet(i, qi, qi, qi) for i, qi in enumerate(q)]
+    start = time.perf_counter()
+    for packet in packets:
+        view = parser.parse(packet)
+        view['RobotModeData']['isProgramRunning']
+        view['CartesianInfo']['X']
+    rates['secondary'] = num_packets / (time.perf_counter() - start)
+
+    rtstruct = URRTMonitor.rtstruct692
+    packets = [realtime_packet(i, qi, qi, qi, qi)[4:] for i, qi in
+               enumerate(q)]
+    start = time.perf_counter()
+    for packet in packets:
+        rtstruct.unpack(packet[:rtstruct.size])
+    rates['realtime'] = num_packets / (time.perf_counter() - start)
+
+    recipe = Recipe(1, DEFAULT_OUTPUTS,
+                    [OUTPUTS[name] for name in DEFAULT_OUTPUTS])
+    values = dict(timestamp=0., actual_q=[0.] * 6, actual_qd=[0.] * 6,
+                  actual_TCP_pose=[0.] * 6, actual_TCP_force=[0.] * 6,
+                  runtime_state=2, robot_mode=7, safety_mode=1)
+    packets = [recipe.pack(values) for _ in range(num_packets)]
+    start = time.perf_counter()
+    for packet in packets:
+        recipe.unpack(packet)
+    rates['rtde'] = num_packets / (time.perf_counter() - start)
+    return rates
+
+
+def wait_for(predicate, timeout=2.):
+    end = time.time() + timeout
+    while not predicate():
+        if time.time() > end:
+            return False
+        time.sleep(0.0005)
+    return True
+
+
+def run(controller, robot, args):
+    """Return per move latencies and wait errors."""
+    results = dict(send=[], start=[], wait=[], error=[])
+    home = robot.getl(wait=True)
+    for i in range(args.moves):
+        target = list(home)
+        target[2] += args.distance * (1 - i % 2)
+        programs = controller.programs
+        tic = time.time()
+        robot.movel(target, acc=args.acc, vel=args.vel, wait=False)
+        # the program reached the controller
+        wait_for(lambda: controller.programs > programs)
+        results['send'].append(controller.program_received - tic)
+        # the robot reports the running program
+        wait_for(robot.is_program_running)
+        results['start'].append(time.time() - tic)
+        robot._wait_for_move(target)
+        returned = time.time()
+        # the controller ends the move on its next step at the latest
+        wait_for(lambda: controller.motion_end is not None)
+        results['wait'].append(returned - controller.motion_end)
+        pose = robot.getl(wait=True)
+        results['error'].append(np.linalg.norm(np.subtract(pose, target)))
+    return results
+
+
+def run_push(robot, args):
+    """
+    Time a push made of segments sent as separate movel programs, then
+    streamed through a servo loop.
+    """
+    home = np.array(robot.getl(wait=True))
+    step = np.array([args.distance, 0, 0, 0, 0, 0])
+    targets = [(home + step * (i + 1)).tolist()
+               for i in range(args.segments)]
+
+    tic = time.time()
+    for target in targets:
+        robot.movel(target, acc=args.acc, vel=args.vel)
+    stop_go = time.time() - tic
+    robot.movel(home.tolist(), acc=args.acc, vel=args.vel)
+
+    tic = time.time()
+    with robot.servo_stream() as stream:
+        stream.move_to(targets, vel=args.vel)
+        stream.wait()
+        streamed = time.time() - tic
+        stream.settle()
+    return stop_go, streamed, stream.stats()
+
+
+def main():
+    args = parse_args()
+
+    print("parse throughput (packets/s)")
+    for name, rate in parse_throughput(args.packets).items():
+        print(f"  {name:<10}{rate:>12.0f}")
+
+    controller = MockURController(args.address)
+    try:
+        print(f"{args.moves} moves of {args.distance} m, times in ms")
+        print(f"{'source':<10}{'send':>8}{'start':>8}{'wait':>16}"
+              f"{'error (mm)':>12}")
+        for source in args.sources:
+            robot = URRobot(args.address, **SOURCES[source])
+            try:
+                results = run(controller, robot, args)
+            finally:
+                robot.close()
+            wait = 1e3 * np.array(results['wait'])
+            print(f"{source:<10}"
+                  f"{1e3 * np.mean(results['send']):>8.1f}"
+                  f"{1e3 * np.mean(results['start']):>8.1f}"
+                  f"{wait.mean():>8.1f} ±{wait.std():>5.1f}"
+                  f"{1e3 * np.max(results['error']):>12.3f}")
+        print("send: until the controller gets the program, start: until "
+              "the robot reports it running, wait: return of _wait_for_move "
+              "after the end of the move")
+
+        robot = URRobot(args.address, use_rtde=True)
+        try:
+            stop_go, streamed, stats = run_push(robot, args)
+        finally:
+            robot.close()
+        print(f"push of {args.segments} x {args.distance} m at "
+              f"{args.vel} m/s: stop-go {stop_go:.2f} s, "
+              f"streamed {streamed:.2f} s")
+        print(f"  stream latency {1e3 * stats['latency_mean']:.1f} ms "
+              f"(max {1e3 * stats['latency_max']:.1f}), tracking error "
+              f"{1e3 * stats['error_mean']:.2f} mm "
+              f"(max {1e3 * stats['error_max']:.2f}), "
+              f"{stats['overruns']} overruns")
+    finally:
+        controller.close()
+
+
+if __name__ == '__main__':
+    main()
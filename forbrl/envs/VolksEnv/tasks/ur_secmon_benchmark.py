@@ -0,0 +1,150 @@
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+cur_path = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(cur_path, '..'))
+
+from environment.equipment.robotic_arms.urx.mock_controller import (
+    HOME_POSE, secondary_packet)
+from environment.equipment.robotic_arms.urx.ursecmon import (PacketReader,
+                                                             ParserUtils)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Per packet cost of reading and parsing the UR '
+                    'secondary interface stream')
+
+    parser.add_argument('--capture',
+                        help="raw capture of the secondary port, packets "
+                             "are synthesized when it is not given")
+    parser.add_argument('--record', metavar='HOST',
+                        help="record a capture from the robot at HOST into "
+                             "--capture and exit")
+    parser.add_argument('--seconds', type=float, default=60.,
+                        help="length of the recording")
+    parser.add_argument('--packets', type=int, default=2000,
+                        help="number of synthesized packets")
+    parser.add_argument('--burst', type=int, nargs='+', default=(1, 10, 100),
+                        help="packets written to the socket at once")
+
+    args = parser.parse_args()
+    return args
+
+
+def record(host, path, seconds):
+    sock = socket.create_connection((host, 30002), timeout=0.5)
+    end = time.time() + seconds
+    with open(path, 'wb') as f:
+        while time.time() < end:
+            f.write(sock.recv(65536))
+    sock.close()
+
+
+def synthesize(num_packets):
+    packets = []
+    for i in range(num_packets):
+        t = i * 0.1
+        q = np.sin(t + np.arange(6))
+        packets.append(secondary_packet(t, q, np.cos(t + np.arange(6)),
+                                        HOME_POSE))
+    # the stream rarely starts on a packet boundary
+    return b'\x00\x01\x10' + b''.join(packets)
+
+
+class LegacyReader(object):
+    """The former receive path, concatenating bytes and copying the queue."""
+
+    def __init__(self, sock, parser):
+        self._sock = sock
+        self._parser = parser
+        self._dataqueue = bytes()
+
+    def read_packet(self):
+        while True:
+            ans = self._parser.find_first_packet(self._dataqueue[:])
+            if ans:
+                self._dataqueue = ans[1]
+                return ans[0]
+            self._dataqueue += self._sock.recv(1024)
+
+
+def split_packets(stream):
+    parser = ParserUtils()
+    buf = bytearray(stream)
+    pos = 0
+    packets = []
+    while True:
+        pos, psize = parser.find_packet(buf, pos, len(buf))
+        if psize is None:
+            return packets
+        packets.append(bytes(buf[pos:pos + psize]))
+        pos += psize
+
+
+def consume(view):
+    """What the monitor thread and a getl do with a packet."""
+    view["RobotModeData"]["isProgramRunning"]
+    view["CartesianInfo"]["X"]
+
+
+def run(reader_cls, packets, burst, parse):
+    parser = ParserUtils()
+    rsock, wsock = socket.socketpair()
+    reader = reader_cls(rsock, parser)
+
+    def write():
+        for i in range(0, len(packets), burst):
+            wsock.sendall(b''.join(packets[i:i + burst]))
+
+    writer = threading.Thread(target=write, daemon=True)
+    start = time.perf_counter()
+    writer.start()
+    for _ in range(len(packets)):
+        packet = reader.read_packet()
+        if parse == 'hot':
+            consume(parser.parse(packet))
+        elif parse == 'all':
+            parser.parse(packet).copy()
+    elapsed = time.perf_counter() - start
+    writer.join()
+    rsock.close()
+    wsock.close()
+    return elapsed / len(packets)
+
+
+def main():
+    args = parse_args()
+
+    if args.record:
+        record(args.record, args.capture, args.seconds)
+        return
+
+    if args.capture:
+        with open(args.capture, 'rb') as f:
+            stream = f.read()
+    else:
+        stream = synthesize(args.packets)
+    packets = split_packets(stream)
+    sizes = [len(p) for p in packets]
+    print(f"{len(packets)} packets of {min(sizes)} to {max(sizes)} bytes")
+
+    print("us per packet to read, to read and decode the sub-packets read "
+          "by the monitor and getl, and to read and decode all")
+    print(f"{'reader':<10}{'burst':>6}{'read':>10}{'hot':>10}{'all':>10}")
+    for burst in args.burst:
+        for name, cls in (('legacy', LegacyReader), ('ring', PacketReader)):
+            line = f"{name:<10}{burst:>6}"
+            for parse in (None, 'hot', 'all'):
+                line += f"{1e6 * run(cls, packets, burst, parse):>10.1f}"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import os
+import sys
+import time
+
+cur_path = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(cur_path, '..'))
+
+from environment.equipment.sim_environments.vrep import (MockVrepServer,
+                                                        vrep_api, vrep_const)
+
+MODES = ('blocking', 'streaming', 'oneshot')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Calls per second of vrep_api for the call patterns '
+                    'of the V-REP equipment, per operation mode')
+
+    parser.add_argument('--backend', choices=('mock', 'vrep'),
+                        default='mock',
+                        help="'mock' starts a local MockVrepServer, "
+                             "'vrep' connects to a running V-REP")
+    parser.add_argument('--address', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=19997,
+                        help="0 lets the mock server pick a free port")
+    parser.add_argument('--duration', type=float, default=1.,
+                        help="seconds spent on each pattern and mode")
+    parser.add_argument('--res', type=int, nargs=2, default=(640, 480),
+                        help="vision sensor resolution")
+    parser.add_argument('--step-time', type=float, default=0.05,
+                        help="simulation step of the mock server")
+
+    args = parser.parse_args()
+    return args
+
+
+def get_patterns(client_id, handles):
+    arm, cam, joint = handles
+    patterns = dict(
+        get_position=lambda mode: vrep_api.simxGetObjectPosition(
+            client_id, arm, -1, mode),
+        get_orientation=lambda mode: vrep_api.simxGetObjectOrientation(
+            client_id, arm, -1, mode),
+        set_position=lambda mode: vrep_api.simxSetObjectPosition(
+            client_id, arm, -1, [-0.5, 0., 0.3], mode),
+        get_joint=lambda mode: vrep_api.simxGetJointPosition(
+            client_id, joint, mode),
+        get_image=lambda mode: vrep_api.simxGetVisionSensorImage(
+            client_id, cam, 0, mode),
+        get_depth=lambda mode: vrep_api.simxGetVisionSensorDepthBuffer(
+            client_id, cam, mode),
+        call_script=lambda mode: vrep_api.simxCallScriptFunction(
+            client_id, 'remoteApiCommandServer',
+            vrep_const.sim_scripttype_childscript,
+            'importShape', [0, 0, 255, 0], [-0.5, 0., 0.15, 0., 0., 0.],
+            ['', 'shape_bench'], bytearray(), mode),
+    )
+    return patterns
+
+
+def run(pattern, mode, duration, sync):
+    count = 0
+    ok = 0
+    start = time.time()
+    while time.time() - start < duration:
+        ret = pattern(mode)
+        if isinstance(ret, tuple):
+            ret = ret[0]
+        count += 1
+        ok += ret == vrep_const.simx_return_ok
+    if mode == vrep_const.simx_opmode_streaming:
+        # later patterns would receive the replies of the stream
+        pattern(vrep_const.simx_opmode_discontinue)
+    # wait for the server to work off commands that were not waited for
+    sync()
+    elapsed = time.time() - start
+    return count / elapsed, ok / max(count, 1)
+
+
+def main():
+    args = parse_args()
+
+    server = None
+    port = args.port
+    if args.backend == 'mock':
+        server = MockVrepServer(args.address, args.port,
+                                step_time=args.step_time)
+        port = server.port
+
+    blocking = vrep_const.simx_opmode_blocking
+    client_id = vrep_api.simxStart(args.address, port, True, True, 5000, 5)
+    if client_id == -1:
+        print(f"Failed to connect to {args.address}:{port}")
+        if server is not None:
+            server.close()
+        return
+    try:
+        vrep_api.simxStartSimulation(client_id, blocking)
+        handles = [vrep_api.simxGetObjectHandle(client_id, name, blocking)[1]
+                   for name in ('UR5_target', 'Vision_sensor_persp',
+                                'RG2_openCloseJoint')]
+        cam = handles[1]
+
+        def sync():
+            vrep_api.simxGetObjectHandle(client_id, 'UR5_target', blocking)
+
+        vrep_api.simxSetObjectIntParameter(
+            client_id, cam, vrep_const.sim_visionintparam_resolution_x,
+            args.res[0], blocking)
+        vrep_api.simxSetObjectIntParameter(
+            client_id, cam, vrep_const.sim_visionintparam_resolution_y,
+            args.res[1], blocking)
+
+        print(f"{'pattern':<16}" +
+              ''.join(f"{mode:>22}" for mode in MODES))
+        for name, pattern in get_patterns(client_id, handles).items():
+            line = f"{name:<16}"
+            for mode in MODES:
+                rate, ok = run(pattern, vrep_const.OPERATION_MODES[mode],
+                               args.duration, sync)
+                line += f"{rate:>12.1f}/s ({ok:>4.0%} ok)"
+            print(line)
+    finally:
+        # stopping also removes the shapes added by 'call_script'
+        vrep_api.simxStopSimulation(client_id, blocking)
+        vrep_api.simxFinish(client_id)
+        if server is not None:
+            server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,6 @@
-from .vpg import VPGEnv
+from ..utils import ENVIRONMENTS
+
+# imported by the first config that uses them, as they import the VolksEnv
+# equipment
+ENVIRONMENTS.register_lazy('{}.vpg.VPGEnv'.format(__name__))
+ENVIRONMENTS.register_lazy('{}.vpg_pool.VPGEnvPool'.format(__name__))
@@ -0,0 +1,196 @@
+import logging
+import multiprocessing
+import time
+import traceback
+from multiprocessing.connection import wait
+
+from .base import BaseEnv
+from .VolksEnv.environment.assembler import assemble
+from ..utils import ENVIRONMENTS
+
+
+def _work(remote, env, idx):
+    """Run a VPG game in a worker process, serving commands over a pipe."""
+    try:
+        game = assemble(env, worker_idx=idx)
+        game.connect()
+        while True:
+            cmd, data = remote.recv()
+            if cmd == 'reset':
+                game.new_episode()
+                remote.send(('ok', game.get_state()))
+            elif cmd == 'step':
+                reward = game.make_action(data)
+                state = game.get_state()
+                done = game.is_episode_finished()
+                remote.send(('ok', (state, reward, done)))
+            elif cmd == 'close':
+                game.close()
+                remote.send(('ok', None))
+                break
+            else:
+                raise NotImplementedError(f"Unknown command {cmd}")
+    except (EOFError, KeyboardInterrupt):
+        pass
+    except BaseException:
+        # also catches the exit() of a simulator that failed to connect
+        remote.send(('error', traceback.format_exc()))
+
+
+class WorkerError(RuntimeError):
+    pass
+
+
+class _Worker(object):
+
+    def __init__(self, ctx, env, idx):
+        self.idx = idx
+        self.remote, worker_remote = ctx.Pipe()
+        self.process = ctx.Process(target=_work,
+                                   args=(worker_remote, env, idx),
+                                   daemon=True)
+        self.process.start()
+        worker_remote.close()
+        self.pending = None
+        self.deadline = None
+
+    def send(self, cmd, data=None, timeout=None):
+        self.remote.send((cmd, data))
+        self.pending = cmd
+        self.deadline = time.time() + timeout
+
+    def recv(self):
+        """Get the reply of the pending command, raise if it's not there in
+        time or the worker died."""
+        if not self.remote.poll(max(self.deadline - time.time(), 0)):
+            raise WorkerError(f"Worker {self.idx} timed out on "
+                              f"'{self.pending}'")
+        try:
+            status, result = self.remote.recv()
+        except (EOFError, OSError):
+            raise WorkerError(f"Worker {self.idx} died on '{self.pending}'")
+        finally:
+            self.pending = None
+        if status == 'error':
+            raise WorkerError(f"Worker {self.idx} failed:\n{result}")
+        return result
+
+    def kill(self):
+        self.remote.close()
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+
+@ENVIRONMENTS.register_module
+class VPGEnvPool(BaseEnv):
+    """
+    A VPGEnv whose games run in worker processes.
+
+    A crashed, failing or hanging simulator only takes down its worker: the
+    worker is restarted and the transition is ended with `done`, so the
+    runner resets onto a healthy worker. Workers other than the active one
+    reset their episodes in the background, so that a new episode is
+    usually ready when the runner asks for it. Worker i adds i to the seed
+    and to the simulator ports of the game config, so that games differ and
+    each one talks to its own simulator.
+
+    Args:
+        env (str): config file of the game, as for VPGEnv.
+        num_workers (int): number of games to run.
+        timeout (float): seconds a step may take before the worker is
+            considered hung.
+        reset_timeout (float): seconds starting a worker or resetting an
+            episode may take.
+        max_restarts (int): restarts allowed per worker before giving up.
+        start_method (str): multiprocessing start method.
+    """
+    logger = logging.getLogger(__name__)
+    failed_reward = [0., False, False]
+
+    def __init__(self, env, num_workers=2, timeout=60., reset_timeout=300.,
+                 max_restarts=5, start_method='spawn'):
+        self.env = env
+        self.num_workers = num_workers
+        self.timeout = timeout
+        self.reset_timeout = reset_timeout
+        self.max_restarts = max_restarts
+        self.ctx = multiprocessing.get_context(start_method)
+
+        self.restarts = [0] * num_workers
+        self.workers = [self._start(idx) for idx in range(num_workers)]
+        self.active = None
+        self.state = None
+
+    def _start(self, idx):
+        worker = _Worker(self.ctx, self.env, idx)
+        worker.send('reset', timeout=self.reset_timeout)
+        return worker
+
+    def _restart(self, worker, e):
+        self.logger.warning(f"{e}\nRestarting worker {worker.idx}")
+        worker.kill()
+        self.restarts[worker.idx] += 1
+        if self.restarts[worker.idx] > self.max_restarts:
+            raise WorkerError(f"Worker {worker.idx} restarted more than "
+                              f"{self.max_restarts} times") from e
+        self.workers[worker.idx] = self._start(worker.idx)
+
+    def step(self, action):
+        if self.active is None:
+            raise WorkerError("step called before reset or after a failed "
+                              "step")
+        worker = self.active
+        try:
+            worker.send('step', action, self.timeout)
+            state, reward, done = worker.recv()
+        except (WorkerError, OSError) as e:
+            self.active = None
+            self._restart(worker, e)
+            return self.state, list(self.failed_reward), True
+
+        self.state = state
+        return state, reward, done
+
+    def reset(self):
+        if self.active is not None:
+            worker, self.active = self.active, None
+            try:
+                worker.send('reset', timeout=self.reset_timeout)
+            except OSError as e:
+                self._restart(worker, e)
+
+        while True:
+            resetting = [w for w in self.workers if w.pending == 'reset']
+            if not resetting:
+                raise WorkerError("No worker is resetting an episode")
+            timeout = min(w.deadline for w in resetting) - time.time()
+            ready = wait([w.remote for w in resetting], max(timeout, 0))
+            for worker in resetting:
+                if worker.remote not in ready and \
+                        worker.deadline > time.time():
+                    continue
+                try:
+                    self.state = worker.recv()
+                except WorkerError as e:
+                    self._restart(worker, e)
+                    continue
+                self.active = worker
+                return self.state
+
+    def render(self, mode='sim'):
+        pass
+
+    def close(self):
+        for worker in self.workers:
+            # workers still busy resetting are simply killed
+            if worker.pending is None:
+                try:
+                    worker.send('close', timeout=self.timeout)
+                    worker.recv()
+                except (WorkerError, OSError):
+                    pass
+            worker.kill()
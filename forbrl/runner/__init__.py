@@ -1 +1,4 @@
-from .runner import Runner
+from ..utils import RUNNERS
+
+# imported by the first config that uses it, as it imports torch
+RUNNERS.register_lazy('{}.runner.Runner'.format(__name__))
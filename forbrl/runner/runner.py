@@ -1,15 +1,16 @@
 
+import logging
 import os
 
 import torch
 import numpy as np
-import matplotlib.pyplot as plt
 
 from ..utils import RUNNERS
 
 
 @RUNNERS.register_module
 class Runner(object):
+    logger = logging.getLogger(__name__)
 
     def __init__(self,
                  agent,
@@ -35,7 +36,7 @@ class Runner(object):
             if self.agent.iter >= self.max_iter:
                 break
 
-            print('===== iter %d =====' % self.agent.iter)
+            self.logger.debug('===== iter %d =====', self.agent.iter)
 
             with torch.no_grad():
                 action = self.agent.act(state)
@@ -51,10 +52,11 @@ class Runner(object):
 
             self.records[self.agent.iter] = [action['action'] == 'grasp', reward[0]]
 
-            print('action & reward & done: ', action, reward, done)
+            self.logger.debug('action & reward & done: %s %s %s',
+                              action, reward, done)
 
             loss = self.agent.update(state, action, reward, next_state, done)
-            print('loss: ', loss)
+            self.logger.debug('loss: %s', loss)
 
             state = next_state
 
@@ -62,6 +64,8 @@ class Runner(object):
         np.savetxt(os.path.join(self.workdir, 'records.txt'), self.records)
 
     def plot(self):
+        import matplotlib.pyplot as plt
+
         interval = 200
 
         plt.figure()
@@ -4,5 +4,4 @@ from .builder import (build_env, build_agent, build_algorithm, build_memory,
                       build_optimizer, build_criterion, build_runner)
 from .registry import (ENVIRONMENTS, AGENTS, ALGORITHMS, MEMORIES, POLICIES, BACKBONES,
                        HEADS, MODELS, RUNNERS)
-from .vis import get_pred_vis, save_vis
 from .misc import get_class_name
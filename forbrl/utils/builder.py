@@ -1,7 +1,4 @@
 
-import torch.nn as nn
-import torch.optim as torch_optim
-
 from .common import build_from_cfg
 from .registry import (ENVIRONMENTS, AGENTS, ALGORITHMS, MEMORIES, POLICIES,
                        BACKBONES, HEADS, MODELS, RUNNERS)
@@ -48,11 +45,15 @@ def build_model(cfg, default_args=None):
 
 
 def build_optimizer(cfg, default_args=None):
+    import torch.optim as torch_optim
+
     model = build_from_cfg(cfg, torch_optim, default_args, 'module')
     return model
 
 
 def build_criterion(cfg, default_args=None):
+    import torch.nn as nn
+
     model = build_from_cfg(cfg, nn, default_args, 'module')
     return model
 
@@ -1,16 +1,27 @@
 # modify from mmcv and mmdetection
 
+import importlib
 import inspect
 
 
 class Registry(object):
+    """Map class names to classes, for building them from configs.
+
+    Classes register themselves with the `register_module` decorator when
+    their module is imported, or by their dotted path with `register_lazy`,
+    in which case their module is only imported by the first `get`.
+    """
+
     def __init__(self, name):
         self._name = name
         self._module_dict = dict()
+        self._lazy_dict = dict()
 
     def __repr__(self):
+        items = list(self._module_dict.keys()) + [
+            key for key in self._lazy_dict if key not in self._module_dict]
         format_str = self.__class__.__name__ + '(name={}, items={})'.format(
-            self._name, list(self._module_dict.keys()))
+            self._name, items)
         return format_str
 
     @property
@@ -21,7 +32,19 @@ class Registry(object):
     def module_dict(self):
         return self._module_dict
 
+    def __contains__(self, key):
+        return key in self._module_dict or key in self._lazy_dict
+
     def get(self, key):
+        if key not in self._module_dict and key in self._lazy_dict:
+            module_path = self._lazy_dict[key]
+            try:
+                # the module registers the class on import
+                importlib.import_module(module_path)
+            except ImportError as ex:
+                raise ImportError(
+                    'Failed to import {} for {} in {}: {}'.format(
+                        module_path, key, self.name, ex)) from ex
         return self._module_dict.get(key, None)
 
     def _register_module(self, module_class):
@@ -42,6 +65,17 @@ class Registry(object):
         self._register_module(cls)
         return cls
 
+    def register_lazy(self, path):
+        """Register a class by its dotted path without importing its module.
+        Args:
+            path (str): 'package.module.Class'.
+        """
+        module_path, _, module_name = path.rpartition('.')
+        if module_name in self:
+            raise KeyError('{} is already registered in {}'.format(
+                module_name, self.name))
+        self._lazy_dict[module_name] = module_path
+
 
 ENVIRONMENTS = Registry('env')
 AGENTS = Registry('agent')
@@ -0,0 +1,69 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'forbrl', 'envs', 'VolksEnv'))
+
+from environment.utils.session import (ARRAYS_DIR, IMAGES, SessionReader,
+                                       SessionWriter)
+
+
+def test_key_appearing_mid_chunk(tmp_path):
+    with SessionWriter(str(tmp_path), chunk_size=4) as writer:
+        for i in range(6):
+            sample = dict(a=np.full(3, i, np.float32))
+            if i >= 2:
+                sample['b'] = np.array([i, -i], np.int64)
+            writer.append(dict(idx=i), **sample)
+
+    reader = SessionReader(str(tmp_path))
+    assert len(reader) == 6
+    assert [sample['idx'] for sample in reader.samples] == list(range(6))
+    np.testing.assert_array_equal(
+        reader['a'], np.repeat(np.arange(6, dtype=np.float32)[:, None], 3, 1))
+    # the samples before b appeared hold zeros
+    expected = np.array([[0, 0], [0, 0]] +
+                        [[i, -i] for i in range(2, 6)], np.int64)
+    np.testing.assert_array_equal(reader['b'], expected)
+    assert reader['b'].dtype == np.int64
+
+
+def test_append_after_interrupted_flush(tmp_path):
+    img = np.zeros((4, 5, 3), np.uint8)
+    with SessionWriter(str(tmp_path), chunk_size=2) as writer:
+        for i in range(2):
+            writer.append(pos=np.full(2, i, np.float64), color_img=img + i)
+    # a chunk written without its manifest, as if the process died
+    with open(os.path.join(str(tmp_path), ARRAYS_DIR, 'pos.bin'),
+              'ab') as file:
+        file.write(np.full(2, 99.).tobytes())
+    with open(os.path.join(str(tmp_path), IMAGES), 'ab') as file:
+        file.write(b'partial png')
+
+    with SessionWriter(str(tmp_path), chunk_size=2) as writer:
+        assert len(writer) == 2
+        writer.append(pos=np.full(2, 2.), color_img=img + 2)
+
+    reader = SessionReader(str(tmp_path))
+    assert len(reader) == 3
+    np.testing.assert_array_equal(reader['pos'],
+                                  np.repeat(np.arange(3.)[:, None], 2, 1))
+    for i, decoded in enumerate(reader.images('color_img')):
+        np.testing.assert_array_equal(decoded, img + i)
+
+
+def test_image_round_trip(tmp_path):
+    rng = np.random.RandomState(0)
+    color = rng.randint(0, 256, (48, 64, 3)).astype(np.uint8)
+    depth = rng.randint(0, 65536, (48, 64)).astype(np.uint16)
+    with SessionWriter(str(tmp_path), devices=dict(camera='mock')) as writer:
+        writer.append(dict(idx=0), color_img=color, depth_img=depth)
+
+    reader = SessionReader(str(tmp_path))
+    assert reader.devices == dict(camera='mock')
+    np.testing.assert_array_equal(reader.image('color_img', 0), color)
+    decoded = reader.image('depth_img', 0)
+    assert decoded.dtype == np.uint16
+    np.testing.assert_array_equal(decoded, depth)
@@ -0,0 +1,178 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'forbrl', 'envs', 'VolksEnv'))
+
+from environment.utils.transform import (
+    angle2rotm, angle2rotm_batch, compose_poses, euler2rotm,
+    euler2rotm_batch, euler2rotm_ixyz, euler2rotm_ixyz_batch, invert_poses,
+    rotm2angle, rotm2angle_batch, rotm2euler, rotm2euler_batch,
+    rotm2euler_ixyz, rotm2euler_ixyz_batch, rotm2rotvec_batch,
+    rotvec2rotm_batch)
+
+NEAR_PI = (np.pi, np.pi - 1e-9, np.pi - 1e-6, np.pi - 1e-3, np.pi - 0.05)
+
+
+def random_eulers(num=64, seed=0):
+    rng = np.random.RandomState(seed)
+    eulers = rng.uniform(-np.pi, np.pi, (num, 3))
+    eulers[:, 1] /= 2
+    # gimbal lock of both conventions
+    return np.concatenate([eulers, [[0.3, np.pi / 2, -0.2],
+                                    [0.3, -np.pi / 2, 0.4],
+                                    [0., 0., 0.]]])
+
+
+def random_axes(num, seed=0):
+    axes = np.random.RandomState(seed).normal(size=(num, 3))
+    # the three axes, where the pi rotations are the most degenerate
+    axes[:3] = np.eye(3)
+    return axes / np.linalg.norm(axes, axis=1, keepdims=True)
+
+
+def test_euler2rotm_batch():
+    eulers = random_eulers()
+    np.testing.assert_allclose(euler2rotm_batch(eulers),
+                               [euler2rotm(theta) for theta in eulers],
+                               atol=1e-12)
+    np.testing.assert_allclose(euler2rotm_ixyz_batch(eulers),
+                               [euler2rotm_ixyz(theta) for theta in eulers],
+                               atol=1e-12)
+
+
+@pytest.mark.parametrize('to_rotm, to_euler, to_euler_batch', [
+    (euler2rotm, rotm2euler, rotm2euler_batch),
+    (euler2rotm_ixyz, rotm2euler_ixyz, rotm2euler_ixyz_batch)])
+def test_rotm2euler_batch(to_rotm, to_euler, to_euler_batch):
+    rotms = np.array([to_rotm(theta) for theta in random_eulers()])
+    eulers = to_euler_batch(rotms)
+    np.testing.assert_allclose(eulers, [to_euler(R) for R in rotms],
+                               atol=1e-9)
+    # including the gimbal locks, the angles give back the rotations
+    np.testing.assert_allclose([to_rotm(theta) for theta in eulers], rotms,
+                               atol=1e-9)
+
+
+def test_rotm2euler_batch_validates():
+    rotms = euler2rotm_batch(random_eulers(4))
+    rotms[2] *= 1.01
+    with pytest.raises(ValueError):
+        rotm2euler_batch(rotms)
+    with pytest.raises(ValueError):
+        rotm2euler_ixyz_batch(rotms)
+    rotm2euler_batch(rotms, validate=False)
+
+
+def test_angle2rotm_batch():
+    rng = np.random.RandomState(1)
+    angles = np.concatenate([rng.uniform(-np.pi, np.pi, 32), NEAR_PI])
+    axes = random_axes(len(angles)) * rng.uniform(0.5, 2., (len(angles), 1))
+    points = rng.normal(size=(len(angles), 3))
+    np.testing.assert_allclose(
+        angle2rotm_batch(angles, axes),
+        [angle2rotm(angle, axis) for angle, axis in zip(angles, axes)],
+        atol=1e-12)
+    np.testing.assert_allclose(
+        angle2rotm_batch(angles, axes, points),
+        [angle2rotm(angle, axis, point)
+         for angle, axis, point in zip(angles, axes, points)],
+        atol=1e-12)
+
+
+def test_rotm2angle_batch():
+    rng = np.random.RandomState(2)
+    angles = rng.uniform(0.05, np.pi - 0.05, 32)
+    axes = random_axes(len(angles))
+    rotms = angle2rotm_batch(angles, axes)[:, :3, :3]
+    angle_axis = rotm2angle_batch(rotms)
+    np.testing.assert_allclose(angle_axis,
+                               [rotm2angle(R) for R in rotms], atol=1e-9)
+    np.testing.assert_allclose(angle_axis[:, 0], angles, atol=1e-12)
+    np.testing.assert_allclose(angle_axis[:, 1:], axes, atol=1e-9)
+
+
+def test_rotm2angle_batch_identity():
+    angle_axis = rotm2angle_batch(np.eye(3)[None])
+    np.testing.assert_array_equal(angle_axis, [[0., 1., 0., 0.]])
+    assert rotm2angle(np.eye(3)) == [0, 1, 0, 0]
+
+
+def test_rotm2angle_batch_near_pi():
+    angles = np.repeat(NEAR_PI, 4)
+    axes = random_axes(len(angles), seed=3)
+    rotms = angle2rotm_batch(angles, axes)[:, :3, :3]
+    angle_axis = rotm2angle_batch(rotms)
+    # the axis of a pi rotation is only defined up to its sign, compare
+    # the rotations
+    np.testing.assert_allclose(angle_axis[:, 0], angles, atol=1e-7)
+    np.testing.assert_allclose(
+        angle2rotm_batch(angle_axis[:, 0], angle_axis[:, 1:])[:, :3, :3],
+        rotms, atol=1e-7)
+    # rotm2angle rounds rotations within its 0.01 margin to pi
+    for R, (angle, *axis) in zip(rotms, angle_axis):
+        scalar_angle, *scalar_axis = rotm2angle(R)
+        assert abs(scalar_angle - angle) < 0.01
+        np.testing.assert_allclose(
+            angle2rotm(scalar_angle, np.array(scalar_axis))[:3, :3], R,
+            atol=0.01)
+
+
+@pytest.mark.parametrize('angles', [
+    np.random.RandomState(4).uniform(0., np.pi - 1e-3, 32),
+    np.repeat(NEAR_PI, 4)])
+def test_rotvec_batch(angles):
+    rotvecs = random_axes(len(angles), seed=5) * angles[:, None]
+    rotms = rotvec2rotm_batch(rotvecs)
+    np.testing.assert_allclose(
+        rotms,
+        [angle2rotm(np.linalg.norm(v), v)[:3, :3] for v in rotvecs],
+        atol=1e-12)
+    back = rotm2rotvec_batch(rotms)
+    np.testing.assert_allclose(rotvec2rotm_batch(back), rotms, atol=1e-7)
+    np.testing.assert_allclose(np.linalg.norm(back, axis=1), angles,
+                               atol=1e-7)
+    # below pi the rotation vector is unique
+    below = angles < np.pi - 1e-6
+    np.testing.assert_allclose(back[below], rotvecs[below], atol=1e-7)
+
+
+def test_rotvec_batch_zero():
+    np.testing.assert_array_equal(rotvec2rotm_batch(np.zeros((1, 3))),
+                                  np.eye(3)[None])
+    np.testing.assert_array_equal(rotm2rotvec_batch(np.eye(3)[None]),
+                                  np.zeros((1, 3)))
+
+
+def random_poses(num, seed):
+    rng = np.random.RandomState(seed)
+    poses = angle2rotm_batch(rng.uniform(-np.pi, np.pi, num),
+                             rng.normal(size=(num, 3)))
+    poses[:, :3, 3] = rng.normal(size=(num, 3))
+    return poses
+
+
+def test_compose_poses():
+    a, b, c = [random_poses(16, seed) for seed in range(3)]
+    np.testing.assert_allclose(
+        compose_poses(a, b, c),
+        [np.dot(x, np.dot(y, z)) for x, y, z in zip(a, b, c)], atol=1e-12)
+    # a single pose broadcasts against a batch
+    np.testing.assert_allclose(compose_poses(a[0], b),
+                               [np.dot(a[0], y) for y in b], atol=1e-12)
+
+
+def test_invert_poses():
+    poses = random_poses(16, 6)
+    np.testing.assert_allclose(invert_poses(poses),
+                               [np.linalg.inv(pose) for pose in poses],
+                               atol=1e-12)
+    np.testing.assert_allclose(compose_poses(poses, invert_poses(poses)),
+                               np.broadcast_to(np.eye(4), poses.shape),
+                               atol=1e-12)
+    poses[3, :3, :3] *= 2
+    with pytest.raises(ValueError):
+        invert_poses(poses, validate=True)
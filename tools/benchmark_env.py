@@ -0,0 +1,92 @@
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), '..'))
+
+from forbrl.utils import Config, build_agent, build_env
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark env (and agent) steps per second')
+    parser.add_argument('config', help='train config file path')
+    parser.add_argument('--steps', type=int, default=1000,
+                        help='number of env steps to run')
+    parser.add_argument('--agent', action='store_true',
+                        help='choose actions with the agent instead of '
+                             'randomly')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    return args
+
+
+def random_action(state, num_rotations, rng):
+    occupied = np.argwhere(state[:, :, 3] > 0.01)
+    if len(occupied) == 0:
+        occupied = np.argwhere(np.ones(state.shape[:2]))
+    yx = occupied[rng.randint(len(occupied))]
+    act = 'grasp' if rng.rand() < 0.5 else 'push'
+    return dict(action=act,
+                best_idx=np.array([rng.randint(num_rotations), yx[0], yx[1]]))
+
+
+def main():
+    args = parse_args()
+    cfg = Config.fromfile(args.config)
+    rng = np.random.RandomState(args.seed)
+    np.random.seed(args.seed)
+
+    agent = None
+    if args.agent:
+        import torch
+        agent = build_agent(cfg['agents'], dict(workdir=cfg['root_workdir']))
+    num_rotations = cfg['agents']['algorithm']['model']['num_rotations']
+
+    env = build_env(cfg['envs'])
+    state = env.reset()
+
+    act_time = 0.
+    step_time = 0.
+    resets = 0
+    grasps = 0
+    successes = 0
+    for _ in range(args.steps):
+        tic = time.time()
+        if agent is not None:
+            with torch.no_grad():
+                action = agent.act(state)
+        else:
+            action = random_action(state, num_rotations, rng)
+        act_time += time.time() - tic
+
+        tic = time.time()
+        state, reward, done = env.step(action)
+        if done:
+            state = env.reset()
+            resets += 1
+        step_time += time.time() - tic
+
+        if action['action'] == 'grasp':
+            grasps += 1
+            successes += int(reward[2])
+
+    env.close()
+
+    print(f"steps: {args.steps}, resets: {resets}, "
+          f"grasp success: {successes}/{grasps}")
+    print(f"env:   {args.steps / step_time:.1f} steps/s "
+          f"({1e3 * step_time / args.steps:.2f} ms/step)")
+    if agent is not None:
+        print(f"agent: {args.steps / act_time:.1f} acts/s "
+              f"({1e3 * act_time / args.steps:.2f} ms/act)")
+        total = step_time + act_time
+        print(f"total: {args.steps / total:.1f} steps/s")
+
+
+if __name__ == '__main__':
+    main()